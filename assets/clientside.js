@@ -0,0 +1,79 @@
+// Callbacks run in the browser: the lookups they read are shipped once in dcc.Store components
+
+var ICON_STYLE = {
+    height: "90px",
+    width: "90px",
+    "margin-right": "10px",
+    "object-fit": "cover",
+    roundness: "50",
+};
+
+// icon of a dropdown option: a cell of the sprite sheet, a picture choosing the best format
+// of the thumbnails, or the source image when the thumbnails were not built (see icon_assets.py)
+function categoryIcon(category) {
+    if (category.sprite) {
+        return {
+            namespace: "dash_html_components",
+            type: "Div",
+            props: {
+                style: Object.assign({}, ICON_STYLE, {
+                    display: "inline-block",
+                    "vertical-align": "middle",
+                    "background-image": "url(" + category.sprite.url + ")",
+                    "background-size": category.sprite.size,
+                    "background-position": category.sprite.position,
+                }),
+            },
+        };
+    }
+    var img = {
+        namespace: "dash_html_components",
+        type: "Img",
+        props: {src: category.icon, srcSet: category.srcSet, style: ICON_STYLE},
+    };
+    if (!category.sources) {
+        return img;
+    }
+    return {
+        namespace: "dash_html_components",
+        type: "Picture",
+        props: {
+            children: category.sources
+                .map(function (source) {
+                    return {
+                        namespace: "dash_html_components",
+                        type: "Source",
+                        props: {type: source.type, srcSet: source.srcSet},
+                    };
+                })
+                .concat([img]),
+        },
+    };
+}
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    prices: {
+        // category dropdown options of a main category, each with its icon
+        categoryOptions: function (mainCategory, categoryOptionsData) {
+            if (!mainCategory) {
+                return [];
+            }
+            return (categoryOptionsData[mainCategory] || []).map(function (category) {
+                return {
+                    label: {
+                        namespace: "dash_html_components",
+                        type: "Div",
+                        props: {
+                            children: [categoryIcon(category), category.value],
+                        },
+                    },
+                    value: category.value,
+                };
+            });
+        },
+
+        // month shown next to the date slider
+        sliderLabel: function (sliderValue, dateSliderLabels) {
+            return dateSliderLabels[sliderValue];
+        },
+    },
+});
@@ -0,0 +1,103 @@
+"""
+Time and accuracy of the price anomaly detection (see price_anomalies.py) on synthetic tables.
+
+A synthetic price table is generated for every scale (see benchmarks/synthetic.py), typed
+like the cached table, and a known share of its prices is multiplied by a random factor
+(x0.4, x1.8 or x2.5). The detection is timed over the whole table and its flags are
+compared with the injected spikes.
+
+Usage, from the repository root:
+    python -m benchmarks.anomalies --rows 100000 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_prices
+from price_anomalies import detect_anomalies
+from price_cache import to_typed
+
+SPIKE_FACTORS = [0.4, 1.8, 2.5]
+
+
+def prepare(rows, seed, spike_share):
+    """
+    Description: Generate a typed price table and inject spikes into it
+
+    Returns:
+    (DataFrame, ndarray): The table and the positions of the injected spikes
+    """
+    df = generate_prices(rows, seed=seed).drop(columns="Specification")
+    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
+    df = to_typed(df)
+    rng = np.random.default_rng(seed)
+    spikes = rng.choice(len(df), size=int(len(df) * spike_share), replace=False)
+    prices = df["Price"].to_numpy().copy()
+    prices[spikes] *= rng.choice(SPIKE_FACTORS, size=len(spikes))
+    df["Price"] = prices
+    return df, spikes
+
+
+def flagged_positions(df, anomalies):
+    # positions of the flagged rows in the table, a (Category, Market, Date) has one price
+    keys = ["Category", "Market", "Date"]
+    flagged = pd.MultiIndex.from_frame(
+        anomalies[keys].astype({"Category": object, "Market": object})
+    )
+    table = pd.MultiIndex.from_frame(
+        df[keys].astype({"Category": object, "Market": object})
+    )
+    return np.flatnonzero(table.isin(flagged))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--spikes", type=float, default=0.001, help="share of the prices spiked"
+    )
+    arguments = parser.parse_args()
+
+    print(
+        "{:>10} {:>9} {:>12} {:>8} {:>8} {:>10} {:>8} {:>9}".format(
+            "rows",
+            "seconds",
+            "rows/s",
+            "flagged",
+            "spikes",
+            "regional",
+            "recall",
+            "precision",
+        )
+    )
+    for rows in arguments.rows:
+        df, spikes = prepare(rows, arguments.seed, arguments.spikes)
+        times = []
+        for _ in range(arguments.repeat):
+            started = time.perf_counter()
+            anomalies = detect_anomalies(df)
+            times.append(time.perf_counter() - started)
+        seconds = min(times)
+
+        found = np.intersect1d(flagged_positions(df, anomalies), spikes)
+        print(
+            "{:>10,} {:>9.3f} {:>12,.0f} {:>8,} {:>8,} {:>10,} {:>8.1%} {:>9.1%}".format(
+                len(df),
+                seconds,
+                len(df) / seconds,
+                len(anomalies),
+                int(anomalies["Spike"].sum()),
+                int(anomalies["Regional Outlier"].sum()),
+                len(found) / max(len(spikes), 1),
+                len(found) / max(len(anomalies), 1),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
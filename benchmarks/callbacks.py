@@ -0,0 +1,372 @@
+"""
+Latency, peak memory and payload size of the dashboard callbacks on synthetic datasets.
+
+For every scale a synthetic price csv is generated (see benchmarks/synthetic.py) in a work
+directory next to the map and market files, and the dashboard is run from there in fresh
+interpreters: once to measure the module startup without and with the typed cache,
+and once to call update_graph and set_region_options directly over a matrix of
+categories, regions and slider positions. Each update_graph case is measured as a full
+render without cache, a full render from the figure cache, a slider move and a trend click.
+
+Usage, from the repository root:
+    python -m benchmarks.callbacks --rows 10000 1000000 10000000
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic import write_prices
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILES = ["market.csv", "philippine_region_simplify.json"]
+REGION_SETS = [
+    None,
+    ["NCR - National Capital Region"],
+    [
+        "NCR - National Capital Region",
+        "CALBARZON (Region IV-A)",
+        "Central Visayas (Region VII)",
+    ],
+]
+
+
+def prepare_workdir(workdir, rows, seed):
+    """
+    Description: Lay out a directory the dashboard can start from, with a synthetic price csv
+
+    Returns:
+    (str): The work directory of this scale
+    """
+    directory = os.path.join(workdir, str(rows))
+    os.makedirs(os.path.join(directory, "data"), exist_ok=True)
+    for name in DATA_FILES:
+        shutil.copyfile(
+            os.path.join(REPOSITORY, "data", name),
+            os.path.join(directory, "data", name),
+        )
+    write_prices(rows, os.path.join(directory, "data", "bantaypresyo.csv"), seed=seed)
+    return directory
+
+
+def run_in_workdir(directory, arguments):
+    # a fresh interpreter per measurement, so the startup and the peak memory are not shared
+    environment = dict(os.environ, PYTHONPATH=REPOSITORY)
+    environment.pop("PRICE_SHARED_DIR", None)
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore"] + arguments,
+        cwd=directory,
+        env=environment,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# cold start of a worker: the module import, the build of the app and its first page load
+STARTUP_CODE = """
+import json, resource, time
+started = time.perf_counter()
+import dashboard_crop_price as dashboard
+imported = time.perf_counter()
+app = dashboard.create_app()
+built = time.perf_counter()
+app.server.test_client().get("/")
+print(json.dumps({
+    "seconds": built - started,
+    "import_seconds": imported - started,
+    "first_request_seconds": time.perf_counter() - built,
+    "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "store_rows": dashboard.store.lookup_stats()["rows"],
+}))
+"""
+
+
+def measure_startup(directory):
+    """
+    Description: Time the build of the dashboard with the typed cache missing, then present
+
+    Returns:
+    (dict): Startup seconds and peak resident memory, per cache state
+    """
+    shutil.rmtree(os.path.join(directory, "data", "cache"), ignore_errors=True)
+    return {
+        "without_cache": run_in_workdir(directory, ["-c", STARTUP_CODE]),
+        "with_cache": run_in_workdir(directory, ["-c", STARTUP_CODE]),
+    }
+
+
+def set_trigger(prop_id):
+    # what Dash sets for the duration of a request, read by ctx.triggered in update_graph
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    context_value.set(
+        AttributeDict(triggered_inputs=[{"prop_id": prop_id, "value": None}])
+    )
+
+
+def payload_bytes(outputs):
+    from plotly.io.json import to_json_plotly
+
+    # the callback response is the json encoding of every output, as done by Dash
+    return len(to_json_plotly(list(outputs)).encode())
+
+
+def measure(function, repeat, before=None):
+    """
+    Description: Call a function repeatedly, then once more under tracemalloc
+
+    Args:
+    function (callable): Returns the callback outputs
+    repeat (int): Number of timed calls
+    before (callable): Called before every call, outside of the timing
+
+    Returns:
+    (dict): Latency percentiles, peak traced memory and payload size of the outputs
+    """
+    seconds = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        outputs = function()
+        seconds.append(time.perf_counter() - started)
+
+    # traced separately, tracemalloc slows down the calls it measures
+    if before is not None:
+        before()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": float(np.percentile(seconds, 50) * 1000),
+        "p95_ms": float(np.percentile(seconds, 95) * 1000),
+        "max_ms": float(max(seconds) * 1000),
+        "peak_bytes": peak,
+        "payload_bytes": payload_bytes(outputs),
+    }
+
+
+def run_cases(repeat):
+    """
+    Description: Call the callbacks over the input matrix, run inside the work directory
+
+    Returns:
+    (list): One result per callback, trigger and input combination
+    """
+    import dashboard_crop_price as dashboard
+
+    counts = dashboard.store.category_counts()
+    categories = list(counts.index[:2]) + list(counts.index[-1:])
+    sliders = sorted({dashboard.months, dashboard.months // 2, 0})
+    results = []
+
+    for category in categories:
+        set_trigger("select_category.value")
+        result = measure(lambda: dashboard.set_region_options(category), repeat=repeat)
+        results.append(
+            dict(
+                result,
+                callback="set_region_options",
+                trigger="category",
+                category=category,
+            )
+        )
+
+        for regions in REGION_SETS:
+            for slider in sliders:
+                case = dict(category=category, regions=regions, slider=slider)
+
+                def call():
+                    return dashboard.update_graph(
+                        category, None, slider, regions, click_data
+                    )
+
+                click_data = None
+                set_trigger("select_category.value")
+                results.append(
+                    dict(
+                        measure(call, repeat, before=dashboard.figure_cache.clear),
+                        callback="update_graph",
+                        trigger="full",
+                        **case
+                    )
+                )
+                results.append(
+                    dict(
+                        measure(call, repeat),
+                        callback="update_graph",
+                        trigger="full_cached",
+                        **case
+                    )
+                )
+                set_trigger("date_slider.value")
+                results.append(
+                    dict(
+                        measure(call, repeat, before=dashboard.figure_cache.clear),
+                        callback="update_graph",
+                        trigger="slider",
+                        **case
+                    )
+                )
+
+                # a click on the latest point of the trend
+                trend = dashboard.get_trend_data(category, regions)
+                if trend.empty:
+                    continue
+                click_data = {
+                    "points": [
+                        {
+                            "x": trend["Date"].max().strftime("%Y-%m-%d"),
+                            "curveNumber": 0,
+                        }
+                    ]
+                }
+                set_trigger("crop_price_trend.clickData")
+                results.append(
+                    dict(
+                        measure(call, repeat),
+                        callback="update_graph",
+                        trigger="click",
+                        **case
+                    )
+                )
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPOSITORY,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=os.path.join("benchmarks", "data"))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--cases", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cases:
+        # worker mode: started by main() inside the work directory of one scale
+        print(json.dumps(run_cases(args.repeat)))
+        return
+
+    import pandas as pd
+    import plotly
+    import dash
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "versions": {
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plotly": plotly.__version__,
+            "dash": dash.__version__,
+        },
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "scales": [],
+    }
+    workdir = os.path.abspath(args.workdir)
+    for rows in args.rows:
+        print("{:,} rows: generating".format(rows), file=sys.stderr)
+        directory = prepare_workdir(workdir, rows, args.seed)
+        print("{:,} rows: startup".format(rows), file=sys.stderr)
+        startup = measure_startup(directory)
+        print("{:,} rows: callbacks".format(rows), file=sys.stderr)
+        cases = run_in_workdir(
+            directory,
+            ["-m", "benchmarks.callbacks", "--cases", "--repeat", str(args.repeat)],
+        )
+        report["scales"].append({"rows": rows, "startup": startup, "cases": cases})
+
+    output = args.output or os.path.join(
+        "benchmarks",
+        "results",
+        "callbacks-{}.json".format(datetime.now().strftime("%Y%m%d-%H%M%S")),
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=1)
+    print_report(report)
+    print("results written to {}".format(output))
+
+
+def print_report(report):
+    for scale in report["scales"]:
+        startup = scale["startup"]
+        print(
+            "{:,} rows: startup {:.2f} s without cache, {:.2f} s with cache, max rss {:.0f} MB".format(
+                scale["rows"],
+                startup["without_cache"]["seconds"],
+                startup["with_cache"]["seconds"],
+                startup["with_cache"]["max_rss_bytes"] / 1e6,
+            )
+        )
+        if "import_seconds" in startup["with_cache"]:
+            print(
+                "  module import {:.3f} s, first page load {:.2f} s".format(
+                    startup["with_cache"]["import_seconds"],
+                    startup["with_cache"]["first_request_seconds"],
+                )
+            )
+        print(
+            "  {:<18} {:<11} {:>9} {:>9} {:>10} {:>12}".format(
+                "callback", "trigger", "p50 ms", "p95 ms", "peak KB", "payload B"
+            )
+        )
+        for callback, trigger, cases in summarize(scale["cases"]):
+            print(
+                "  {:<18} {:<11} {:>9.1f} {:>9.1f} {:>10.0f} {:>12,.0f}".format(
+                    callback,
+                    trigger,
+                    np.median([case["p50_ms"] for case in cases]),
+                    max(case["p95_ms"] for case in cases),
+                    max(case["peak_bytes"] for case in cases) / 1024,
+                    np.median([case["payload_bytes"] for case in cases]),
+                )
+            )
+
+
+def summarize(cases):
+    """
+    Description: Group the cases of one scale by callback and trigger, in the order they ran
+
+    Returns:
+    (list): (callback, trigger, cases) tuples
+    """
+    groups = {}
+    for case in cases:
+        groups.setdefault((case["callback"], case["trigger"]), []).append(case)
+    return [(callback, trigger, cases) for (callback, trigger), cases in groups.items()]
+
+
+if __name__ == "__main__":
+    main()
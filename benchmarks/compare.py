@@ -0,0 +1,60 @@
+"""
+Compare two result files of benchmarks.callbacks, case by case.
+
+Usage, from the repository root:
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+
+CASE_KEYS = ["callback", "trigger", "category", "regions", "slider"]
+
+
+def case_key(case):
+    return tuple(json.dumps(case.get(key)) for key in CASE_KEYS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = {scale["rows"]: scale for scale in json.load(f)["scales"]}
+    with open(args.after) as f:
+        after = {scale["rows"]: scale for scale in json.load(f)["scales"]}
+
+    for rows in sorted(set(before) & set(after)):
+        print("{:,} rows".format(rows))
+        for state in ["without_cache", "with_cache"]:
+            old = before[rows]["startup"][state]["seconds"]
+            new = after[rows]["startup"][state]["seconds"]
+            print(
+                "  startup {:<14} {:>9.2f} s -> {:>9.2f} s  x{:.2f}".format(
+                    state, old, new, new / old
+                )
+            )
+        old_cases = {case_key(case): case for case in before[rows]["cases"]}
+        for case in after[rows]["cases"]:
+            old = old_cases.get(case_key(case))
+            if old is None:
+                continue
+            print(
+                "  {:<18} {:<11} {:<22.22} {:<12.12} {:>2}  p50 {:>8.1f} -> {:>8.1f} ms  x{:<5.2f} payload {:>10,} -> {:>10,} B".format(
+                    case["callback"],
+                    case["trigger"],
+                    str(case["category"]),
+                    str(len(case.get("regions") or []) or "all") + " regions",
+                    "" if case.get("slider") is None else case["slider"],
+                    old["p50_ms"],
+                    case["p50_ms"],
+                    case["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("nan"),
+                    old["payload_bytes"],
+                    case["payload_bytes"],
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Response payload size of the update_graph callback, with the region GeoJSON
+embedded in the map figure (before) and referenced by url (after).
+
+Usage, from the repository root:
+    python -m benchmarks.payload_size
+"""
+
+import json
+
+from plotly.io.json import to_json_plotly
+
+import dashboard_crop_price as dashboard
+
+CASES = [
+    ("Well-milled (Local)", None, dashboard.months),
+    ("Well-milled (Local)", None, 0),
+    ("Milkfish", ["NCR - National Capital Region"], dashboard.months),
+    ("Egg", ["NCR - National Capital Region", "CALBARZON (Region IV-A)"], 6),
+]
+
+
+def payload_bytes(outputs):
+    # the callback response is the json encoding of every output, as done by Dash
+    return len(to_json_plotly(list(outputs)).encode())
+
+
+def embed_geojson(figure, geojson):
+    # the outputs are the json ready figures of the figure cache, they are copied not modified
+    return dict(
+        figure,
+        data=[
+            (
+                dict(trace, geojson=geojson)
+                if trace.get("type") == "choroplethmapbox"
+                else trace
+            )
+            for trace in figure["data"]
+        ],
+    )
+
+
+def main():
+    with open("data/philippine_region_simplify.json") as f:
+        geojson = json.load(f)
+
+    print("{:<70} {:>12} {:>12}".format("case", "inline (B)", "url (B)"))
+    for category, regions, slider in CASES:
+        outputs = dashboard.update_graph(category, None, slider, regions, None)
+        after = payload_bytes(outputs)
+        before = payload_bytes([embed_geojson(outputs[0], geojson)] + list(outputs[1:]))
+        case = "{} / {} / {}".format(
+            category, regions or "all regions", dashboard.date_slider_dict[slider]
+        )
+        print("{:<70} {:>12,} {:>12,}".format(case, before, after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Encode time and size of the update_graph responses, with the json and orjson engines
+of plotly and with gzip and brotli compression (see response_encoding.py).
+
+Every case is rendered once, then its outputs are encoded the way Dash encodes a callback
+response: as built (a figure rendered without the cache) and as json ready dicts (a figure
+read from the cache).
+
+Usage, from the repository root:
+    python -m benchmarks.serialization [--repeat 20]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from plotly.io import json as plotly_json
+from plotly.io.json import to_json_plotly
+
+import dashboard_crop_price as dashboard
+from figure_cache import to_json_ready
+from response_encoding import COMPRESS_LEVEL, brotli, compress, orjson
+
+CASES = [
+    ("Well-milled (Local)", None, dashboard.months),
+    ("Well-milled (Local)", None, 0),
+    ("Milkfish", ["NCR - National Capital Region"], dashboard.months),
+    ("Egg", ["NCR - National Capital Region", "CALBARZON (Region IV-A)"], 6),
+]
+
+
+def encode_ms(outputs, engine, repeat):
+    # median time of the encoding of every output, as done by Dash
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        to_json_plotly(list(outputs), engine=engine)
+        times.append(time.perf_counter() - started)
+    return float(np.median(times)) * 1000
+
+
+def render(category, regions, slider):
+    # a full render as built, without the figure cache
+    df_map_region, df_map_market = dashboard.get_map_data(
+        category, regions, dashboard.slider_month(slider)
+    )
+    df_trend = dashboard.get_trend_data(category, regions)
+    return [
+        dashboard.build_map_figure(df_map_region, df_map_market, regions),
+        dashboard.build_trend_figure(df_trend, regions),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    arguments = parser.parse_args()
+
+    engines = ["json"] + (["orjson"] if orjson is not None else [])
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    print(
+        "{:<72} {:<7} {:<6} {:>9} {:>10} {}".format(
+            "case",
+            "figure",
+            "engine",
+            "encode ms",
+            "bytes",
+            " ".join("{:>10}".format(encoding + " B") for encoding in encodings),
+        )
+    )
+    for category, regions, slider in CASES:
+        figures = render(category, regions, slider)
+        case = "{} / {} / {}".format(
+            category, regions or "all regions", dashboard.date_slider_dict[slider]
+        )
+        for kind in ["built", "cached"]:
+            for engine in engines:
+                plotly_json.config.default_engine = engine
+                outputs = (
+                    figures
+                    if kind == "built"
+                    else [to_json_ready(figure) for figure in figures]
+                )
+                body = to_json_plotly(list(outputs), engine=engine).encode()
+                print(
+                    "{:<72} {:<7} {:<6} {:>9.2f} {:>10,} {}".format(
+                        case,
+                        kind,
+                        engine,
+                        encode_ms(outputs, engine, arguments.repeat),
+                        len(body),
+                        " ".join(
+                            "{:>10,}".format(
+                                len(compress(body, encoding, COMPRESS_LEVEL))
+                            )
+                            for encoding in encodings
+                        ),
+                    )
+                )
+    if orjson is None:
+        print("orjson is not installed, only the json engine was measured")
+    if brotli is None:
+        print("brotli is not installed, only gzip was measured")
+
+
+if __name__ == "__main__":
+    main()
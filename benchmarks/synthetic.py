@@ -0,0 +1,138 @@
+"""
+Synthetic crop price histories at a configurable scale.
+
+The categories (with their main category and a typical price) come from the real price csv,
+the markets, regions and coordinates from data/market.csv. Each market reports each category
+once a week, going back from today for as many weeks as the requested number of rows needs,
+and the rows are then sampled so that not every market reports every week.
+The prices follow a random walk per category and week, scaled by a factor per market.
+
+Usage, from the repository root:
+    python -m benchmarks.synthetic 1000000 /tmp/bench/data/bantaypresyo.csv
+"""
+
+import argparse
+import math
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CSV_PATH = "data/bantaypresyo.csv"
+MARKET_PATH = "data/market.csv"
+COLUMNS = [
+    "Category",
+    "Specification",
+    "Main Category",
+    "Market",
+    "Region",
+    "Price",
+    "Date",
+    "Lat",
+    "Lon",
+]
+
+
+def generate_prices(
+    rows, seed=0, end_date=None, csv_path=CSV_PATH, market_path=MARKET_PATH
+):
+    """
+    Description: Generate a price table in the format of the real price csv
+
+    Args:
+    rows (int): Number of rows to generate
+    seed (int): Seed of the random generator, the same seed gives the same table
+    end_date (date): Date of the latest week, today by default
+    csv_path (str): Real price csv the categories are taken from
+    market_path (str): Csv of the markets with their region and coordinates
+
+    Returns:
+    (DataFrame): Price rows sorted by date, with the columns of the price csv
+    """
+    rng = np.random.default_rng(seed)
+    real = pd.read_csv(csv_path)
+    categories = (
+        real.groupby("Category")
+        .agg(
+            main=("Main Category", "first"),
+            specification=("Specification", "first"),
+            price=("Price", "median"),
+        )
+        .reset_index()
+    )
+    markets = pd.read_csv(market_path)
+
+    per_week = len(categories) * len(markets)
+    weeks = max(1, math.ceil(rows / per_week))
+    end_date = pd.Timestamp(end_date or datetime.now().date())
+    dates = end_date - pd.to_timedelta(7 * np.arange(weeks)[::-1], unit="D")
+
+    # a sample of the (week, market, category) grid, in date order
+    cells = np.sort(rng.choice(weeks * per_week, size=rows, replace=False))
+    week = cells // per_week
+    market = cells % per_week // len(categories)
+    category = cells % len(categories)
+
+    # one random walk per category over the weeks, one price level per market
+    walk = np.exp(np.cumsum(rng.normal(0, 0.02, size=(weeks, len(categories))), axis=0))
+    market_factor = rng.lognormal(0, 0.1, size=len(markets))
+    noise = rng.lognormal(0, 0.03, size=rows)
+    price = (
+        categories["price"].to_numpy()[category]
+        * walk[week, category]
+        * market_factor[market]
+        * noise
+    )
+
+    # the dates are formatted once per week instead of once per row
+    date_text = np.asarray(dates.strftime("%d/%m/%Y"))
+    return pd.DataFrame(
+        {
+            "Category": categories["Category"].to_numpy()[category],
+            "Specification": categories["specification"].to_numpy()[category],
+            "Main Category": categories["main"].to_numpy()[category],
+            "Market": markets["Market"].to_numpy()[market],
+            "Region": markets["Region"].to_numpy()[market],
+            "Price": np.round(price * 4) / 4,
+            "Date": date_text[week],
+            "Lat": markets["Lat"].to_numpy()[market],
+            "Lon": markets["Lon"].to_numpy()[market],
+        },
+        columns=COLUMNS,
+    )
+
+
+def write_prices(rows, path, seed=0):
+    """
+    Description: Generate a price table and write it as a csv, unless the same table was already written
+
+    Args:
+    rows (int): Number of rows to generate
+    path (str): Path of the csv to write
+    seed (int): Seed of the random generator
+
+    Returns:
+    (str): Path of the csv
+    """
+    stamp = path + ".{}-{}-{}".format(rows, seed, datetime.now().date())
+    if os.path.exists(path) and os.path.exists(stamp):
+        return path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    generate_prices(rows, seed=seed).to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    for name in os.listdir(os.path.dirname(path) or "."):
+        if name.startswith(os.path.basename(path) + "."):
+            os.remove(os.path.join(os.path.dirname(path) or ".", name))
+    open(stamp, "w").close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("rows", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_prices(args.rows, args.path, seed=args.seed)
+    print("{:,} rows written to {}".format(args.rows, args.path))
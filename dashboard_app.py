@@ -0,0 +1,1522 @@
+"""
+The dashboard itself: the app, its layout, its callbacks and the price data they read.
+Importing it loads everything, use dashboard_crop_price.create_app instead.
+"""
+
+import os
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from dash import (
+    Dash,
+    html,
+    Input,
+    Output,
+    State,
+    dcc,
+    dependencies,
+    ctx,
+    no_update,
+    Patch,
+    ClientsideFunction,
+)
+from dash.exceptions import MissingCallbackContextException
+import dash_bootstrap_components as dbc
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+import numpy as np
+from downsampling import relayout_x_range, visible_points
+from figure_cache import FigureCache, normalize_regions, to_json_ready
+from geojson_assets import register_geojson
+from geojson_lod import level_paths
+from icon_assets import icon_option, load_manifest, register_icon_caching
+from instrumentation import CallbackMetrics, current_callback
+from price_api import register_api
+from price_cache import load_cached_prices, source_signature
+from price_dimensions import PriceDimensions, load_markets
+from price_ingest import PriceIngestor, SqliteIngestor, merge_rows
+from price_sqlite import open_sqlite_store
+from price_store import PriceStore
+from response_encoding import (
+    COMPRESSION,
+    configure_json_engine,
+    register_compression,
+)
+from shared_dataset import open_shared_store
+from view_warmer import (
+    WARM_CPU,
+    WARM_HALF_LIFE,
+    WARM_INTERVAL,
+    WARM_VIEWS,
+    ViewWarmer,
+)
+
+months = 12  # allow users choosing the past 12 months data
+
+
+def build_date_window(end_date):
+    """
+    Description: Build the months of the date slider ending at a date
+
+    Args:
+    end_date (date): Last date of the window, today when the data is loaded
+
+    Returns:
+    start_date (date): Only the data after this date is kept
+    date_range (DatetimeIndex): First day of every month of the slider
+    date_slider_dict (dict): Slider position -> month label, the last position is the latest data
+    date_label_dict (dict): The labels shown under the slider, every 3 months
+    """
+    start_date = end_date - relativedelta(months=months)
+    date_range = pd.date_range(
+        start_date, end_date, freq="MS"
+    )  # interval of date is per month
+    date_slider_dict = {
+        i: str(dt.strftime("%B, %Y")) for i, dt in enumerate(date_range)
+    }
+    date_slider_dict[months] = (
+        "Latest data"  # create the latest data for users to browse all regions and markets data in the most recent update basis
+    )
+
+    interval = 3  # create the date slider with interval to avoid messy label
+    date_label_dict = {
+        interval * i: str(dt.strftime("%B, %Y"))
+        for i, dt in enumerate(date_range[::interval])
+    }
+    date_label_dict[months] = "Latest data"
+    return start_date, date_range, date_slider_dict, date_label_dict
+
+
+# create date dictionary which can be used for users selecting the crop price data on certain date on map through the slider
+# the window rolls forward with the data ingestion of a long running server, see set_store
+end_date = datetime.now().date()
+start_date, date_range, date_slider_dict, date_label_dict = build_date_window(end_date)
+
+# the lists and dictionary are used for the dropdown options
+main_category = [
+    "Rice",
+    "Fish",
+    "Fruits",
+    "Highland Vegetables",
+    "Lowland Vegetables",
+    "Livestock & Poultry Products",
+    "Spices",
+    "Other",
+]
+category_dict = {
+    "Rice": [
+        "National Food Authority",
+        "Premium (Imported)",
+        "Regular Milled (Imported)",
+        "Special (Imported)",
+        "Well-milled (Imported)",
+        "Premium (Local)",
+        "Regular Milled (Local)",
+        "Special (Local)",
+        "Well-milled (Local)",
+    ],
+    "Fish": [
+        "Indian mackerel",
+        "Milkfish",
+        "Round Scad (Imported)",
+        "Round Scad (Local)",
+        "Tilapia",
+    ],
+    "Fruits": [
+        "Philippine Lime",
+        "Banana (Lakatan)",
+        "Banana (Latundan)",
+        "Mango (Carabao)",
+        "Papaya",
+    ],
+    "Highland Vegetables": [
+        "Cabbage",
+        "Carrots",
+        "Baguio Beans",
+        "White Potato",
+        "Napa Cabbage",
+        "Chayote",
+    ],
+    "Lowland Vegetables": [
+        "Bittergourd",
+        "Squash",
+        "Chinese Cabbage",
+        "String Beans",
+        "Eggplant",
+        "Tomato",
+    ],
+    "Livestock & Poultry Products": [
+        "Beef Brisket",
+        "Beef Rump",
+        "Egg",
+        "Pork Ham",
+        "Pork Liempo",
+        "Whole Chicken",
+    ],
+    "Spices": [
+        "Garlic (Imported)",
+        "Garlic (Local)",
+        "Ginger",
+        "Red Onion",
+        "Red Onion (Imported)",
+        "White Onion",
+        "White Onion (Imported)",
+        "Chili",
+    ],
+    "Other": [
+        "Cooking Oil (1L)",
+        "Cooking Oil (350mL)",
+        "Brown Sugar",
+        "Washed Sugar",
+        "Refined Sugar",
+        "Coconut Cooking Oil (350mL)",
+        "Coconut Cooking Oil (1L)",
+    ],
+}
+regions = [
+    "CAR - Cordillera Administrative Region",
+    "Ilocos Region (Region I)",
+    "Cagayan Valley (Region II)",
+    "Central Luzon (Region III)",
+    "CALBARZON (Region IV-A)",
+    "MIMAROPA Region (Region IV-B)",
+    "Bicol Region (Region V)",
+    "Western Visayas (Region VI)",
+    "Central Visayas (Region VII)",
+    "Eastern Visayas (Region VIII)",
+    "Zamboanga Peninsula (Region IX)",
+    "Northern Mindanao (Region X)",
+    "Davao Region (Region XI)",
+    "SOCCSKSARGEN (Region XII)",
+    "NCR - National Capital Region",
+    "BARMM - Bangsamoro Autonomous Region in Muslim Mindanao",
+    "Caraga (Region XIII)",
+]
+
+# legend layout for the crop price trend graph
+legend_layout = dict(
+    traceorder="normal",
+    x=0.5,  # Set the x position of the legend to the center of the plot
+    y=-0.3,  # Set the y position of the legend to be below the plot
+    xanchor="center",  # Anchor the x position to the center of the legend
+    yanchor="top",  # Anchor the y position to the top of the legend
+    orientation="h",  # Set the orientation of the legend to horizontal
+    font=dict(size=24),  # Set the font size of the legend text
+    bgcolor="#E2E2E2",  # Set the background color of the legend
+    bordercolor="gray",  # Set the border color of the legend
+    borderwidth=1,  # Set the border width of the legend
+)
+
+
+# read the crop price dataset once, only the data in the latest year is kept
+# the typed columnar cache is loaded instead of the csv when it is up to date
+# the store keeps the market, region, coordinates and main category of the rows once, in
+# dimension tables built from data/market.csv, and the prices as a compact fact table, the
+# markets missing from market.csv are reported, see price_dimensions.py
+# the store keeps the rows sorted by (Category, Region, Date) with an offset index,
+# and precomputes the max/mean/min/count per (Category, Region, Date) and (Category, Date)
+# so the callbacks read slices of it instead of filtering and re-aggregating the raw rows
+# when PRICE_SHARED_DIR is set, the workers attach read-only to one memory-mapped copy
+# of the store instead of holding a private copy each, see shared_dataset.py
+# with PRICE_BACKEND=sqlite the whole history is kept in a local SQLite file instead, and the
+# callbacks push the filters and the aggregation down to it, see price_sqlite.py
+def load_store(window_start=None):
+    window_start = window_start or start_date
+    if os.environ.get("PRICE_BACKEND") == "sqlite":
+        return open_sqlite_store(
+            "data/bantaypresyo.csv",
+            os.environ.get("PRICE_SQLITE_PATH", "data/cache/bantaypresyo.sqlite"),
+            window_start,
+            region_order=regions,
+        )
+    df, source = load_cached_prices("data/bantaypresyo.csv", window_start)
+    return PriceStore(
+        df,
+        region_order=regions,
+        dimensions=PriceDimensions.build(df, load_markets("data/market.csv")),
+        source_offset=source["size"],
+    )
+
+
+if os.environ.get("PRICE_SHARED_DIR") and os.environ.get("PRICE_BACKEND") != "sqlite":
+    store = open_shared_store(
+        os.environ["PRICE_SHARED_DIR"],
+        signature={
+            "source": source_signature("data/bantaypresyo.csv", with_hash=False),
+            "markets": source_signature("data/market.csv", with_hash=False),
+            "start_date": str(start_date),
+        },
+        build_store=load_store,
+        region_order=regions,
+    )
+else:
+    store = load_store()
+cube = store.cube
+
+# rendered figures per normalized (category, regions, slider), dropped whenever the data reloads
+figure_cache = FigureCache(maxsize=256, ttl=600)
+
+
+def set_store(new_store, new_end_date=None):
+    """
+    Description: Swap in a reloaded price store, the figures cached from the previous data are dropped.
+    Each global is replaced by one assignment and the callbacks read the store once per call,
+    so a running callback keeps the store it started with.
+
+    Args:
+    new_store (PriceStore): The reloaded store
+    new_end_date (date): Last date of the store's date window, None when the window did not move
+    """
+    global store, cube, end_date, start_date, date_range, date_slider_dict, date_label_dict
+    if new_end_date is not None:
+        end_date = new_end_date
+        start_date, date_range, date_slider_dict, date_label_dict = build_date_window(
+            end_date
+        )
+    # the store is swapped before the cache generation moves on, see read_store
+    store = new_store
+    cube = new_store.cube
+    figure_cache.clear()
+    if warmer is not None:
+        warmer.schedule()
+
+
+def read_store():
+    """
+    Description: Read the current store with the generation of the figure cache it renders for.
+    The generation is read first: when set_store swaps the store in between, the renders of
+    either store are returned but not cached as the new data.
+
+    Returns:
+    (PriceStore, int): The store and the cache generation
+    """
+    generation = figure_cache.generation
+    return store, generation
+
+
+def ingest_rows(new_rows):
+    """
+    Description: Merge newly ingested rows into a new store, roll the date window forward
+    when the day changed and drop the rows that left it, then swap them in
+
+    Args:
+    new_rows (DataFrame): New price rows, None when only the date window is checked
+    """
+    today = datetime.now().date()
+    if new_rows is None and today == end_date:
+        return
+    set_store(
+        merge_rows(store, new_rows, build_date_window(today)[0], region_order=regions),
+        today if today != end_date else None,
+    )
+
+
+def reload_store():
+    """
+    Description: Reload the whole csv, when it was rewritten instead of appended to
+
+    Returns:
+    (int): Size of the part of the csv the reloaded rows were read from
+    """
+    today = datetime.now().date()
+    reloaded = load_store(build_date_window(today)[0])
+    set_store(reloaded, today)
+    return reloaded.source_offset
+
+
+# watch the csv (and a drop directory) for new rows when PRICE_INGEST_INTERVAL is set, see price_ingest.py
+# with PRICE_SHARED_DIR every worker merges the new rows into a private copy of the store
+# with PRICE_BACKEND=sqlite the workers share the database, the rows are inserted once
+ingestor = None
+if (
+    os.environ.get("PRICE_INGEST_INTERVAL")
+    and os.environ.get("PRICE_BACKEND") == "sqlite"
+):
+    ingestor = SqliteIngestor(
+        "data/bantaypresyo.csv",
+        store.database_path,
+        on_rows=ingest_rows,
+        on_reload=reload_store,
+        interval=float(os.environ["PRICE_INGEST_INTERVAL"]),
+        incoming_dir=os.environ.get("PRICE_INCOMING_DIR"),
+        version=store.version,
+    )
+elif os.environ.get("PRICE_INGEST_INTERVAL"):
+    ingestor = PriceIngestor(
+        "data/bantaypresyo.csv",
+        on_rows=ingest_rows,
+        on_reload=reload_store,
+        interval=float(os.environ["PRICE_INGEST_INTERVAL"]),
+        incoming_dir=os.environ.get("PRICE_INCOMING_DIR"),
+        # the rows appended after the bytes the loaded or attached rows were read from
+        offset=store.source_offset,
+    )
+
+# ------------------------------------------------------------------------------
+# App layout
+app = Dash(
+    __name__,
+    external_stylesheets=[dbc.themes.BOOTSTRAP, "styles.css"],
+    meta_tags=[{"name": "viewport", "width": "device-width, , initial-scale=5"}],
+)
+
+app.title = "Cultivest Price Monitoring"
+
+# time spent building the dashboard, set by dashboard_crop_price.create_app
+startup_seconds = None
+
+# time every phase of the callbacks and expose the latency and payload percentiles on /metrics
+metrics = CallbackMetrics()
+metrics.register(app)
+metrics.add_gauges(
+    lambda: [
+        (
+            "dashboard_figure_cache_" + name,
+            "Rendered figure cache " + name + ".",
+            {},
+            value,
+        )
+        for name, value in figure_cache.stats().items()
+    ]
+    + [
+        (
+            "dashboard_store_lookup_" + name,
+            "Price store lookup " + name + ".",
+            {},
+            value,
+        )
+        for name, value in store.lookup_stats().items()
+    ]
+    + (
+        [
+            (
+                "dashboard_markets_missing",
+                "Markets of the prices missing from data/market.csv.",
+                {},
+                len(store.dimensions.missing),
+            )
+        ]
+        if hasattr(store, "dimensions")
+        else []
+    )
+    + (
+        [
+            (
+                "dashboard_startup_seconds",
+                "Time to build the dashboard, from the imports to the registered callbacks.",
+                {},
+                startup_seconds,
+            )
+        ]
+        if startup_seconds is not None
+        else []
+    )
+)
+to_json_ready = metrics.phase("figure_json")(to_json_ready)
+
+# serialize the figures with orjson when PRICE_JSON_ENGINE=orjson, and compress the responses
+# larger than PRICE_COMPRESS_MIN_BYTES, see response_encoding.py
+configure_json_engine()
+if COMPRESSION != "off":
+    register_compression(app)
+
+
+def get_data_version():
+    """
+    Description: Describe the version of the loaded data, the ETags of the API exports derive from it
+
+    Returns:
+    (str): Changes when the csv is rewritten or appended to, rows are ingested or the date window moves
+    """
+    signature = source_signature("data/bantaypresyo.csv", with_hash=False)
+    return "{}-{}-{}-{}".format(
+        signature["size"],
+        signature["mtime_ns"],
+        start_date,
+        store.lookup_stats()["rows"],
+    )
+
+
+# read-only JSON/CSV API of the aggregates and streaming export of the rows, see price_api.py
+register_api(app, lambda: store, get_data_version)
+
+# the categories of every main category with their icon, rendered as dropdown options in the browser
+# the icons are the fingerprinted thumbnails built by icon_assets.py, cached by the browsers for a year
+icon_manifest = load_manifest()
+register_icon_caching(app)
+category_options_data = {
+    main: [icon_option(app, category, icon_manifest) for category in categories]
+    for main, categories in category_dict.items()
+}
+
+# serve the GeoJSON files for the use of plotting map once as cacheable assets,
+# the map figures only reference their url instead of embedding the boundaries.
+# One file per level of detail (see geojson_lod.py), from the coarsest to the finest
+geojson_levels = [
+    (min_zoom, register_geojson(app, path, "regions-" + name))
+    for name, min_zoom, path in level_paths()
+]
+
+
+def get_geojson_url(zoom_range):
+    """
+    Description: Pick the finest level of detail of the region boundaries needed at a zoom
+
+    Args:
+    zoom_range (float): Zoom of the map
+
+    Returns:
+    (str): Url of the GeoJSON asset
+    """
+    url = geojson_levels[0][1]
+    for min_zoom, level_url in geojson_levels:
+        if zoom_range >= min_zoom:
+            url = level_url
+    return url
+
+
+def serve_layout():
+    """
+    Description: Build the page on every load, so that a page opened after the date window
+    rolled forward gets the new slider months
+    """
+    return html.Div(
+        [
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.Label("Main category"),
+                            dcc.Dropdown(
+                                className="custom-dropdown",
+                                id="select_main_category",
+                                options=[
+                                    {"label": item, "value": item}
+                                    for item in main_category
+                                ],
+                                multi=False,
+                                value=None,
+                                clearable=False,
+                                placeholder="Select main category...",
+                                optionHeight=40,
+                                style={
+                                    "text-align": "left",
+                                    "backgroundColor": "#f2f2f2",
+                                },
+                            ),
+                            html.Br(),
+                            html.Label("Category"),
+                            dcc.Dropdown(
+                                id="select_category",
+                                placeholder="Select category...",
+                                clearable=False,
+                                style={
+                                    "text-align": "left",
+                                    "backgroundColor": "#f2f2f2",
+                                    "margin": "auto",
+                                    "height": "100px",
+                                    "overflow-x": "visible",
+                                },
+                                optionHeight=100,
+                            ),
+                            html.Br(),
+                            html.Br(),
+                        ]
+                    ),
+                    html.Div(
+                        [
+                            html.Label("Regions"),
+                            dcc.Dropdown(
+                                id="select_region",
+                                multi=True,
+                                placeholder="Filter regions",
+                                style={
+                                    "text-align": "left",
+                                    "backgroundColor": "#f2f2f2",
+                                },
+                                optionHeight=65,
+                            ),
+                            dcc.Checklist(
+                                id="show_anomalies",
+                                options=[
+                                    {"label": " Show price anomalies", "value": "show"}
+                                ],
+                                value=[],
+                                style={"text-align": "left", "margin-top": "10px"},
+                            ),
+                        ],
+                    ),
+                ],
+                className="dropdowns",
+            ),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            dcc.Graph(
+                                id="crop_price_map",
+                                figure={},
+                                style={
+                                    "height": "700px",
+                                    "width": "700px",
+                                    "margin": "auto",
+                                },
+                            ),
+                        ],
+                        className="crop-price-map",
+                    ),
+                    html.Div(
+                        [
+                            html.Div(
+                                dcc.Slider(
+                                    id="date_slider",
+                                    min=0,
+                                    max=months,
+                                    step=1,
+                                    value=months,
+                                    marks=date_label_dict,
+                                ),
+                                className="col-md-11",
+                            ),
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            dcc.Textarea(
+                                                id="textarea_1",
+                                                readOnly=True,
+                                                contentEditable=False,
+                                                style={
+                                                    "width": "110px",
+                                                    "height": "30px",
+                                                    "fontSize": "18px",
+                                                },
+                                            )
+                                        ],
+                                    ),
+                                ],
+                                className="text_area_date col-md-1",
+                            ),
+                        ],
+                        className="row price-map-date-slider",
+                    ),
+                ],
+            ),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.Div(
+                                [
+                                    dcc.Textarea(
+                                        id="textarea_2_category",
+                                        readOnly=True,
+                                        contentEditable=False,
+                                        style={
+                                            "width": "100%",
+                                            "height": "67%",
+                                            "backgroundColor": "transparent",
+                                            "border": "none",
+                                            "borderRight": "1px dashed gray",
+                                            "borderBottom": "2px dashed gray",
+                                            "fontSize": "24px",
+                                        },
+                                    ),
+                                    dcc.Textarea(
+                                        id="textarea_2_date",
+                                        readOnly=True,
+                                        contentEditable=False,
+                                        style={
+                                            "width": "100%",
+                                            "height": "33%",
+                                            "backgroundColor": "transparent",
+                                            "border": "none",
+                                            "borderRight": "1px dashed gray",
+                                            "fontSize": "24px",
+                                        },
+                                    ),
+                                ],
+                                className="trend-category-date-box",
+                            ),
+                            html.Div(
+                                [
+                                    dcc.Textarea(
+                                        id="textarea_2_price_range",
+                                        readOnly=True,
+                                        contentEditable=False,
+                                        style={
+                                            "width": "100%",
+                                            "height": "40%",
+                                            "backgroundColor": "transparent",
+                                            "border": "none",
+                                            "margin": "auto",
+                                            "verticalAlign": "middle",
+                                        },
+                                    ),
+                                    dcc.Textarea(
+                                        id="textarea_2_price_avg",
+                                        readOnly=True,
+                                        contentEditable=False,
+                                        style={
+                                            "width": "100%",
+                                            "height": "60%",
+                                            "backgroundColor": "transparent",
+                                            "border": "none",
+                                            "margin": "auto",
+                                            "verticalAlign": "middle",
+                                            "fontSize": "40px",
+                                        },
+                                    ),
+                                ],
+                                className="trend-price-range-box",
+                            ),
+                        ],
+                        className="trend-price-info-box",
+                    ),
+                    html.Div(
+                        dcc.Graph(
+                            id="crop_price_trend",
+                            figure={},
+                            responsive=True,
+                            style={"height": "800px", "width": "100%"},
+                        ),
+                        className="crop_price_trend",
+                    ),
+                ],
+                className="six columns",
+                style={"text-align": "center"},
+            ),
+            # static lookups shipped to the browser once, used by the clientside callbacks
+            dcc.Store(id="category_options_data", data=category_options_data),
+            dcc.Store(id="date_slider_labels", data=date_slider_dict),
+            # first month of the slider of this page, the positions keep their month after a roll
+            dcc.Store(id="date_window", data=str(date_range[0].date())),
+        ],
+        className="overall-layout",
+    )
+
+
+app.layout = serve_layout
+
+if ingestor is not None:
+    # started by the first request of every worker process
+    app.server.before_request(ingestor.start)
+
+
+# create a dependent category dropdown based on the main category choice
+# the options are rendered in the browser from category_options_data, see assets/clientside.js
+app.clientside_callback(
+    ClientsideFunction(namespace="prices", function_name="categoryOptions"),
+    Output("select_category", "options"),
+    Input("select_main_category", "value"),
+    State("category_options_data", "data"),
+)
+
+# show the month chosen in the date slider
+app.clientside_callback(
+    ClientsideFunction(namespace="prices", function_name="sliderLabel"),
+    Output("textarea_1", "value"),
+    Input("date_slider", "value"),
+    State("date_slider_labels", "data"),
+)
+
+
+# create a dependent region filter that the users can only choose regions the the are avilable
+@app.callback(
+    [dependencies.Output("select_region", "options")],
+    [dependencies.Input("select_category", "value")],
+)
+@metrics.callback
+def set_region_options(select_category):
+    """
+    Description: When a category is chosen, return the regions in which it has prices.
+    The category -> regions map is precomputed by the store whenever the data is loaded.
+
+    Args:
+    select_category (str): Category
+
+    Returns:
+    (list): Region dropdown options
+    """
+    options = [
+        {"label": region, "value": region}
+        for region in store.available_regions(select_category)
+    ]
+    return (options,)
+
+
+# columns of the region statistics shown in the map hover labels, in the order of customdata
+map_region_custom_data = [
+    "Maximum Price",
+    "Average Price",
+    "Minimum Price",
+    "Date",
+    "Region",
+    "Median Price",
+    "P10 Price",
+    "P90 Price",
+    "markets",
+]
+# the statistics shown in the trend hover labels, precomputed with the cube as the region ones
+trend_custom_data = [
+    "Maximum Price",
+    "Minimum Price",
+    "Average Price",
+    "Median Price",
+    "P10 Price",
+    "P90 Price",
+    "markets",
+]
+map_market_custom_data = ["Market", "Price", "Date"]
+# the region is not shown, it resolves a click on a flagged price, see clicked_region
+anomaly_custom_data = ["Market", "Price", "Date", "Reason", "Region"]
+anomaly_hovertemplate = (
+    "%{customdata[0]}<br>"
+    + "Price: ₱%{customdata[1]:.2f}<br>"
+    + "Date: %{customdata[2]}<br>"
+    + "%{customdata[3]}<extra>Anomaly</extra>"
+)
+
+
+def slider_month(slider_date, window_start=None):
+    """
+    Description: Find the month of a date slider position
+
+    Args:
+    slider_date (int): User's selected position of the date slider
+    window_start (str): First month of the slider of the user's page, None for the current window
+
+    Returns:
+    (Timestamp): First day of the month, None for the latest data
+    """
+    if slider_date == months:
+        return None
+    if window_start is None:
+        return date_range[slider_date]
+    return pd.Timestamp(window_start) + pd.DateOffset(months=slider_date)
+
+
+@metrics.phase("map_data")
+def get_map_data(selected_category, selected_region, month, price_store=None):
+    """
+    Description: Prepare the data of the map for the date that the user chooses in date_slider
+
+    Args:
+    selected_category (str): User's selected category
+    selected_region (list): User's selected regions, None or [] for all regions
+    month (Timestamp): Any date in the selected month, None for the latest data
+    price_store (PriceStore): Store read by the calling callback, the current store by default
+
+    Returns:
+    df_map_region (DataFrame): Latest price statistics of every region in the selected month
+    df_map_market (DataFrame): Latest price of every market in the selected month
+    """
+    # the latest price of every market and the latest statistics of every region in the month
+    # chosen in date_slider are precomputed per (category, year-month) when the data loads
+    # df_map_market means the data will be used to plot the heat map with all market listed in the markers
+    # df_map_region will generalise the data in a region by the markets in it
+    price_store = price_store or store
+    df_map_region, df_map_market = price_store.map_view(
+        selected_category, selected_region, month
+    )
+    df_map_market = df_map_market.assign(
+        Date=df_map_market["Date"].dt.strftime("%Y-%m-%d")
+    )
+    df_map_region = df_map_region.assign(
+        Date=df_map_region["Date"].dt.strftime("%Y-%m-%d"),
+        **{"Average Price": np.round(df_map_region["Average Price"], 1)},
+    )
+    return df_map_region, df_map_market
+
+
+@metrics.phase("trend_data")
+def get_trend_data(selected_category, selected_region, price_store=None):
+    """
+    Description: Prepare the data to plot the time series of the price trend in selected region.
+    By default, selected_region is empty, all regions will be plotted, if selected_region has value, some regions will be filtered
+
+    Args:
+    selected_category (str): User's selected category
+    selected_region (list): User's selected regions, None or [] for all regions
+    price_store (PriceStore): Store read by the calling callback, the current store by default
+
+    Returns:
+    (DataFrame): Price statistics per date, and per region when regions are selected
+    """
+    price_cube = (price_store or store).cube
+    if selected_region not in ([], None):
+        df_trend = price_cube.region_slice(selected_category, selected_region)
+    else:
+        df_trend = price_cube.national_slice(selected_category)
+    df_trend["Average Price"] = np.round(df_trend["Average Price"], 1)
+    return df_trend
+
+
+@metrics.phase("anomaly_data")
+def get_anomaly_data(selected_category, selected_region, price_store=None):
+    """
+    Description: Read the flagged prices of the selected category and regions, see price_anomalies.py
+
+    Args:
+    selected_category (str): User's selected category
+    selected_region (list): User's selected regions, None or [] for all regions
+    price_store (PriceStore): Store read by the calling callback, the current store by default
+
+    Returns:
+    (DataFrame): Spikes and regional outliers with a Reason column describing them
+    """
+    df_anomalies = (price_store or store).anomalies(selected_category)
+    if selected_region not in ([], None):
+        df_anomalies = df_anomalies[df_anomalies["Region"].isin(selected_region)]
+    if df_anomalies.empty:
+        # nothing flagged, e.g. no price in the date window
+        return df_anomalies.assign(
+            Date=pd.Series(dtype=object), Reason=pd.Series(dtype=object)
+        )
+    reasons = [
+        "<br>".join(
+            (
+                ["{:+.0%} vs recent median ₱{:.2f}".format(change, baseline)]
+                if spike
+                else []
+            )
+            + (
+                ["z-score {:.1f} among the region's markets".format(z)]
+                if outlier
+                else []
+            )
+        )
+        for change, baseline, z, spike, outlier in zip(
+            df_anomalies["Change"],
+            df_anomalies["Baseline"],
+            df_anomalies["Z-Score"],
+            df_anomalies["Spike"],
+            df_anomalies["Regional Outlier"],
+        )
+    ]
+    return df_anomalies.assign(
+        Date=df_anomalies["Date"].dt.strftime("%Y-%m-%d"), Reason=reasons
+    )
+
+
+def get_map_anomalies(df_anomalies, df_map_market):
+    """
+    Description: Keep the flagged prices shown on the map, the latest price of a market in the month
+
+    Returns:
+    (DataFrame): Lat, Lon and anomaly_custom_data of the flagged markers
+    """
+    return df_map_market[["Region", "Market", "Date", "Lat", "Lon"]].merge(
+        df_anomalies[["Region", "Market", "Date", "Price", "Reason"]],
+        on=["Region", "Market", "Date"],
+    )
+
+
+def get_map_center(df_map_market, selected_region):
+    """
+    Description: Parameters set to style the map, the map zooms on the markets of the selected regions
+
+    Returns:
+    zoom_range (float): Zoom of the map
+    center (dict): Latitude and longitude of the center of the map
+    marker_size (int): Size of the market markers
+    """
+    if selected_region not in ([], None):
+        return (
+            6,
+            {"lat": df_map_market["Lat"].mean(), "lon": df_map_market["Lon"].mean()},
+            16,
+        )
+    return 4.8, {"lat": 12.8, "lon": 122.8}, 10
+
+
+@metrics.phase("map_figure")
+def build_map_figure(df_map_region, df_map_market, selected_region, df_anomalies=None):
+    """
+    Description: Plot the price heat map, the regions colored by their average price and the markets as markers.
+    With df_anomalies, the flagged markers are circled in red by a third trace.
+
+    Returns:
+    (Figure): The map plot figure
+    """
+    zoom_range, center, marker_size = get_map_center(df_map_market, selected_region)
+
+    # ========================================
+    # Plot the Price Heat Map (Map box with boundary of region)
+    # ========================================
+    fig_map = px.choropleth_mapbox(
+        data_frame=df_map_region,
+        locations="Region",
+        color="Average Price",
+        custom_data=map_region_custom_data,
+        featureidkey="properties.REGION",
+        geojson=get_geojson_url(zoom_range),
+        mapbox_style="carto-positron",
+        color_continuous_scale="RdYlGn",
+        range_color=[df_map_market["Price"].min(), df_map_market["Price"].max()],
+        zoom=zoom_range,
+        opacity=0.2,
+        center=center,
+    )
+
+    fig_map.update_traces(
+        hovertemplate="%{customdata[4]}</b>"
+        + "<br>Average price: ₱%{customdata[1]}</br>"
+        + "Median price: ₱%{customdata[5]:.2f}</br>"
+        + "P10 - P90: ₱%{customdata[6]:.2f} - ₱%{customdata[7]:.2f}</br>"
+        + "Maximum price: ₱%{customdata[0]}</br>"
+        + "Minimum price: ₱%{customdata[2]}</br>"
+        + "Markets: %{customdata[8]}</br>"
+        + "Date: %{customdata[3]}</br>"
+    )
+
+    # ========================================
+    # Plot the Price Heat Map (Markers with position of market)
+    # ========================================
+    fig_map.add_trace(
+        go.Scattermapbox(
+            lat=df_map_market["Lat"],
+            lon=df_map_market["Lon"],
+            mode="markers",
+            marker=dict(
+                size=marker_size,
+                color=df_map_market["Price"],
+                colorscale="RdYlGn",
+                cmin=df_map_market["Price"].min(),
+                cmax=df_map_market["Price"].max(),
+                opacity=1,
+            ),
+            line=dict(width=2, color="DarkSlateGrey"),
+            hovertemplate="%{customdata[0]}<br>"
+            + "Price: ₱%{marker.color:.2f}<br>"
+            + "Date: %{customdata[2]}<extra></extra>",
+            customdata=df_map_market[map_market_custom_data],
+        )
+    )
+
+    if df_anomalies is not None:
+        df_map_anomalies = get_map_anomalies(df_anomalies, df_map_market)
+        fig_map.add_trace(
+            go.Scattermapbox(
+                lat=df_map_anomalies["Lat"],
+                lon=df_map_anomalies["Lon"],
+                mode="markers",
+                name="Price anomalies",
+                marker=dict(size=marker_size * 2.5, color="crimson", opacity=0.35),
+                hovertemplate=anomaly_hovertemplate,
+                customdata=df_map_anomalies[anomaly_custom_data],
+            )
+        )
+
+    fig_map.update_layout(
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        font={"size": 18},
+        hoverlabel=dict(font=dict(size=24)),
+        coloraxis_colorbar=dict(title="Average price", x=1.1),
+    )
+    return fig_map
+
+
+@metrics.phase("map_patch")
+def patch_map_figure(df_map_region, df_map_market, selected_region, df_anomalies=None):
+    """
+    Description: When only the date slider moves, update the values and colors of the map in place
+    instead of re-sending the whole figure. The traces are the ones built by build_map_figure,
+    with the anomaly trace when df_anomalies is given.
+
+    Returns:
+    (Patch): Partial update of the map figure
+    """
+    price_min = df_map_market["Price"].min()
+    price_max = df_map_market["Price"].max()
+
+    fig_map = Patch()
+    fig_map["data"][0]["locations"] = df_map_region["Region"].tolist()
+    fig_map["data"][0]["z"] = df_map_region["Average Price"].to_numpy()
+    fig_map["data"][0]["customdata"] = df_map_region[
+        map_region_custom_data
+    ].values.tolist()
+    fig_map["layout"]["coloraxis"]["cmin"] = price_min
+    fig_map["layout"]["coloraxis"]["cmax"] = price_max
+
+    fig_map["data"][1]["lat"] = df_map_market["Lat"].to_numpy()
+    fig_map["data"][1]["lon"] = df_map_market["Lon"].to_numpy()
+    fig_map["data"][1]["marker"]["color"] = df_map_market["Price"].to_numpy()
+    fig_map["data"][1]["marker"]["cmin"] = price_min
+    fig_map["data"][1]["marker"]["cmax"] = price_max
+    fig_map["data"][1]["customdata"] = df_map_market[
+        map_market_custom_data
+    ].values.tolist()
+
+    if df_anomalies is not None:
+        df_map_anomalies = get_map_anomalies(df_anomalies, df_map_market)
+        fig_map["data"][2]["lat"] = df_map_anomalies["Lat"].to_numpy()
+        fig_map["data"][2]["lon"] = df_map_anomalies["Lon"].to_numpy()
+        fig_map["data"][2]["customdata"] = df_map_anomalies[
+            anomaly_custom_data
+        ].values.tolist()
+
+    # the map is centered on the markets of the selected regions, which depend on the month
+    if selected_region not in ([], None):
+        fig_map["layout"]["mapbox"]["center"] = get_map_center(
+            df_map_market, selected_region
+        )[1]
+    return fig_map
+
+
+def trend_traces(df_trend, selected_region, x_range=None):
+    """
+    Description: List the traces of the trend with the points to plot, long traces are downsampled
+
+    Args:
+    df_trend (DataFrame): Price statistics per date, and per region when regions are selected
+    selected_region (list): User's selected regions, None or [] for all regions
+    x_range (tuple): (start, end) of the dates the user zoomed to, None for the whole trend
+
+    Returns:
+    (list): (trace name, color, rows to plot, price column) of every trace
+    """
+    if selected_region not in ([], None):
+        textarea_region = (", ").join(selected_region)
+    else:
+        textarea_region = "Philippine"
+
+    # If number of selected_region <= 1, all average, minimum and maximum price will be plotted
+    # If number of selected_region > 1, only average price will be plotted
+    if selected_region in ([], None) or len(selected_region) == 1:
+        traces = [
+            ("{} - {}".format(textarea_region, trace), color, df_trend, trace)
+            for color, trace in zip(
+                ["green", "red", "goldenrod"],
+                ["Maximum Price", "Minimum Price", "Average Price"],
+            )
+        ]
+    else:
+        traces = [
+            (
+                "{} - {}".format(region, "Average Price"),
+                None,
+                df_trend[df_trend["Region"] == region],
+                "Average Price",
+            )
+            for region in selected_region
+        ]
+    return [
+        (
+            name,
+            color,
+            df_rows.iloc[visible_points(df_rows["Date"], df_rows[trace], x_range)],
+            trace,
+        )
+        for name, color, df_rows, trace in traces
+    ]
+
+
+@metrics.phase("trend_patch")
+def patch_trend_figure(df_trend, selected_region, x_range):
+    """
+    Description: Update only the points of the trend traces after a zoom, the layout and
+    therefore the zoom of the user's graph are kept
+
+    Returns:
+    (Patch): The trace updates
+    """
+    fig_trend = Patch()
+    for i, (name, color, df_points, trace) in enumerate(
+        trend_traces(df_trend, selected_region, x_range)
+    ):
+        fig_trend["data"][i]["x"] = df_points["Date"].dt.strftime("%Y-%m-%d").tolist()
+        fig_trend["data"][i]["y"] = df_points[trace].to_numpy()
+        fig_trend["data"][i]["customdata"] = df_points[
+            trend_custom_data
+        ].values.tolist()
+    return fig_trend
+
+
+@metrics.phase("trend_figure")
+def build_trend_figure(df_trend, selected_region, df_anomalies=None):
+    """
+    Description: Plot the price trend of the selected category.
+    With df_anomalies, the flagged market prices are marked after the trend traces.
+
+    Returns:
+    (Figure): The time series plot in Philippines region
+    """
+    # ========================================
+    # Plot the Price Trend Map
+    # ========================================
+    fig_trend = go.Figure()
+    for name, color, df_points, trace in trend_traces(df_trend, selected_region):
+        fig_trend.add_trace(
+            go.Scatter(
+                x=df_points["Date"],
+                y=df_points[trace],
+                name=name,
+                hovertemplate="Date: %{x}<br>"
+                + "Maximum Price: ₱%{customdata[0]:.2f}<br>"
+                + "Minimum Price: ₱%{customdata[1]:.2f}<br>"
+                + "Average Price: ₱%{customdata[2]:.2f}<br>"
+                + "Median Price: ₱%{customdata[3]:.2f}<br>"
+                + "P10 - P90: ₱%{customdata[4]:.2f} - ₱%{customdata[5]:.2f}<br>"
+                + "Markets: %{customdata[6]}<br>",
+                marker=dict(color=color) if color else None,
+                opacity=0.5,
+                customdata=df_points[trend_custom_data].values.tolist(),
+            )
+        )
+
+    if df_anomalies is not None:
+        fig_trend.add_trace(
+            go.Scatter(
+                x=df_anomalies["Date"],
+                y=df_anomalies["Price"],
+                name="Price anomalies",
+                mode="markers",
+                marker=dict(color="crimson", symbol="x", size=12),
+                hovertemplate=anomaly_hovertemplate,
+                customdata=df_anomalies[anomaly_custom_data].values.tolist(),
+            )
+        )
+
+    fig_trend.update_layout(
+        legend=legend_layout,
+        yaxis=dict(title="Price", fixedrange=True),
+        xaxis=dict(
+            rangeselector=dict(
+                buttons=list(
+                    [
+                        dict(count=7, label="1w", step="day", stepmode="backward"),
+                        dict(count=1, label="1m", step="month", stepmode="backward"),
+                        dict(count=6, label="6m", step="month", stepmode="backward"),
+                        dict(count=1, label="YTD", step="year", stepmode="backward"),
+                    ]
+                )
+            ),
+            rangeslider=dict(
+                visible=True,
+                thickness=0.05,
+            ),
+            type="date",
+        ),
+        margin=dict(l=30, r=30, t=20, b=150),
+        plot_bgcolor="rgba(245, 245, 245, 1)",
+        paper_bgcolor="rgba(200,200, 200, 0)",
+        font={"size": 24},
+        hoverlabel=dict(font=dict(size=24)),
+    )
+    return fig_trend
+
+
+@metrics.phase("info_text")
+def get_info_text(df_trend):
+    """
+    Description: Define the text area words, the prices of the latest date of the trend
+
+    Returns:
+    textarea_2_date (str): Date of the shown prices
+    textarea_2_price_range (str): Minimum and maximum price
+    textarea_2_price_avg (str): Average price
+    """
+    last_row = df_trend.tail(1)
+    if last_row.empty:
+        return "", "", ""
+    textarea_2_price_range = "Price range: ₱{} - ₱{}".format(
+        last_row["Minimum Price"].values[0],
+        last_row["Maximum Price"].values[0],
+    )
+    textarea_2_price_avg = "Average: ₱{}".format(last_row["Average Price"].values[0])
+    textarea_2_date = last_row["Date"].dt.strftime("%d %b, %Y").to_string(index=False)
+    return textarea_2_date, textarea_2_price_range, textarea_2_price_avg
+
+
+def clicked_region(selected_region, point):
+    """
+    Description: Find the region of the trace clicked on the trend. The trend has one trace per
+    region when several regions are selected, in the order of selected_region, and otherwise the
+    three price traces of the selected region or of the whole country. The anomaly trace comes last.
+
+    Args:
+    selected_region (list): User's selected regions, sorted, None or [] for all regions
+    point (dict): Clicked point of the trend clickData
+
+    Returns:
+    (str): Region, None for the whole country
+    """
+    if selected_region in ([], None):
+        return None
+    if len(selected_region) == 1:
+        return selected_region[0]
+    curve = point.get("curveNumber", 0)
+    if curve < len(selected_region):
+        return selected_region[curve]
+    # a flagged market price, its region is in its customdata
+    customdata = point.get("customdata") or []
+    position = anomaly_custom_data.index("Region")
+    return customdata[position] if len(customdata) > position else None
+
+
+@metrics.phase("click_info")
+def get_click_info(selected_category, selected_region, click_data, price_store=None):
+    """
+    Description: Define the text area words for the point clicked on the trend. The prices of the
+    clicked (category, region, date) are read from the cube index, the trend is not sliced.
+
+    Args:
+    selected_category (str): User's selected category
+    selected_region (list): User's selected regions, sorted, None or [] for all regions
+    click_data (dict): Clicked point of the trend
+    price_store (PriceStore): Store read by the calling callback, the current store by default
+
+    Returns:
+    textarea_2_date (str): Clicked date
+    textarea_2_price_range (str): Minimum and maximum price, empty without prices that day
+    textarea_2_price_avg (str): Average price, empty without prices that day
+    """
+    point = click_data["points"][0]
+    clicked_date = pd.Timestamp(point["x"])
+    statistics = (price_store or store).cube.lookup(
+        selected_category, clicked_date, clicked_region(selected_region, point)
+    )
+    textarea_2_date = clicked_date.strftime("%d %b, %Y")
+    if statistics is None:
+        return textarea_2_date, "", ""
+    textarea_2_price_range = "Price range: ₱{} - ₱{}".format(
+        statistics["Minimum Price"], statistics["Maximum Price"]
+    )
+    # rounded as in the trend data
+    textarea_2_price_avg = "Average: ₱{}".format(
+        np.round(statistics["Average Price"], 1)
+    )
+    return textarea_2_date, textarea_2_price_range, textarea_2_price_avg
+
+
+def get_triggered_prop():
+    # the callbacks are also called directly by the benchmarks, outside of a Dash request
+    try:
+        return ctx.triggered[0]["prop_id"]
+    except MissingCallbackContextException:
+        return None
+
+
+# graph responding part
+@app.callback(
+    [
+        Output(component_id="crop_price_map", component_property="figure"),
+        Output(component_id="crop_price_trend", component_property="figure"),
+        Output(component_id="textarea_2_category", component_property="value"),
+        Output("textarea_2_date", "value"),
+        Output("textarea_2_price_range", "value"),
+        Output("textarea_2_price_avg", "value"),
+    ],
+    [
+        Input(component_id="select_category", component_property="value"),
+        Input(component_id="select_main_category", component_property="value"),
+        Input(component_id="date_slider", component_property="value"),
+        Input(component_id="select_region", component_property="value"),
+        Input(component_id="crop_price_trend", component_property="clickData"),
+        Input(component_id="crop_price_trend", component_property="relayoutData"),
+        Input(component_id="show_anomalies", component_property="value"),
+    ],
+    State("date_window", "data"),
+)
+@metrics.callback
+def update_graph(
+    selected_category,
+    selected_main_category,
+    slider_date,
+    selected_region,
+    click_data,
+    relayout_data=None,
+    show_anomalies=None,
+    window_start=None,
+):
+    """
+    Description: Moving the date slider only patches the map values and colors,
+    clicking on the trend only updates the text areas,
+    zooming on the trend only patches its points at the resolution of the visible range,
+    any other change rebuilds both figures.
+
+    Args:
+    select_category : User's selected category.
+    select_main_category : User's selected main category
+    slider_date : User's slected date (month) through the slider
+    select_region: User's selected region. By default the value is none,
+                where the users will see all regions and markets in the map.
+    click_data: Point of the trend clicked by the user
+    relayout_data: Zoom, range slider or range selector change of the trend
+    show_anomalies: ["show"] to overlay the flagged prices on the map and the trend
+    window_start: First month of the date slider of the user's page
+
+    Returns:
+    fig_map: The map plot figure
+    fig_trend: The time series plot in Philippines region
+    textarea_2_category: User's selected_category, which is the same as the input of select_category
+    textarea_2_date, textarea_2_price_range, textarea_2_price_avg: Prices of the clicked or latest date
+    """
+    triggered = get_triggered_prop()
+    # read once, a store swapped in by the ingestion meanwhile is used from the next call
+    price_store, generation = read_store()
+    month = slider_month(slider_date, window_start)
+
+    # the same regions selected in another order share one cache entry and are plotted in sorted order
+    regions_key = normalize_regions(selected_region)
+    selected_region = list(regions_key) or None
+    anomalies = bool(show_anomalies)
+
+    if triggered == "date_slider.value":
+        view = ("month", selected_category, regions_key, month, anomalies)
+        if warmer is not None:
+            warmer.record(view)
+        ((key, render),) = view_renders(view, price_store)
+        fig_map = figure_cache.get_or_compute(key, render, generation)
+        return (fig_map,) + (no_update,) * 5
+
+    if triggered == "crop_price_trend.relayoutData":
+        x_range = relayout_x_range(relayout_data)
+        if x_range is None:
+            return (no_update,) * 6
+        fig_trend = figure_cache.get_or_compute(
+            ("trend_patch", selected_category, regions_key, x_range),
+            lambda: patch_trend_figure(
+                get_trend_data(selected_category, selected_region, price_store),
+                selected_region,
+                x_range or None,
+            ),
+            generation,
+        )
+        return (no_update, fig_trend) + (no_update,) * 4
+
+    if triggered == "crop_price_trend.clickData":
+        return (no_update,) * 3 + get_click_info(
+            selected_category, selected_region, click_data, price_store
+        )
+
+    view = ("full", selected_category, regions_key, month, anomalies)
+    if warmer is not None:
+        warmer.record(view)
+    fig_map, fig_trend, info_text = [
+        figure_cache.get_or_compute(key, render, generation)
+        for key, render in view_renders(view, price_store)
+    ]
+    if click_data:
+        info_text = get_click_info(
+            selected_category, selected_region, click_data, price_store
+        )
+    textarea_2_category = selected_category
+
+    return (fig_map, fig_trend, textarea_2_category) + info_text
+
+
+def view_renders(view, price_store):
+    """
+    Description: List the cached outputs of a view, shared by update_graph and the warming of the hot views
+
+    Args:
+    view (tuple): (kind, category, regions, month, anomalies), kind is "full" for a full update
+                and "month" for a move of the date slider
+    price_store (PriceStore): Store read by the calling callback
+
+    Returns:
+    (list): (cache key, function rendering the output) of the map patch for a "month" view,
+    and of the map, the trend and the text areas of the latest date for a "full" view
+    """
+    kind, selected_category, regions_key, month, anomalies = view
+    selected_region = list(regions_key) or None
+    data = {}
+
+    def trend_data():
+        # sliced once for the trend and the text areas
+        if "trend" not in data:
+            data["trend"] = get_trend_data(
+                selected_category, selected_region, price_store
+            )
+        return data["trend"]
+
+    def anomaly_data():
+        if not anomalies:
+            return None
+        return get_anomaly_data(selected_category, selected_region, price_store)
+
+    if kind == "month":
+        return [
+            (
+                ("map_patch", selected_category, regions_key, month, anomalies),
+                lambda: patch_map_figure(
+                    *get_map_data(
+                        selected_category, selected_region, month, price_store
+                    ),
+                    selected_region,
+                    anomaly_data(),
+                ),
+            )
+        ]
+    return [
+        (
+            ("map", selected_category, regions_key, month, anomalies),
+            lambda: to_json_ready(
+                build_map_figure(
+                    *get_map_data(
+                        selected_category, selected_region, month, price_store
+                    ),
+                    selected_region,
+                    anomaly_data(),
+                )
+            ),
+        ),
+        (
+            ("trend", selected_category, regions_key, anomalies),
+            lambda: to_json_ready(
+                build_trend_figure(trend_data(), selected_region, anomaly_data())
+            ),
+        ),
+        (
+            ("info", selected_category, regions_key),
+            lambda: get_info_text(trend_data()),
+        ),
+    ]
+
+
+def warm_view(view):
+    """
+    Description: Render the outputs of a view that are not cached or about to expire
+
+    Returns:
+    (int): Number of outputs rendered
+    """
+    # the phases of the warming are reported apart from the ones of the requests
+    current_callback.set("warm_views")
+    # rendered again when they would expire before the next warming
+    refresh_after = max(figure_cache.ttl - (WARM_INTERVAL or 0), figure_cache.ttl / 2)
+    price_store, generation = read_store()
+    return sum(
+        figure_cache.warm(key, render, refresh_after, generation)
+        for key, render in view_renders(view, price_store)
+    )
+
+
+def is_view_warm(view):
+    return all(figure_cache.contains(key) for key, _ in view_renders(view, store))
+
+
+# render the PRICE_WARM_VIEWS most requested views ahead of the requests, after every reload of
+# the data and every PRICE_WARM_INTERVAL seconds, within PRICE_WARM_CPU of one core, see view_warmer.py
+warmer = None
+if WARM_VIEWS > 0:
+    warmer = ViewWarmer(
+        warm_view,
+        is_view_warm,
+        top=WARM_VIEWS,
+        interval=WARM_INTERVAL,
+        cpu_budget=WARM_CPU,
+        half_life=WARM_HALF_LIFE,
+        busy=lambda: metrics.running > 0,
+    )
+    # started by the first request of every worker process
+    app.server.before_request(warmer.start)
+    metrics.add_gauges(
+        lambda: [
+            ("dashboard_warm_" + name, "Hot view warming " + name + ".", {}, value)
+            for name, value in warmer.coverage().items()
+        ]
+    )
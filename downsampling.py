@@ -0,0 +1,138 @@
+"""
+Downsampling of the trend traces, so that long histories are sent with a bounded number of points.
+
+Two methods pick the points to keep:
+    lttb     Largest-Triangle-Three-Buckets, keeps the visual shape of the line
+    minmax   the lowest and the highest point of every bucket, keeps the spikes
+
+Configured with environment variables:
+    PRICE_TREND_MAX_POINTS=500       most points of one trace in the visible range
+    PRICE_TREND_DOWNSAMPLING=lttb    lttb, minmax or off
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = int(os.environ.get("PRICE_TREND_MAX_POINTS", "500"))
+METHOD = os.environ.get("PRICE_TREND_DOWNSAMPLING", "lttb")
+
+
+def lttb(x, y, threshold):
+    """
+    Description: Largest-Triangle-Three-Buckets downsampling
+
+    Args:
+    x (ndarray): Increasing x values
+    y (ndarray): y values
+    threshold (int): Number of points to keep
+
+    Returns:
+    (ndarray): Positions of the kept points, the first and the last point are always kept
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    buckets = np.array_split(np.arange(1, n - 1), threshold - 2)
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i, bucket in enumerate(buckets):
+        following = buckets[i + 1] if i + 1 < len(buckets) else np.array([n - 1])
+        # the point of the bucket making the largest triangle with the previous kept point
+        # and the average point of the next bucket
+        mean_x = x[following].mean()
+        mean_y = np.nanmean(y[following]) if np.isfinite(y[following]).any() else 0.0
+        area = np.abs(
+            (x[previous] - mean_x) * (y[bucket] - y[previous])
+            - (x[previous] - x[bucket]) * (mean_y - y[previous])
+        )
+        previous = bucket[int(np.argmax(np.nan_to_num(area, nan=-1.0)))]
+        kept[i + 1] = previous
+    return kept
+
+
+def minmax(x, y, threshold):
+    """
+    Description: Min/max bucketing, the lowest and the highest point of threshold / 2 buckets
+
+    Args:
+    x (ndarray): Increasing x values
+    y (ndarray): y values
+    threshold (int): Number of points to keep
+
+    Returns:
+    (ndarray): Sorted positions of the kept points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype="float64"), nan=np.nanmean(y))
+    kept = [0, n - 1]
+    for bucket in np.array_split(np.arange(n), max((threshold - 2) // 2, 1)):
+        kept += [bucket[np.argmin(y[bucket])], bucket[np.argmax(y[bucket])]]
+    return np.unique(kept)
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+
+def visible_points(dates, values, x_range=None, max_points=None, method=None):
+    """
+    Description: Choose the points of a trace to send. Without a range the whole trace is
+    capped to max_points. With the range the user zoomed to, the points inside it are
+    capped to max_points and the rest is kept as a coarse overview for the range slider.
+
+    Args:
+    dates (Series): Dates of the trace, increasing
+    values (Series): Values of the trace
+    x_range (tuple): (start, end) of the visible dates, None for the whole trace
+    max_points (int): Most points in the visible range, PRICE_TREND_MAX_POINTS by default
+    method (str): lttb, minmax or off, PRICE_TREND_DOWNSAMPLING by default
+
+    Returns:
+    (ndarray): Sorted positions of the points to plot
+    """
+    max_points = max_points or MAX_POINTS
+    method = method or METHOD
+    n = len(dates)
+    if method == "off" or n <= max_points:
+        return np.arange(n)
+    downsample = METHODS[method]
+    x = dates.to_numpy().astype("datetime64[ns]").astype(np.int64)
+    y = values.to_numpy()
+    if x_range is None:
+        return downsample(x, y, max_points)
+
+    start, end = (pd.Timestamp(bound).value for bound in x_range)
+    inside = np.flatnonzero((x >= start) & (x <= end))
+    overview = downsample(x, y, max(max_points // 4, 3))
+    overview = overview[(x[overview] < start) | (x[overview] > end)]
+    inside = inside[downsample(x[inside], y[inside], max_points)]
+    return np.union1d(overview, inside)
+
+
+def relayout_x_range(relayout_data):
+    """
+    Description: Read the visible date range from the relayoutData of the trend graph
+
+    Args:
+    relayout_data (dict): relayoutData of a zoom, a range slider move or a range selector click
+
+    Returns:
+    (tuple): (start, end) of the visible dates, () when the zoom was reset,
+    None when the relayout did not change the x axis
+    """
+    if not relayout_data:
+        return None
+    if relayout_data.get("xaxis.autorange"):
+        return ()
+    if "xaxis.range" in relayout_data:
+        return tuple(relayout_data["xaxis.range"][:2])
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        return relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    return None
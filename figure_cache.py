@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+from response_encoding import loads
+
+
+class FigureCache:
+    """
+    Description: Bounded LRU cache of rendered callback outputs with a time to live.
+    The least recently used entry is evicted when maxsize is reached, and entries
+    older than ttl seconds are recomputed. Hits and misses are counted for monitoring.
+    """
+
+    def __init__(self, maxsize=256, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, generation=None):
+        """
+        Description: Return the cached value of a key, computing and storing it on a miss
+
+        Args:
+        key (tuple): Normalized, hashable description of the callback inputs
+        compute (callable): Builds the value when it is not cached or has expired
+        generation (int): Generation of the cache read before the data compute reads,
+        the current one by default. A value computed from the data of an older generation
+        is returned but not stored.
+
+        Returns:
+        The cached or newly computed value
+        """
+        now = time.monotonic()
+        with self._lock:
+            if generation is None:
+                generation = self.generation
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and now - entry[0] < self.ttl
+                and generation == self.generation
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # computed outside of the lock so that slow renders do not block the cache hits
+        value = compute()
+        with self._lock:
+            # a value computed from the data before a reload is returned but not stored
+            if generation != self.generation:
+                return value
+            self._store(key, value)
+        return value
+
+    def warm(self, key, compute, refresh_after=None, generation=None):
+        """
+        Description: Compute and store the value of a key ahead of the requests, unless it is
+        cached and younger than refresh_after. The hits and misses only count the requests.
+
+        Args:
+        key (tuple): Normalized, hashable description of the callback inputs
+        compute (callable): Builds the value
+        refresh_after (float): Age in seconds from which a cached value is computed again, the ttl by default
+        generation (int): Generation of the cache read before the data compute reads, as in get_or_compute
+
+        Returns:
+        (bool): Whether the value was computed
+        """
+        refresh_after = self.ttl if refresh_after is None else refresh_after
+        with self._lock:
+            if generation is None:
+                generation = self.generation
+            if generation != self.generation:
+                return False
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < refresh_after:
+                return False
+
+        value = compute()
+        with self._lock:
+            if generation == self.generation:
+                self._store(key, value)
+        return True
+
+    def contains(self, key):
+        """
+        Description: Whether a key is cached and not expired, without counting a lookup
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    def clear(self):
+        """
+        Description: Drop every entry, to be called whenever the dataset reloads
+        """
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        """
+        Description: Report the size and the counters of the cache
+
+        Returns:
+        (dict): Number of entries, hits, misses, evictions and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _store(self, key, value):
+        # called with the lock held
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+def to_json_ready(fig):
+    """
+    Description: Serialize a figure once into plain JSON types, so a cached figure
+    is re-sent without the Plotly validation and numpy conversion.
+    Encoded and decoded with the JSON engine of response_encoding.
+
+    Args:
+    fig (Figure): Plotly figure
+
+    Returns:
+    (dict): The figure as decoded JSON
+    """
+    return loads(to_json_plotly(fig))
+
+
+def normalize_regions(selected_region):
+    """
+    Description: Turn the region dropdown value into a cache key part,
+    the same regions selected in another order share one entry
+
+    Args:
+    selected_region (list): User's selected regions, None or [] for all regions
+
+    Returns:
+    (tuple): Sorted regions, empty for all regions
+    """
+    return tuple(sorted(selected_region)) if selected_region else ()
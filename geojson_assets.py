@@ -0,0 +1,36 @@
+import hashlib
+
+from flask import Response, request
+
+# fingerprinted urls never change content, so browsers may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def register_geojson(app, path, name):
+    """
+    Description: Serve a GeoJSON file once as a cacheable static asset of the Dash server,
+    so the map figures reference its url instead of embedding the boundaries in every response.
+    The url is fingerprinted with the content hash, and the response carries an ETag
+    so that a revalidation is answered with 304 Not Modified.
+
+    Args:
+    app (Dash): The dashboard app
+    path (str): Path of the GeoJSON file
+    name (str): Name of the asset in the url
+
+    Returns:
+    (str): Url of the asset, relative to the app prefix, to be passed as geojson of the map traces
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    etag = hashlib.sha256(content).hexdigest()[:16]
+    route = "/geojson/{}.{}.json".format(name, etag)
+
+    def serve_geojson():
+        response = Response(content, mimetype="application/geo+json")
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    app.server.add_url_rule(route, endpoint="geojson_" + name, view_func=serve_geojson)
+    return app.get_relative_path(route)
@@ -0,0 +1,261 @@
+"""
+Levels of detail of the region boundaries, one GeoJSON file per map zoom.
+
+The boundaries are cut into arcs at the points where regions meet, as TopoJSON does,
+and every arc is simplified once with Douglas-Peucker, so two neighbouring regions keep
+exactly the same border: no gap or overlap appears between them. The coordinates are then
+quantized (rounded to a fixed number of decimals) and the files are written without spaces.
+
+The map picks the level from its zoom: the national view (zoom 4.8) uses the coarse level,
+the regional view (zoom 6) the detailed one.
+
+Usage:
+    python geojson_lod.py build      # write the level files listed in LEVELS
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+SOURCE_PATH = "data/philippine_region_simplify.json"
+
+# (name, minimum map zoom, simplification tolerance in degrees, decimals kept)
+# a pixel of the 700px map is about 0.05 degree at zoom 4.8 and 0.02 degree at zoom 6
+LEVELS = [
+    ("national", 0, 0.01, 3),
+    ("regional", 6, 0.0, 4),
+]
+
+
+def level_path(name, source_path=SOURCE_PATH):
+    root, extension = os.path.splitext(source_path)
+    return "{}.{}{}".format(root, name, extension)
+
+
+def simplify_line(points, tolerance):
+    """
+    Description: Douglas-Peucker simplification of a line, the end points are kept
+
+    Args:
+    points (ndarray): (n, 2) coordinates
+    tolerance (float): Largest distance of a removed point to the simplified line
+
+    Returns:
+    (ndarray): The kept points
+    """
+    if tolerance <= 0 or len(points) <= 2:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        between = points[first + 1 : last] - start
+        length = np.hypot(*segment)
+        if length == 0:
+            distance = np.hypot(between[:, 0], between[:, 1])
+        else:
+            distance = np.abs(np.cross(segment, between)) / length
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack += [(first, middle), (middle, last)]
+    return points[keep]
+
+
+def _rings(geometry):
+    polygons = (
+        geometry["coordinates"]
+        if geometry["type"] == "MultiPolygon"
+        else [geometry["coordinates"]]
+    )
+    return polygons
+
+
+def _junctions(features):
+    """
+    Description: Find the points where the boundary of a ring starts or stops being shared
+    with another ring, the arcs are cut there
+
+    Returns:
+    (set): Junction points as (lon, lat) tuples
+    """
+    owners = {}
+    rings = []
+    for feature in features:
+        for polygon in _rings(feature["geometry"]):
+            for ring in polygon:
+                ring = [tuple(point) for point in ring[:-1]]
+                rings.append(ring)
+                for point in ring:
+                    owners.setdefault(point, set()).add(len(rings) - 1)
+
+    junctions = set()
+    for ring in rings:
+        for i, point in enumerate(ring):
+            shared = owners[point]
+            if len(shared) > 1 and (
+                owners[ring[i - 1]] != shared
+                or owners[ring[(i + 1) % len(ring)]] != shared
+            ):
+                junctions.add(point)
+    return junctions
+
+
+def simplify_ring(ring, junctions, arcs, tolerance, decimals):
+    """
+    Description: Simplify a closed ring arc by arc, an arc shared with a neighbouring ring
+    is simplified once and reused, reversed when it runs the other way
+
+    Args:
+    ring (list): Closed ring of [lon, lat] points
+    junctions (set): Points where the arcs are cut
+    arcs (dict): Simplified arcs by their canonical point sequence, filled as rings are simplified
+    tolerance (float): Douglas-Peucker tolerance in degrees
+    decimals (int): Decimals kept in the coordinates
+
+    Returns:
+    (list): The simplified closed ring, None when it collapsed
+    """
+    points = [tuple(point) for point in ring[:-1]]
+    cuts = [i for i, point in enumerate(points) if point in junctions]
+    if cuts:
+        # start the ring at a junction, so every arc runs from a junction to the next one
+        points = points[cuts[0] :] + points[: cuts[0]]
+        cuts = [i - cuts[0] for i in cuts]
+    else:
+        # a ring shared with no other ring is one arc, cut at its farthest point
+        # so that the simplification keeps at least a triangle
+        first = np.array(points[0])
+        farthest = int(np.argmax(np.hypot(*(np.array(points) - first).T)))
+        cuts = [0, farthest] if farthest else [0]
+    cuts.append(len(points))
+    points.append(points[0])
+
+    simplified = []
+    for start, stop in zip(cuts[:-1], cuts[1:]):
+        arc = tuple(points[start : stop + 1])
+        reverse = arc[::-1] < arc
+        key = arc[::-1] if reverse else arc
+        if key not in arcs:
+            arcs[key] = [
+                tuple(point)
+                for point in np.round(
+                    simplify_line(np.array(key), tolerance), decimals
+                ).tolist()
+            ]
+        line = arcs[key][::-1] if reverse else arcs[key]
+        simplified += line if not simplified else line[1:]
+
+    # points merged by the rounding are written once
+    ring = [simplified[0]] + [
+        point
+        for previous, point in zip(simplified[:-1], simplified[1:])
+        if point != previous
+    ]
+    if len(ring) < 4:
+        return None
+    return [list(point) for point in ring]
+
+
+def build_level(geojson, tolerance, decimals):
+    """
+    Description: Simplify and quantize every boundary of a GeoJSON FeatureCollection,
+    keeping the borders shared by the regions identical
+
+    Args:
+    geojson (dict): FeatureCollection of Polygon and MultiPolygon features
+    tolerance (float): Douglas-Peucker tolerance in degrees, 0 to only quantize
+    decimals (int): Decimals kept in the coordinates
+
+    Returns:
+    (dict): The simplified FeatureCollection
+    """
+    features = geojson["features"]
+    junctions = _junctions(features)
+    arcs = {}
+    simplified_features = []
+    for feature in features:
+        polygons = []
+        for polygon in _rings(feature["geometry"]):
+            rings = [
+                simplify_ring(ring, junctions, arcs, tolerance, decimals)
+                for ring in polygon
+            ]
+            # a polygon whose outline collapsed, i.e. an islet smaller than the tolerance, is dropped
+            if rings[0] is not None:
+                polygons.append([ring for ring in rings if ring is not None])
+        if not polygons:
+            # never drop a whole region, keep its largest polygon unsimplified
+            polygons = [max(_rings(feature["geometry"]), key=lambda p: len(p[0]))]
+        simplified_features.append(
+            dict(
+                feature,
+                geometry={"type": "MultiPolygon", "coordinates": polygons},
+            )
+        )
+    return dict(geojson, features=simplified_features)
+
+
+def build_levels(source_path=SOURCE_PATH):
+    """
+    Description: Write one simplified GeoJSON file per level of LEVELS next to the source file
+
+    Returns:
+    (list): (name, path, vertices, bytes) of every written level
+    """
+    with open(source_path) as f:
+        geojson = json.load(f)
+    written = [
+        ("source", source_path, _vertices(geojson), os.path.getsize(source_path))
+    ]
+    for name, _, tolerance, decimals in LEVELS:
+        level = build_level(geojson, tolerance, decimals)
+        path = level_path(name, source_path)
+        with open(path, "w") as f:
+            json.dump(level, f, separators=(",", ":"))
+        written.append((name, path, _vertices(level), os.path.getsize(path)))
+    return written
+
+
+def level_paths(source_path=SOURCE_PATH):
+    """
+    Description: List the level files by minimum zoom, the source file is used for a missing level
+
+    Returns:
+    (list): (name, minimum zoom, path) of every level
+    """
+    paths = []
+    for name, min_zoom, _, _ in LEVELS:
+        path = level_path(name, source_path)
+        paths.append((name, min_zoom, path if os.path.exists(path) else source_path))
+    return paths
+
+
+def _vertices(geojson):
+    return sum(
+        len(ring)
+        for feature in geojson["features"]
+        for polygon in _rings(feature["geometry"])
+        for ring in polygon
+    )
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        for name, path, vertices, size in build_levels():
+            print(
+                "{:>9}: {:>6} vertices, {:>9,} bytes  {}".format(
+                    name, vertices, size, path
+                )
+            )
+    else:
+        sys.exit(__doc__)
@@ -0,0 +1,9 @@
+# production settings of gunicorn, read by `gunicorn wsgi:server` from the working directory
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# build the dashboard and load the price data once in the master, before forking the workers
+preload_app = True
+timeout = 120
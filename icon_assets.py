@@ -0,0 +1,291 @@
+"""
+Thumbnails of the category icons, sized for the 90x90 px category dropdown.
+
+The source icons in assets/icons are full-size JPEGs. The build crops every icon to a
+centered square (as object-fit: cover does) and writes it at 1x and 2x in AVIF and WebP,
+with a JPEG fallback, and optionally one WebP sprite sheet of every icon.
+The file names carry the hash of their content, so the browsers may cache them forever:
+a changed icon gets a new name. The manifest lists the files of every category and is
+read by the dashboard to build the dropdown options; without a manifest the dashboard
+falls back to the source JPEGs.
+
+Building requires Pillow (with AVIF support for the AVIF thumbnails), the dashboard does not.
+
+Usage:
+    python icon_assets.py build [--sprite]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import shutil
+
+from flask import request
+
+from geojson_assets import IMMUTABLE_CACHE_CONTROL
+
+# directories inside the Dash assets folder, as in the asset urls
+ICONS = "icons"
+OPTIMIZED = "icons/optimized"
+SOURCE_DIR = os.path.join("assets", ICONS)
+OUTPUT_DIR = os.path.join("assets", OPTIMIZED)
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "manifest.json")
+
+# displayed size of the icons in the dropdown, in css pixels
+ICON_SIZE = 90
+SCALES = [1, 2]
+
+# (format, mime type, save options), in the order the browser should prefer them
+FORMATS = [
+    ("avif", "image/avif", {"quality": 50}),
+    ("webp", "image/webp", {"quality": 80, "method": 6}),
+]
+FALLBACK = (
+    "jpeg",
+    "image/jpeg",
+    {"quality": 82, "optimize": True, "progressive": True},
+)
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def fingerprinted_name(stem, content, extension):
+    return "{}.{}.{}".format(stem, hashlib.sha256(content).hexdigest()[:10], extension)
+
+
+def encode(image, image_format, options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format.upper(), **options)
+    return buffer.getvalue()
+
+
+def thumbnail(path, size):
+    """
+    Description: Crop an icon to a centered square and resize it
+
+    Args:
+    path (str): Path of the source icon
+    size (int): Side of the thumbnail in pixels
+
+    Returns:
+    (Image): RGB thumbnail
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        return ImageOps.fit(image, (size, size), Image.LANCZOS)
+
+
+def _write(content, stem, extension, output_dir):
+    name = fingerprinted_name(stem, content, extension)
+    with open(os.path.join(output_dir, name), "wb") as f:
+        f.write(content)
+    return name
+
+
+def build_icons(source_dir=SOURCE_DIR, output_dir=OUTPUT_DIR, sprite=False):
+    """
+    Description: Write the thumbnails of every source icon and the manifest listing them.
+    The output directory is emptied first, so no stale fingerprint is left behind.
+
+    Args:
+    source_dir (str): Directory of the <Category>.jpeg icons
+    output_dir (str): Directory of the thumbnails, inside the Dash assets folder
+    sprite (bool): Also write one WebP sprite sheet of every icon at 2x
+
+    Returns:
+    (dict): The manifest
+    """
+    from PIL import Image, features
+
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    formats = [
+        image_format
+        for image_format in FORMATS
+        if image_format[0] != "avif" or features.check("avif")
+    ]
+
+    categories = sorted(
+        os.path.splitext(name)[0]
+        for name in os.listdir(source_dir)
+        if name.lower().endswith((".jpeg", ".jpg"))
+    )
+    manifest = {"size": ICON_SIZE, "icons": {}}
+    thumbnails = {}
+    for category in categories:
+        source = os.path.join(source_dir, category + ".jpeg")
+        images = {scale: thumbnail(source, ICON_SIZE * scale) for scale in SCALES}
+        thumbnails[category] = images[max(SCALES)]
+        entry = {"sources": []}
+        for extension, mimetype, options in formats:
+            names = {
+                scale: _write(
+                    encode(images[scale], extension, options),
+                    "{}@{}x".format(slug(category), scale),
+                    extension,
+                    output_dir,
+                )
+                for scale in SCALES
+            }
+            entry["sources"].append({"type": mimetype, "files": names})
+        extension, _, options = FALLBACK
+        entry["fallback"] = {
+            scale: _write(
+                encode(images[scale], extension, options),
+                "{}@{}x".format(slug(category), scale),
+                extension,
+                output_dir,
+            )
+            for scale in SCALES
+        }
+        manifest["icons"][category] = entry
+
+    if sprite and thumbnails:
+        # one row-major grid of the 2x thumbnails
+        cell = ICON_SIZE * max(SCALES)
+        columns = math.ceil(math.sqrt(len(thumbnails)))
+        rows = math.ceil(len(thumbnails) / columns)
+        sheet = Image.new("RGB", (columns * cell, rows * cell), "white")
+        for i, category in enumerate(categories):
+            sheet.paste(
+                thumbnails[category], ((i % columns) * cell, (i // columns) * cell)
+            )
+            manifest["icons"][category]["sprite"] = [i % columns, i // columns]
+        extension, _, options = FORMATS[1]
+        manifest["sprite"] = {
+            "file": _write(
+                encode(sheet, extension, options), "sprite", extension, output_dir
+            ),
+            "columns": columns,
+            "rows": rows,
+        }
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Description: Read the manifest of the thumbnails
+
+    Returns:
+    (dict): The manifest, None when the thumbnails were not built
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def icon_option(app, category, manifest=None):
+    """
+    Description: Describe the icon of a category for the dropdown options rendered in the browser
+
+    Args:
+    app (Dash): The dashboard app
+    category (str): Category
+    manifest (dict): Manifest of the thumbnails, None to use the source JPEG
+
+    Returns:
+    (dict): value, icon (the url of the img element), and when built srcSet of the icon,
+    sources (type and srcSet of every picture source) and sprite (url, background size and position)
+    """
+    entry = (manifest or {}).get("icons", {}).get(category)
+    if entry is None:
+        return {
+            "value": category,
+            "icon": app.get_asset_url("{}/{}.jpeg".format(ICONS, category)),
+        }
+
+    def url(name):
+        return app.get_asset_url("{}/{}".format(OPTIMIZED, name))
+
+    def src_set(files):
+        return ", ".join(
+            "{} {}x".format(url(name), scale) for scale, name in sorted(files.items())
+        )
+
+    option = {
+        "value": category,
+        "icon": url(entry["fallback"]["1"]),
+        "srcSet": src_set(entry["fallback"]),
+        "sources": [
+            {"type": source["type"], "srcSet": src_set(source["files"])}
+            for source in entry["sources"]
+        ],
+    }
+    sprite = manifest.get("sprite")
+    if sprite is not None and "sprite" in entry:
+        column, row = entry["sprite"]
+        size = manifest["size"]
+        option["sprite"] = {
+            "url": url(sprite["file"]),
+            "size": "{}px {}px".format(sprite["columns"] * size, sprite["rows"] * size),
+            "position": "{}px {}px".format(-column * size, -row * size),
+        }
+    return option
+
+
+def register_icon_caching(app):
+    """
+    Description: Let the browsers keep the fingerprinted thumbnails for a year without revalidating
+
+    Args:
+    app (Dash): The dashboard app
+    """
+    prefix = app.get_asset_url(OPTIMIZED + "/")
+
+    @app.server.after_request
+    def cache_thumbnails(response):
+        if (
+            request.path.startswith(prefix)
+            and not request.path.endswith(".json")
+            and response.status_code in (200, 304)
+        ):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument(
+        "--sprite",
+        action="store_true",
+        help="also write one sprite sheet of every icon",
+    )
+    arguments = parser.parse_args()
+    built = build_icons(sprite=arguments.sprite)
+    sizes = {
+        name: os.path.getsize(os.path.join(OUTPUT_DIR, name))
+        for name in os.listdir(OUTPUT_DIR)
+    }
+    source_bytes = sum(
+        os.path.getsize(os.path.join(SOURCE_DIR, category + ".jpeg"))
+        for category in built["icons"]
+    )
+    print(
+        "{} icons, {:,} bytes of source JPEGs".format(len(built["icons"]), source_bytes)
+    )
+    for extension in sorted({name.rsplit(".", 1)[1] for name in sizes}):
+        for scale in SCALES:
+            marker = "@{}x.".format(scale)
+            total = sum(
+                size
+                for name, size in sizes.items()
+                if name.endswith("." + extension) and marker in name
+            )
+            if total:
+                print("  {:>5} {}x: {:>10,} bytes".format(extension, scale, total))
+    if "sprite" in built:
+        print("  sprite: {:>10,} bytes".format(sizes[built["sprite"]["file"]]))
@@ -0,0 +1,277 @@
+"""
+Per-callback latency and payload instrumentation.
+
+Every instrumented callback records its total time and the time of each phase
+(data selection, aggregation, figure building, ...) in a bounded window of recent samples.
+The Dash update requests also record the response payload size and the time spent
+outside of the callback, which is mostly the JSON encoding of the outputs.
+The p50/p95/p99 of the window are exposed on /metrics in the Prometheus text format.
+
+Profiling slow requests is opt-in through environment variables:
+    PRICE_PROFILE_SLOW_MS=200        profile every callback, keep the profiles of the ones slower than 200 ms
+    PRICE_PROFILE_DIR=profiles       where the profiles are written
+    PRICE_PROFILER=pyinstrument      use pyinstrument (html output) instead of cProfile
+"""
+
+import cProfile
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from flask import Response, g
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+# name of the callback running in the current request, the phases are recorded under it
+current_callback = contextvars.ContextVar("current_callback", default="none")
+
+
+class Samples:
+    """
+    Description: Count, sum and a bounded window of the recent values of one measurement
+    """
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantiles(self):
+        if not self.recent:
+            return [float("nan")] * len(QUANTILES)
+        return list(np.quantile(np.fromiter(self.recent, float), QUANTILES))
+
+
+class CallbackMetrics:
+    """
+    Description: Registry of the phase durations and payload sizes of the Dash callbacks
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self.durations = {}
+        self.payloads = {}
+        self.gauges = []
+        # number of instrumented callbacks running now, background work yields to them
+        self.running = 0
+        self._lock = threading.Lock()
+        self.profile_threshold = _env_float("PRICE_PROFILE_SLOW_MS")
+        self.profile_dir = os.environ.get("PRICE_PROFILE_DIR", "profiles")
+        self.profiler = os.environ.get("PRICE_PROFILER", "cprofile")
+
+    def observe(self, callback, phase, seconds):
+        with self._lock:
+            key = (callback, phase)
+            if key not in self.durations:
+                self.durations[key] = Samples(self.window)
+            self.durations[key].add(seconds)
+
+    def observe_payload(self, callback, size):
+        with self._lock:
+            if callback not in self.payloads:
+                self.payloads[callback] = Samples(self.window)
+            self.payloads[callback].add(size)
+
+    def add_gauges(self, collect):
+        """
+        Description: Register a function returning extra (name, help, labels, value) gauges for /metrics
+
+        Args:
+        collect (callable): Returns a list of (metric name, help text, label dict, value)
+        """
+        self.gauges.append(collect)
+
+    def phase(self, name):
+        """
+        Description: Decorator timing a function as a phase of the callback that calls it
+
+        Args:
+        name (str): Name of the phase
+        """
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(
+                        current_callback.get(), name, time.perf_counter() - started
+                    )
+
+            return wrapper
+
+        return decorator
+
+    def callback(self, function):
+        """
+        Description: Decorator timing a whole Dash callback, its phases are recorded under its name.
+        When profiling is enabled, the callback runs under the profiler and
+        the profile is written if it took longer than the threshold.
+        """
+        name = function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = current_callback.set(name)
+            with self._lock:
+                self.running += 1
+            profiler = self._start_profiler()
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.running -= 1
+                current_callback.reset(token)
+                self.observe(name, "total", elapsed)
+                if profiler is not None:
+                    self._stop_profiler(profiler, name, elapsed)
+                # the request hooks attribute the payload and the encoding time to this callback
+                try:
+                    g.callback_name = name
+                    g.callback_seconds = elapsed
+                except RuntimeError:
+                    pass
+
+        return wrapper
+
+    def render(self):
+        """
+        Description: Format every metric in the Prometheus text exposition format
+
+        Returns:
+        (str): The /metrics response body
+        """
+        lines = []
+        with self._lock:
+            durations = sorted(self.durations.items())
+            payloads = sorted(self.payloads.items())
+
+        lines += [
+            "# HELP dashboard_callback_phase_seconds Time spent in each phase of the Dash callbacks.",
+            "# TYPE dashboard_callback_phase_seconds summary",
+        ]
+        for (callback, phase), samples in durations:
+            labels = 'callback="{}",phase="{}"'.format(callback, phase)
+            lines += _summary_lines("dashboard_callback_phase_seconds", labels, samples)
+
+        lines += [
+            "# HELP dashboard_callback_payload_bytes Size of the Dash callback responses.",
+            "# TYPE dashboard_callback_payload_bytes summary",
+        ]
+        for callback, samples in payloads:
+            labels = 'callback="{}"'.format(callback)
+            lines += _summary_lines("dashboard_callback_payload_bytes", labels, samples)
+
+        described = set()
+        for collect in self.gauges:
+            for name, help_text, labels, value in collect():
+                if name not in described:
+                    lines += [
+                        "# HELP {} {}".format(name, help_text),
+                        "# TYPE {} gauge".format(name),
+                    ]
+                    described.add(name)
+                label_text = ",".join(
+                    '{}="{}"'.format(key, val) for key, val in labels.items()
+                )
+                lines.append(
+                    "{}{} {}".format(
+                        name, "{" + label_text + "}" if label_text else "", value
+                    )
+                )
+        return "\n".join(lines) + "\n"
+
+    def register(self, app):
+        """
+        Description: Add the /metrics endpoint and the payload measurement of the Dash update requests
+
+        Args:
+        app (Dash): The dashboard app
+        """
+        server = app.server
+
+        @server.before_request
+        def start_request_timer():
+            g.request_started = time.perf_counter()
+
+        @server.after_request
+        def record_payload(response):
+            name = g.get("callback_name")
+            if name is not None and not response.direct_passthrough:
+                self.observe_payload(name, response.calculate_content_length() or 0)
+                # time of the request outside of the callback: mostly the JSON encoding of the outputs
+                self.observe(
+                    name,
+                    "serialize",
+                    time.perf_counter()
+                    - g.request_started
+                    - g.get("callback_seconds", 0.0),
+                )
+            return response
+
+        def metrics_endpoint():
+            return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+        server.add_url_rule("/metrics", endpoint="metrics", view_func=metrics_endpoint)
+
+    def _start_profiler(self):
+        if self.profile_threshold is None:
+            return None
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, profiler, name, elapsed):
+        if self.profiler == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        if elapsed * 1000 < self.profile_threshold:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stem = os.path.join(
+            self.profile_dir,
+            "{}-{}-{:.0f}ms".format(
+                re.sub(r"\W", "_", name), int(time.time() * 1000), elapsed * 1000
+            ),
+        )
+        if self.profiler == "pyinstrument":
+            with open(stem + ".html", "w") as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.dump_stats(stem + ".prof")
+
+
+def _summary_lines(metric, labels, samples):
+    lines = [
+        '{}{{{},quantile="{}"}} {}'.format(metric, labels, quantile, value)
+        for quantile, value in zip(QUANTILES, samples.quantiles())
+    ]
+    lines.append("{}_sum{{{}}} {}".format(metric, labels, samples.total))
+    lines.append("{}_count{{{}}} {}".format(metric, labels, samples.count))
+    return lines
+
+
+def _env_float(name):
+    value = os.environ.get(name)
+    return float(value) if value else None
@@ -0,0 +1,327 @@
+import numpy as np
+import pandas as pd
+
+# the statistics kept for every key of the aggregate cube
+# "sum" is stored next to "count" so that the mean can be rebuilt when new rows are merged in
+# the quantiles and "markets" (number of distinct markets) cannot be merged that way, they are
+# recomputed from the rows of the keys that received new rows
+STATISTICS = ["max", "mean", "min", "count", "sum", "median", "p10", "p90", "markets"]
+
+# quantile of every quantile statistic, interpolated linearly as pandas does
+QUANTILES = dict(p10=0.1, median=0.5, p90=0.9)
+DISTRIBUTION = list(QUANTILES) + ["markets"]
+
+# column names used by the dashboard figures and text areas
+PRICE_COLUMNS = dict(
+    max="Maximum Price",
+    mean="Average Price",
+    min="Minimum Price",
+    median="Median Price",
+    p10="P10 Price",
+    p90="P90 Price",
+)
+
+REGION_KEYS = ["Category", "Region", "Date"]
+NATIONAL_KEYS = ["Category", "Date"]
+
+
+def aggregate_prices(df, keys):
+    """
+    Description: Group the raw price rows by the given keys and compute the cube statistics
+
+    Args:
+    df (DataFrame): Price rows with at least the key columns and "Price"
+    keys (list): Columns to group by
+
+    Returns:
+    (DataFrame): Statistics indexed by the keys and sorted by the index
+    """
+    # prices may be stored as float32, aggregate them in float64 rounded back to cents
+    price = df["Price"].astype("float64").round(2)
+    grouped = price.groupby([df[key] for key in keys], observed=True)
+    aggregated = grouped.aggregate(["max", "min", "count", "sum"])
+    aggregated["mean"] = aggregated["sum"] / aggregated["count"]
+
+    # the rows of aggregated are in the order of the group numbers
+    groups = grouped.ngroup().to_numpy()
+    valid = (groups >= 0) & ~np.isnan(price.to_numpy())
+    cents = np.round(price.to_numpy()[valid] * 100).astype(np.int64)
+    quantiles = grouped_quantiles(
+        cents, groups[valid], list(QUANTILES.values()), len(aggregated)
+    )
+    for name, values in zip(QUANTILES, quantiles):
+        aggregated[name] = values / 100
+    markets, _ = column_codes(df["Market"])
+    listed = (groups >= 0) & (markets >= 0)
+    aggregated["markets"] = count_distinct(
+        groups[listed], markets[listed], len(aggregated)
+    )
+    return aggregated[STATISTICS].sort_index()
+
+
+def grouped_quantiles(values, groups, quantiles, group_count):
+    """
+    Description: Quantiles of the values of every group, with one sort of all the values
+    instead of one quantile computation per group. Interpolated linearly between the two
+    nearest values, as pandas and numpy do by default.
+
+    Args:
+    values (ndarray): Integer values, e.g. prices in cents, spanning less than 2**32
+    groups (ndarray): Group number of every value, from 0
+    quantiles (list): Quantiles to compute, from 0 to 1
+    group_count (int): Number of groups
+
+    Returns:
+    (list): One array of group_count values per quantile, NaN for the groups without values
+    """
+    # one int64 sort key (group, value) sorts several times faster than a lexsort of two arrays
+    lowest = values.min(initial=0)
+    keys = np.sort((groups.astype(np.int64) << 32) | (values - lowest))
+    ordered = (keys & 0xFFFFFFFF) + lowest
+    count = np.bincount(groups, minlength=group_count)
+    starts = np.cumsum(count) - count
+    has_values = count > 0
+    results = []
+    for quantile in quantiles:
+        position = quantile * (count - 1)
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, count - 1)
+        result = np.full(group_count, np.nan)
+        low = ordered[(starts + below)[has_values]]
+        high = ordered[(starts + above)[has_values]]
+        result[has_values] = low + (high - low) * (position - below)[has_values]
+        results.append(result)
+    return results
+
+
+def count_distinct(groups, values, group_count):
+    """
+    Description: Number of distinct values of every group
+
+    Args:
+    groups (ndarray): Group number of every row, from 0
+    values (ndarray): Integer codes of the values, from 0
+    group_count (int): Number of groups
+
+    Returns:
+    (ndarray): Distinct values per group
+    """
+    width = int(values.max(initial=0)) + 1
+    pairs = np.unique(groups.astype(np.int64) * width + values)
+    return np.bincount(pairs // width, minlength=group_count)
+
+
+def merge_aggregates(current, partial, rows, keys):
+    """
+    Description: Merge the statistics of newly arrived rows into an existing aggregate table
+
+    Args:
+    current (DataFrame): Existing statistics, as returned by aggregate_prices
+    partial (DataFrame): Statistics of the new rows, indexed by the same keys
+    rows (DataFrame): Price table including the new rows, the quantiles and the market count
+    of the keys in both current and partial are recomputed from its rows of their dates
+    keys (list): Columns the statistics are grouped by
+
+    Returns:
+    (DataFrame): Combined statistics, only the keys present in partial are recomputed
+    """
+    if current.empty:
+        return partial
+    overlap = partial.index.intersection(current.index)
+    old = current.loc[overlap]
+    new = partial.loc[overlap]
+
+    merged = pd.DataFrame(index=overlap)
+    merged["max"] = np.fmax(old["max"], new["max"])
+    merged["min"] = np.fmin(old["min"], new["min"])
+    merged["count"] = old["count"] + new["count"]
+    merged["sum"] = old["sum"] + new["sum"]
+    merged["mean"] = merged["sum"] / merged["count"]
+    if len(overlap):
+        dates = overlap.get_level_values("Date").unique()
+        recomputed = aggregate_prices(rows[rows["Date"].isin(dates)], keys)
+        for name in DISTRIBUTION:
+            merged[name] = recomputed[name].reindex(overlap).to_numpy()
+    else:
+        for name in DISTRIBUTION:
+            merged[name] = new[name]
+
+    return pd.concat(
+        [
+            current.drop(overlap),
+            merged[STATISTICS],
+            partial.drop(overlap),
+        ]
+    ).sort_index()
+
+
+class AggregateCube:
+    """
+    Description: Max/mean/min/count, median, P10/P90 and market count of the price table,
+    precomputed once when the data loads.
+    The statistics are kept per (Category, Region, Date) for the region view
+    and per (Category, Date) for the national view, so the callbacks only read slices of them.
+    """
+
+    def __init__(self, region, national):
+        self.region = region
+        self.national = national
+
+    @classmethod
+    def build(cls, df):
+        """
+        Description: Build the cube from the full price table
+
+        Args:
+        df (DataFrame): Price rows with Category, Region, Date and Price columns
+
+        Returns:
+        (AggregateCube): The precomputed cube
+        """
+        return cls(
+            aggregate_prices(df, REGION_KEYS), aggregate_prices(df, NATIONAL_KEYS)
+        )
+
+    def update(self, new_rows, rows):
+        """
+        Description: Incrementally merge newly arrived price rows into the cube. Only the rows
+        of the dates that already had statistics are aggregated again, for their quantiles
+        and market counts.
+
+        Args:
+        new_rows (DataFrame): New price rows with the same columns as the original table
+        rows (DataFrame): The whole price table, new rows included
+        """
+        if new_rows.empty:
+            return
+        self.region = merge_aggregates(
+            self.region, aggregate_prices(new_rows, REGION_KEYS), rows, REGION_KEYS
+        )
+        self.national = merge_aggregates(
+            self.national,
+            aggregate_prices(new_rows, NATIONAL_KEYS),
+            rows,
+            NATIONAL_KEYS,
+        )
+
+    def since(self, start_date):
+        """
+        Description: Drop the statistics of the dates that left the date window
+
+        Args:
+        start_date (date): Only keep the dates after this date
+
+        Returns:
+        (AggregateCube): New cube, this one is left unchanged
+        """
+        start = pd.to_datetime(start_date)
+        return AggregateCube(
+            self.region[self.region.index.get_level_values("Date") > start],
+            self.national[self.national.index.get_level_values("Date") > start],
+        )
+
+    def region_frame(self):
+        """
+        Description: Read the per region statistics of every category
+
+        Returns:
+        (DataFrame): Category, Region, Date and price statistic columns, sorted by category, region and date
+        """
+        return _as_price_frame(self.region)
+
+    def region_slice(self, category, regions=None):
+        """
+        Description: Read the per region statistics of one category
+
+        Args:
+        category (str): Selected category
+        regions (list): Selected regions, None or [] for all regions
+
+        Returns:
+        (DataFrame): Category, Region, Date and price statistic columns, sorted by region and date
+        """
+        try:
+            dff = self.region.loc[[category]]
+        except KeyError:
+            return _empty_slice(REGION_KEYS)
+        if regions not in (None, []):
+            dff = dff[dff.index.get_level_values("Region").isin(regions)]
+        return _as_price_frame(dff)
+
+    def national_slice(self, category):
+        """
+        Description: Read the statistics of one category over all the regions
+
+        Args:
+        category (str): Selected category
+
+        Returns:
+        (DataFrame): Category, Date and price statistic columns, sorted by date
+        """
+        try:
+            dff = self.national.loc[[category]]
+        except KeyError:
+            return _empty_slice(NATIONAL_KEYS)
+        return _as_price_frame(dff)
+
+    def lookup(self, category, date, region=None):
+        """
+        Description: Read the statistics of one (category, region, date) through a hash lookup
+        of the cube index, without slicing or scanning the cube. The index of every table is
+        hashed once, on the first lookup.
+
+        Args:
+        category (str): Category
+        date (Timestamp): Date
+        region (str): Region, None for the statistics over all the regions
+
+        Returns:
+        (dict): Price columns, count and markets, None when there is no price at this date
+        """
+        if region is None:
+            table, key = self.national, (category, pd.Timestamp(date))
+        else:
+            table, key = self.region, (category, region, pd.Timestamp(date))
+        try:
+            position = table.index.get_loc(key)
+        except KeyError:
+            return None
+        if not isinstance(position, (int, np.integer)):
+            return None
+        return {
+            PRICE_COLUMNS.get(name, name): table[name].iat[position]
+            for name in STATISTICS
+            if name != "sum"
+        }
+
+
+def _as_price_frame(dff):
+    dff = dff.reset_index()
+    dff["count"] = dff["count"].astype("int64")
+    dff["markets"] = dff["markets"].astype("int64")
+    return dff.drop(columns="sum").rename(columns=PRICE_COLUMNS)
+
+
+def _empty_slice(keys):
+    dff = pd.DataFrame({key: pd.Series(dtype="object") for key in keys})
+    dff["Date"] = pd.Series(dtype="datetime64[ns]")
+    for column in PRICE_COLUMNS.values():
+        dff[column] = pd.Series(dtype="float64")
+    dff["count"] = pd.Series(dtype="int64")
+    dff["markets"] = pd.Series(dtype="int64")
+    return dff
+
+
+def column_codes(column):
+    """
+    Description: Integer codes of a column, compared instead of materialising the strings
+
+    Args:
+    column (Series): Categorical or text column
+
+    Returns:
+    (ndarray, Index): Code of every row, -1 for the missing values, and the value of every code
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column)
@@ -0,0 +1,181 @@
+"""
+Vectorized detection of abnormal market prices over the whole price table.
+
+Two tests flag a price, without any loop over the markets:
+    spike              the price moved by more than PRICE_ANOMALY_CHANGE (0.5 = 50%) from the
+                       rolling median of the previous PRICE_ANOMALY_WINDOW prices of the same
+                       (Category, Market)
+    regional outlier   the z-score of the price among the markets of its (Category, Region, Date)
+                       is beyond PRICE_ANOMALY_Z, when at least PRICE_ANOMALY_MIN_MARKETS
+                       markets reported a price that day
+
+The rolling medians of every market are computed in one pass over the table sorted by
+(Category, Market, Date), with a gap of missing values between two markets so that no
+window reaches into the previous market. The z-scores come from per group sums gathered
+with bincount.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from price_aggregates import column_codes
+
+WINDOW = int(os.environ.get("PRICE_ANOMALY_WINDOW", "8"))
+MIN_PERIODS = int(os.environ.get("PRICE_ANOMALY_MIN_PERIODS", "3"))
+CHANGE = float(os.environ.get("PRICE_ANOMALY_CHANGE", "0.5"))
+Z_THRESHOLD = float(os.environ.get("PRICE_ANOMALY_Z", "3"))
+MIN_MARKETS = int(os.environ.get("PRICE_ANOMALY_MIN_MARKETS", "5"))
+
+ANOMALY_COLUMNS = [
+    "Category",
+    "Region",
+    "Market",
+    "Date",
+    "Price",
+    "Baseline",
+    "Change",
+    "Z-Score",
+    "Spike",
+    "Regional Outlier",
+]
+
+
+def rolling_baseline(prices, groups, window=WINDOW, min_periods=MIN_PERIODS):
+    """
+    Description: Median of the previous prices of every row within its group
+
+    Args:
+    prices (ndarray): Prices sorted by group, then by date
+    groups (ndarray): Group number of every row, contiguous and increasing
+    window (int): Number of previous prices in the median
+    min_periods (int): Fewest previous prices for a median, NaN below
+
+    Returns:
+    (ndarray): Median of the up to window previous prices of the same group
+    """
+    if len(prices) == 0:
+        return np.empty(0)
+    # every group is preceded by window missing values, so a window never mixes two groups
+    # and the first prices of a group only count the prices before them
+    starts = np.r_[True, groups[1:] != groups[:-1]]
+    positions = np.arange(len(prices)) + window * np.cumsum(starts)
+    padded = np.full(positions[-1] + 1, np.nan)
+    padded[positions] = prices
+    medians = (
+        pd.Series(padded).rolling(window, min_periods=min_periods).median().to_numpy()
+    )
+    # the window ending right before a price holds the previous prices only
+    return medians[positions - 1]
+
+
+def group_zscores(prices, groups, min_count=MIN_MARKETS):
+    """
+    Description: Z-score of every price within its group
+
+    Args:
+    prices (ndarray): Prices
+    groups (ndarray): Group number of every row, from 0
+    min_count (int): Fewest prices in a group for a z-score, NaN below
+
+    Returns:
+    (ndarray): (price - group mean) / group standard deviation
+    """
+    count = np.bincount(groups)
+    mean = np.bincount(groups, weights=prices) / count
+    deviation = prices - mean[groups]
+    variance = np.bincount(groups, weights=deviation**2) / np.maximum(count - 1, 1)
+    std = np.sqrt(variance)[groups]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = deviation / std
+    z[(count[groups] < min_count) | ~(std > 0)] = np.nan
+    return z
+
+
+def detect_anomalies(
+    df,
+    window=WINDOW,
+    min_periods=MIN_PERIODS,
+    change=CHANGE,
+    z_threshold=Z_THRESHOLD,
+    min_markets=MIN_MARKETS,
+):
+    """
+    Description: Flag the spikes and the regional outliers of a price table
+
+    Args:
+    df (DataFrame): Price rows with Category, Region, Market, Date and Price columns
+    window (int): Number of previous prices of a market in its rolling median
+    min_periods (int): Fewest previous prices of a market to test it for a spike
+    change (float): Smallest relative change from the rolling median that is a spike
+    z_threshold (float): Smallest absolute z-score within (Category, Region, Date) that is an outlier
+    min_markets (int): Fewest markets of a (Category, Region, Date) to compute z-scores
+
+    Returns:
+    (DataFrame): The flagged rows with ANOMALY_COLUMNS, sorted by category, date and market
+    """
+    if df.empty:
+        # nothing to flag, the columns still have their dtypes (a datetime Date, text columns)
+        none = np.empty(0)
+        return _anomaly_rows(
+            df,
+            np.empty(0, dtype=np.int64),
+            none,
+            none,
+            none,
+            none.astype(bool),
+            none.astype(bool),
+        )
+    category, _ = column_codes(df["Category"])
+    region, _ = column_codes(df["Region"])
+    market, _ = column_codes(df["Market"])
+    dates = df["Date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    prices = df["Price"].to_numpy(dtype="float64")
+
+    order = np.lexsort((dates, market, category))
+    group = category[order].astype(np.int64) * (market.max() + 1) + market[order]
+    baseline = np.empty(len(df))
+    baseline[order] = rolling_baseline(prices[order], group, window, min_periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = prices / baseline - 1
+    spike = np.abs(relative) >= change
+
+    # one integer key per (Category, Region, Date), numbered by a hash factorization
+    day = dates - dates.min()
+    key = (category.astype(np.int64) * (region.max() + 1) + region) * (
+        day.max() + 1
+    ) + day
+    z = group_zscores(prices, pd.factorize(key)[0], min_markets)
+    outlier = np.abs(z) >= z_threshold
+
+    flagged = np.flatnonzero(spike | outlier)
+    return _anomaly_rows(df, flagged, baseline, relative, z, spike, outlier)
+
+
+def split_by_category(anomalies):
+    """
+    Description: Index the anomalies by category for the callbacks
+
+    Returns:
+    (dict): category -> its anomalies
+    """
+    return {
+        category: rows.reset_index(drop=True)
+        for category, rows in anomalies.groupby("Category", observed=True, sort=False)
+    }
+
+
+def _anomaly_rows(df, flagged, baseline, relative, z, spike, outlier):
+    # the flagged rows with their baseline, change and z-score, as ANOMALY_COLUMNS
+    anomalies = df.iloc[flagged][["Category", "Region", "Market", "Date", "Price"]]
+    anomalies = anomalies.assign(
+        Baseline=baseline[flagged],
+        Change=relative[flagged],
+        **{
+            "Z-Score": z[flagged],
+            "Spike": spike[flagged],
+            "Regional Outlier": outlier[flagged],
+        }
+    )
+    return anomalies.sort_values(["Category", "Date", "Market"]).reset_index(drop=True)
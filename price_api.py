@@ -0,0 +1,291 @@
+"""
+Read-only API of the prices on the Flask server of the dashboard, for the downstream teams.
+
+    GET /api/v1/aggregates    max/mean/min/count, median, P10/P90 and market count per date,
+                              the statistics of the trend graph
+        category=Tomato           required
+        region=...                repeatable, per region statistics of these regions,
+                                  national statistics without it
+        start=2023-01-01          first date, inclusive (optional)
+        end=2023-06-30            last date, inclusive (optional)
+        format=json               json or csv
+
+    GET /api/v1/prices        raw price rows, streamed in chunks
+        category, region, start, end as above, category is optional
+        format=csv                csv or ndjson
+
+Every response carries an ETag and answers If-None-Match with 304 Not Modified, and is
+gzip encoded when the client accepts it. The aggregates are small: their ETag is the hash of
+the body. The exports are never held in memory, so their (weak) ETag is derived from the
+query and the version of the data.
+"""
+
+import gzip
+import hashlib
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+from flask import Response, request, stream_with_context
+
+from response_encoding import accepted_encodings
+
+# rows per chunk of the exports, and gzip level of every response
+CHUNK_ROWS = 10000
+GZIP_LEVEL = 6
+
+# the clients may keep a response but must check its ETag before using it again
+CACHE_CONTROL = "no-cache"
+
+
+class ApiError(Exception):
+    """
+    Description: Invalid query parameters, answered with a JSON error and the status code
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_query(args, category_required=True):
+    """
+    Description: Read the selection of an API request from its query string
+
+    Args:
+    args (MultiDict): Query parameters of the request
+    category_required (bool): Reject the request when no category is given
+
+    Returns:
+    (dict): category, regions (list), start and end (Timestamp or None)
+    """
+    category = args.get("category")
+    if category_required and not category:
+        raise ApiError("the category parameter is required")
+    query = {"category": category, "regions": args.getlist("region")}
+    for bound in ["start", "end"]:
+        value = args.get(bound)
+        query[bound] = parse_date(bound, value) if value else None
+    if (
+        query["start"] is not None
+        and query["end"] is not None
+        and query["start"] > query["end"]
+    ):
+        raise ApiError("start is after end")
+    return query
+
+
+def parse_date(bound, value):
+    """
+    Description: Read a date bound of the query string. The dates of the prices have no time zone,
+    the date and time of a bound with one are used as written.
+
+    Args:
+    bound (str): Name of the parameter, for the error message
+    value (str): Value of the parameter
+
+    Returns:
+    (Timestamp): The bound, without a time zone
+    """
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError, OverflowError):
+        raise ApiError("{} is not a date: {}".format(bound, value))
+    if pd.isna(timestamp):
+        raise ApiError("{} is not a date: {}".format(bound, value))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp
+
+
+def get_aggregates(price_store, category, regions=None, start=None, end=None):
+    """
+    Description: Read the statistics of the trend graph from the cube of a store
+
+    Args:
+    price_store (PriceStore): Store to read
+    category (str): Selected category
+    regions (list): Selected regions, None or [] for the national statistics
+    start (Timestamp): First date, None for no lower bound
+    end (Timestamp): Last date, None for no upper bound
+
+    Returns:
+    (DataFrame): Date, Region when regions are selected, Maximum/Average/Minimum/Median/P10/P90 Price,
+    count and markets
+    """
+    if regions:
+        df = price_store.cube.region_slice(category, regions)
+    else:
+        df = price_store.cube.national_slice(category)
+    if start is not None:
+        df = df[df["Date"] >= start]
+    if end is not None:
+        df = df[df["Date"] <= end]
+    # rounded as the dashboard shows them
+    return df.assign(
+        Date=df["Date"].dt.strftime("%Y-%m-%d"),
+        **{"Average Price": np.round(df["Average Price"], 1)},
+    ).reset_index(drop=True)
+
+
+def check_category(price_store, category):
+    if not price_store.available_regions(category):
+        raise ApiError("no prices of the category {}".format(category), status=404)
+
+
+def accepts_gzip():
+    # the exports are only gzip encoded, whether or not brotli is accepted too
+    return "gzip" in accepted_encodings(request.headers.get("Accept-Encoding", ""))
+
+
+def not_modified(etag, weak=False):
+    response = Response(status=304)
+    response.set_etag(etag, weak=weak)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def gzip_stream(chunks, level=GZIP_LEVEL):
+    """
+    Description: Gzip encode a stream of byte chunks without buffering the whole stream
+
+    Args:
+    chunks (iterable): Byte chunks
+    level (int): Compression level
+
+    Yields:
+    (bytes): The gzip stream, one piece per input chunk that filled the compressor's buffer
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def csv_chunks(frames):
+    # one header, then the rows of every chunk
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header, date_format="%Y-%m-%d").encode()
+        header = False
+
+
+def ndjson_chunks(frames):
+    for frame in frames:
+        if not frame.empty:
+            yield frame.assign(Date=frame["Date"].dt.strftime("%Y-%m-%d")).to_json(
+                # the float32 columns are written with the digits they hold
+                orient="records",
+                lines=True,
+                double_precision=6,
+            ).rstrip("\n").encode() + b"\n"
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", csv_chunks),
+    "ndjson": ("application/x-ndjson", ndjson_chunks),
+}
+
+
+def register_api(app, get_store, get_data_version):
+    """
+    Description: Add the /api/v1 endpoints to the Flask server of the dashboard
+
+    Args:
+    app (Dash): The dashboard app
+    get_store (callable): Returns the current price store, read once per request
+    get_data_version (callable): Returns a string that changes whenever the data changes
+    """
+    server = app.server
+
+    def aggregates():
+        query = parse_query(request.args)
+        output = request.args.get("format", "json")
+        if output not in ("json", "csv"):
+            raise ApiError("format must be json or csv")
+        price_store = get_store()
+        check_category(price_store, query["category"])
+        df = get_aggregates(price_store, **query)
+        if output == "csv":
+            body = df.to_csv(index=False).encode()
+            mimetype = "text/csv"
+        else:
+            body = (
+                '{{"category":{},"regions":{},"start":{},"end":{},"data":{}}}'.format(
+                    json.dumps(query["category"]),
+                    json.dumps(query["regions"]),
+                    json.dumps(query["start"] and str(query["start"].date())),
+                    json.dumps(query["end"] and str(query["end"].date())),
+                    df.to_json(orient="records"),
+                ).encode()
+            )
+            mimetype = "application/json"
+
+        gzipped = accepts_gzip()
+        # the two encodings of a body are two representations, with two ETags
+        etag = hashlib.sha256(body).hexdigest()[:16] + ("-gzip" if gzipped else "")
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        response = Response(
+            gzip.compress(body, GZIP_LEVEL) if gzipped else body, mimetype=mimetype
+        )
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def prices():
+        query = parse_query(request.args, category_required=False)
+        output = request.args.get("format", "csv")
+        if output not in EXPORT_FORMATS:
+            raise ApiError("format must be csv or ndjson")
+        mimetype, encode = EXPORT_FORMATS[output]
+
+        gzipped = accepts_gzip()
+        etag = hashlib.sha256(
+            json.dumps(
+                [get_data_version(), output, sorted(request.args.items(multi=True))],
+                default=str,
+            ).encode()
+        ).hexdigest()[:16] + ("-gzip" if gzipped else "")
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag, weak=True)
+
+        # the store is read once, a reload during the export does not mix two versions
+        price_store = get_store()
+        if query["category"]:
+            check_category(price_store, query["category"])
+        frames = price_store.chunks(chunk_size=CHUNK_ROWS, **query)
+        body = encode(frames)
+        if gzipped:
+            body = gzip_stream(body)
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        response.headers["Content-Disposition"] = (
+            "attachment; filename=prices.{}".format(output)
+        )
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def api_error(error):
+        return Response(
+            json.dumps({"error": error.message}),
+            status=error.status,
+            mimetype="application/json",
+        )
+
+    server.add_url_rule(
+        "/api/v1/aggregates", endpoint="api_aggregates", view_func=aggregates
+    )
+    server.add_url_rule("/api/v1/prices", endpoint="api_prices", view_func=prices)
+    server.register_error_handler(ApiError, api_error)
@@ -0,0 +1,325 @@
+"""
+Typed columnar cache of the crop price csv.
+
+The csv is parsed once by the build step and written as a Feather (Arrow IPC) file
+with categorical text columns and float32 numbers. The signature of the csv bytes it was parsed
+from is kept in the metadata of the file, so the rows and their signature are replaced together.
+The dashboard loads the cache instead of the csv when it is up to date.
+
+Usage:
+    python price_cache.py build      # write data/cache/bantaypresyo.feather
+    python price_cache.py compare    # startup time and resident memory, csv vs cache
+"""
+
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from price_store import load_prices
+
+CSV_PATH = "data/bantaypresyo.csv"
+CACHE_PATH = "data/cache/bantaypresyo.feather"
+
+CATEGORICAL_COLUMNS = ["Category", "Main Category", "Market", "Region"]
+FLOAT32_COLUMNS = ["Price", "Lat", "Lon"]
+
+
+def to_typed(df):
+    """
+    Description: Convert the price table to the compact dtypes used by the cache
+
+    Args:
+    df (DataFrame): Price rows as returned by load_prices
+
+    Returns:
+    (DataFrame): The same rows with categorical text columns and float32 numbers
+    """
+    df = df.copy()
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype("category")
+    for column in FLOAT32_COLUMNS:
+        df[column] = df[column].astype("float32")
+    return df.reset_index(drop=True)
+
+
+def concat_typed(frames):
+    """
+    Description: Concatenate typed price tables, keeping the categorical columns categorical
+    when the tables have different categories (e.g. a new market)
+
+    Args:
+    frames (list): DataFrames as returned by to_typed
+
+    Returns:
+    (DataFrame): The rows of every table
+    """
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    df = pd.concat(frames, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(
+            df[column].dtype, pd.CategoricalDtype
+        ):
+            df[column] = pd.Categorical(
+                df[column],
+                categories=union_categoricals(
+                    [frame[column] for frame in frames], sort_categories=True
+                ).categories,
+            )
+    return df
+
+
+def source_signature(csv_path, with_hash=True):
+    """
+    Description: Describe the csv a cache is built from
+
+    Args:
+    csv_path (str): Path of the csv
+    with_hash (bool): Also compute the sha256 of the file content
+
+    Returns:
+    (dict): Size, modification time and optionally the sha256 of the csv
+    """
+    stat = os.stat(csv_path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(csv_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        signature["sha256"] = digest.hexdigest()
+    return signature
+
+
+def read_source(csv_path):
+    """
+    Description: Parse the csv and describe exactly the bytes the rows were parsed from.
+    Rows appended while parsing are neither in the table nor counted by the signature,
+    so a cache is never marked as built from more of the csv than it holds.
+
+    Args:
+    csv_path (str): Path of the csv
+
+    Returns:
+    (DataFrame, dict): Price rows as returned by load_prices, and the size, modification time
+    and sha256 of the parsed bytes
+    """
+    stat = os.stat(csv_path)
+    with open(csv_path, "rb") as f:
+        content = f.read(stat.st_size)
+    if not content.endswith(b"\n"):
+        # a line still being written is left to the ingestion, as in read_appended_rows
+        content = content[: content.rfind(b"\n") + 1]
+    signature = {
+        "size": len(content),
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hashlib.sha256(content).hexdigest(),
+    }
+    return load_prices(io.BytesIO(content)), signature
+
+
+def read_appended_rows(path, offset):
+    """
+    Description: Parse the complete lines appended to a csv after a byte offset
+
+    Args:
+    path (str): Path of the price csv
+    offset (int): Size of the part of the file that was already read
+
+    Returns:
+    (DataFrame, int): The new price rows, None when there are none, and the offset after them
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        appended = f.read()
+    # a line still being written is left for the next poll
+    complete = appended[: appended.rfind(b"\n") + 1]
+    new_offset = max(offset, len(header)) + len(complete)
+    if not complete.strip():
+        return None, new_offset
+    return load_prices(io.BytesIO(header + complete)), new_offset
+
+
+def is_signature_current(csv_path, built_from):
+    """
+    Description: Check whether a signature still describes the csv.
+    The size and modification time are compared first, the sha256 is only
+    computed when the modification time changed but the size did not.
+
+    Args:
+    csv_path (str): Path of the csv
+    built_from (dict): Signature recorded when the csv was read
+
+    Returns:
+    (bool): True when the csv did not change since
+    """
+    current = source_signature(csv_path, with_hash=False)
+    if current["size"] != built_from.get("size"):
+        return False
+    if current["mtime_ns"] == built_from.get("mtime_ns"):
+        return True
+    return source_signature(csv_path)["sha256"] == built_from.get("sha256")
+
+
+def cache_signature(cache_path=CACHE_PATH):
+    """
+    Description: Read the signature of the csv bytes a cache was built from, without reading the rows
+
+    Returns:
+    (dict): The signature, None when there is no readable cache
+    """
+    import pyarrow
+    import pyarrow.ipc
+
+    try:
+        with pyarrow.OSFile(cache_path, "rb") as f:
+            metadata = pyarrow.ipc.open_file(f).schema.metadata or {}
+        return json.loads(metadata[b"source"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def is_cache_fresh(csv_path=CSV_PATH, cache_path=CACHE_PATH):
+    """
+    Description: Check whether the cache was built from the current csv
+
+    Returns:
+    (bool): True when the cache can be used instead of the csv
+    """
+    built_from = cache_signature(cache_path)
+    return built_from is not None and is_signature_current(csv_path, built_from)
+
+
+def build_cache(csv_path=CSV_PATH, cache_path=CACHE_PATH):
+    """
+    Description: Parse the csv and write the typed Feather cache with its source signature.
+    All the rows are cached, the date window is applied when loading.
+
+    Args:
+    csv_path (str): Path of the csv
+    cache_path (str): Path of the Feather file to write
+
+    Returns:
+    (DataFrame, dict): The typed price table, and the signature of the csv bytes it was parsed from
+    """
+    import pyarrow
+    import pyarrow.feather
+
+    df, signature = read_source(csv_path)
+    df = to_typed(df)
+    table = pyarrow.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, b"source": json.dumps(signature).encode()}
+    )
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # a name of its own, processes building at the same time do not write into each other's file
+    temporary = "{}.{}.tmp".format(cache_path, uuid.uuid4().hex)
+    try:
+        pyarrow.feather.write_feather(table, temporary)
+        os.replace(temporary, cache_path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return df, signature
+
+
+def load_cached_prices(csv_path=CSV_PATH, start_date=None, cache_path=CACHE_PATH):
+    """
+    Description: Load the typed price table from the cache when it is up to date,
+    otherwise parse the csv and rebuild the cache. pyarrow is needed for the cache,
+    without it the csv is parsed every time.
+
+    Args:
+    csv_path (str): Path of the csv
+    start_date (date): Only keep the rows after this date, None to keep all rows
+    cache_path (str): Path of the Feather cache
+
+    Returns:
+    (DataFrame, dict): Price rows with categorical text columns and float32 numbers, and the
+    signature of the csv bytes they were read from: its size is where the ingestion starts
+    """
+    try:
+        import pyarrow.feather
+    except ImportError:
+        df, signature = read_source(csv_path)
+        df = to_typed(df)
+    else:
+        if is_cache_fresh(csv_path, cache_path):
+            # rows and signature come from one read of the file, even if it is rebuilt meanwhile
+            table = pyarrow.feather.read_table(cache_path)
+            signature = json.loads(table.schema.metadata[b"source"])
+            df = table.to_pandas()
+        else:
+            df, signature = build_cache(csv_path, cache_path)
+    if start_date is not None:
+        df = df[df["Date"] > pd.to_datetime(start_date)]
+    return df, signature
+
+
+def _measure(mode):
+    # run in a fresh interpreter by compare(), so each path starts from an empty process
+    import psutil
+
+    started = time.perf_counter()
+    if mode == "csv":
+        df = load_prices(CSV_PATH)
+    else:
+        df, _ = load_cached_prices(CSV_PATH)
+    elapsed = time.perf_counter() - started
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "rows": len(df),
+                "load_seconds": elapsed,
+                "table_bytes": int(df.memory_usage(deep=True).sum()),
+                "rss_bytes": psutil.Process().memory_info().rss,
+            }
+        )
+    )
+
+
+def compare():
+    """
+    Description: Report the load time, table size and resident memory of the csv and the cache path
+    """
+    if not is_cache_fresh():
+        build_cache()
+    for mode in ["csv", "cache"]:
+        output = subprocess.run(
+            [sys.executable, __file__, "_measure", mode],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            "{mode:>5}: {rows} rows, load {ms:.1f} ms, table {table:.2f} MB, rss {rss:.1f} MB".format(
+                mode=result["mode"],
+                rows=result["rows"],
+                ms=result["load_seconds"] * 1000,
+                table=result["table_bytes"] / 1e6,
+                rss=result["rss_bytes"] / 1e6,
+            )
+        )
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        build_cache()
+        print("cache written to {}".format(CACHE_PATH))
+    elif command == "compare":
+        compare()
+    elif command == "_measure":
+        _measure(sys.argv[2])
+    else:
+        sys.exit(__doc__)
@@ -0,0 +1,257 @@
+"""
+Dimension tables of the price table: the markets, and the main category of every category.
+
+Every row of the price csv repeats the region and the coordinates of its market and the main
+category of its category. The PriceStore keeps them once, in two small dimension tables, and
+its price table (the fact table) only keeps the codes of the Category, Market and Region,
+the float32 price and the date. The coordinates are joined from the market dimension only for
+the rows that need them: the markers drawn on the map and the exported rows.
+
+The market dimension is read from data/market.csv. It is keyed by (Market, Region), as a
+market name may be listed in two regions. A (Market, Region) of the prices that is missing
+from market.csv is reported, and added to the dimension with the coordinates of its price rows
+so that its markers are still drawn.
+
+Usage:
+    python price_dimensions.py validate    # list the markets of the csv missing from market.csv
+"""
+
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+MARKET_PATH = "data/market.csv"
+MARKET_KEYS = ["Market", "Region"]
+
+# columns of the price rows as read from the csv, and the ones kept in the fact table
+ROW_COLUMNS = [
+    "Category",
+    "Main Category",
+    "Market",
+    "Region",
+    "Price",
+    "Date",
+    "Lat",
+    "Lon",
+]
+FACT_COLUMNS = ["Category", "Market", "Region", "Price", "Date"]
+
+MISSING_COLUMNS = ["Market", "Region", "rows", "reason"]
+
+
+def load_markets(path=MARKET_PATH):
+    """
+    Description: Read the market dimension
+
+    Args:
+    path (str): Csv of the markets with their region and coordinates
+
+    Returns:
+    (DataFrame): Market, Region and float32 Lat, Lon, one row per (Market, Region)
+    """
+    markets = pd.read_csv(path).drop_duplicates(MARKET_KEYS)
+    return markets.assign(
+        Lat=markets["Lat"].astype("float32"), Lon=markets["Lon"].astype("float32")
+    )[MARKET_KEYS + ["Lat", "Lon"]].reset_index(drop=True)
+
+
+def validate_markets(df, markets):
+    """
+    Description: List the (Market, Region) of price rows that are missing from the market dimension
+
+    Args:
+    df (DataFrame): Price rows
+    markets (DataFrame): Market dimension, as returned by load_markets
+
+    Returns:
+    (DataFrame): Market, Region, number of rows and reason: "unknown market", or
+    "other region" when market.csv lists the market in another region
+    """
+    pairs = df.groupby(MARKET_KEYS, observed=True).size().rename("rows").reset_index()
+    known = pd.MultiIndex.from_frame(markets[MARKET_KEYS].astype(object))
+    missing = pairs[
+        ~pd.MultiIndex.from_frame(pairs[MARKET_KEYS].astype(object)).isin(known)
+    ]
+    missing = missing.assign(
+        Market=missing["Market"].astype(object), Region=missing["Region"].astype(object)
+    )
+    reason = np.where(
+        missing["Market"].isin(markets["Market"]), "other region", "unknown market"
+    )
+    return missing.assign(reason=reason)[MISSING_COLUMNS].reset_index(drop=True)
+
+
+class PriceDimensions:
+    """
+    Description: The market and category dimensions of a fact table. The market rows of
+    the facts are found with one hash lookup of their (Market, Region) per fact row.
+    """
+
+    def __init__(self, markets, categories, missing=None):
+        self.markets = markets
+        self.categories = categories
+        self.missing = (
+            missing
+            if missing is not None
+            else pd.DataFrame({column: [] for column in MISSING_COLUMNS})
+        )
+        self._index = pd.MultiIndex.from_frame(markets[MARKET_KEYS].astype(object))
+        self._main_category = dict(
+            zip(categories["Category"], categories["Main Category"])
+        )
+
+    @classmethod
+    def build(cls, df, markets=None):
+        """
+        Description: Build the dimensions of a price table
+
+        Args:
+        df (DataFrame): Price rows with the ROW_COLUMNS
+        markets (DataFrame): Market dimension read from market.csv, None to take the
+        markets and their coordinates from the price rows
+
+        Returns:
+        (PriceDimensions): The dimensions, the markets missing from market.csv are in missing
+        """
+        if markets is None:
+            markets = df.iloc[0:0][MARKET_KEYS + ["Lat", "Lon"]].astype(
+                {"Market": object, "Region": object}
+            )
+            missing = None
+        else:
+            missing = validate_markets(df, markets)
+            if not missing.empty:
+                warnings.warn(
+                    "{} markets of the prices are missing from {}: {}".format(
+                        len(missing),
+                        MARKET_PATH,
+                        ", ".join(
+                            "{} ({}, {})".format(market, region, reason)
+                            for market, region, reason in zip(
+                                missing["Market"], missing["Region"], missing["reason"]
+                            )
+                        ),
+                    )
+                )
+        dimensions = cls(markets, _categories(df), missing)
+        return dimensions._with_rows(df)
+
+    def extend(self, df):
+        """
+        Description: Add the markets and categories of new price rows that are not in the dimensions
+
+        Args:
+        df (DataFrame): New price rows with the ROW_COLUMNS
+
+        Returns:
+        (PriceDimensions): These dimensions when nothing is new, new ones otherwise
+        """
+        missing = validate_markets(df, self.markets)
+        new_categories = ~df["Category"].astype(object).isin(self._main_category)
+        if missing.empty and not new_categories.any():
+            return self
+        categories = pd.concat(
+            [self.categories, _categories(df[new_categories])], ignore_index=True
+        )
+        return PriceDimensions(
+            self.markets,
+            categories,
+            pd.concat([self.missing, missing], ignore_index=True),
+        )._with_rows(df)
+
+    def coordinates(self, df):
+        """
+        Description: Join the coordinates of the markets of some fact rows
+
+        Args:
+        df (DataFrame): Fact rows
+
+        Returns:
+        (DataFrame): The rows with float32 Lat and Lon columns
+        """
+        rows = self._rows(df)
+        return df.assign(
+            Lat=_take(self.markets["Lat"].to_numpy(), rows),
+            Lon=_take(self.markets["Lon"].to_numpy(), rows),
+        )
+
+    def expand(self, df):
+        """
+        Description: Rebuild the price rows of fact rows, with their main category and coordinates
+
+        Args:
+        df (DataFrame): Fact rows
+
+        Returns:
+        (DataFrame): The rows with the ROW_COLUMNS
+        """
+        df = self.coordinates(df)
+        df["Main Category"] = pd.Categorical(
+            df["Category"].astype(object).map(self._main_category)
+        )
+        return df[ROW_COLUMNS]
+
+    def _rows(self, df):
+        # position of the market of every row in the dimension, -1 when it is not in it
+        if df.empty:
+            return np.empty(0, dtype=np.int64)
+        return self._index.get_indexer(
+            pd.MultiIndex.from_arrays(
+                [df["Market"].astype(object), df["Region"].astype(object)]
+            )
+        )
+
+    def _with_rows(self, df):
+        # the markets missing from the dimension are added with the coordinates of their first row
+        rows = df[self._rows(df) < 0]
+        if rows.empty:
+            return self
+        added = rows.drop_duplicates(MARKET_KEYS)[MARKET_KEYS + ["Lat", "Lon"]].astype(
+            {"Market": object, "Region": object, "Lat": "float32", "Lon": "float32"}
+        )
+        return PriceDimensions(
+            pd.concat([self.markets, added], ignore_index=True),
+            self.categories,
+            self.missing,
+        )
+
+
+def to_facts(df):
+    """
+    Description: Keep the columns of the fact table of price rows
+
+    Returns:
+    (DataFrame): Category, Market and Region codes, price and date of every row
+    """
+    return df[FACT_COLUMNS]
+
+
+def _categories(df):
+    return (
+        df.groupby("Category", observed=True, sort=False)["Main Category"]
+        .first()
+        .astype(object)
+        .reset_index()
+        .astype({"Category": object})
+    )
+
+
+def _take(values, rows):
+    # NaN for the rows without a market in the dimension
+    taken = values[np.maximum(rows, 0)] if len(values) else np.full(len(rows), np.nan)
+    return np.where(rows >= 0, taken, np.nan).astype(values.dtype)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "validate"
+    if command != "validate":
+        sys.exit(__doc__)
+    from price_store import load_prices
+
+    report = validate_markets(load_prices("data/bantaypresyo.csv"), load_markets())
+    if report.empty:
+        print("every market of the prices is in {}".format(MARKET_PATH))
+    else:
+        print(report.to_string(index=False))
@@ -0,0 +1,203 @@
+"""
+Incremental ingestion of new price rows into the running dashboard.
+
+A background thread polls the price csv and an optional drop directory of csv files.
+Only the bytes appended to the csv since the last poll are parsed, and the files of the
+drop directory are parsed once each. The new rows are merged into a new PriceStore
+(the aggregate cube is updated incrementally, not rebuilt) which the dashboard then swaps
+in with one assignment: a callback that is running keeps the store it started with,
+and never sees a table that is only partly updated.
+
+When the csv is rewritten or truncated instead of appended to, the dashboard reloads it completely.
+
+With the SQLite backend the database is shared by the workers, so the SqliteIngestor of every
+worker calls update_database, which inserts the new rows once under a file lock, and the
+workers re-open the database when its version changed.
+
+Enabled with environment variables:
+    PRICE_INGEST_INTERVAL=60         poll every 60 seconds
+    PRICE_INCOMING_DIR=data/incoming also ingest the csv files dropped in this directory
+"""
+
+import glob
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from price_aggregates import AggregateCube
+from price_cache import concat_typed, read_appended_rows, to_typed
+from price_dimensions import to_facts
+from price_sqlite import SqlitePriceStore, update_database
+from price_store import PriceStore, load_prices
+
+logger = logging.getLogger(__name__)
+
+
+def merge_rows(store, new_rows, start_date=None, region_order=None):
+    """
+    Description: Build a new store from an existing one, the new rows and the current date window.
+    The existing store is not modified, so it can keep serving until the new one is swapped in.
+    A SQLite store is only given the new window, its rows are inserted by the SqliteIngestor.
+
+    Args:
+    store (PriceStore): The store currently served
+    new_rows (DataFrame): New price rows as returned by load_prices, None for none
+    start_date (date): Only keep the rows after this date, None to keep all rows
+    region_order (list): Order of the regions in the region dropdown
+
+    Returns:
+    (PriceStore): Store with the new rows and without the rows older than the window
+    """
+    if isinstance(store, SqlitePriceStore):
+        # the database keeps the whole history, the window only filters the queries
+        return store.with_window(start_date)
+
+    df = store.df
+    cube = AggregateCube(store.cube.region, store.cube.national)
+    if start_date is not None and (df["Date"] <= pd.to_datetime(start_date)).any():
+        df = df[df["Date"] > pd.to_datetime(start_date)]
+        cube = cube.since(start_date)
+
+    dimensions = store.dimensions
+    if new_rows is not None:
+        new_rows = to_typed(new_rows)
+        if start_date is not None:
+            new_rows = new_rows[new_rows["Date"] > pd.to_datetime(start_date)]
+        # a new market or category is added to the dimensions, the facts only keep its codes
+        dimensions = dimensions.extend(new_rows)
+        df = concat_typed([df, to_facts(new_rows)])
+        cube.update(new_rows, df)
+    return PriceStore(df, region_order=region_order, cube=cube, dimensions=dimensions)
+
+
+class PriceIngestor:
+    """
+    Description: Background watcher of the price csv and of a drop directory of csv files.
+    Every poll hands the new rows to on_rows, or calls on_reload when the csv was replaced,
+    which returns the size of the part of the csv it reloaded.
+    on_rows is also called without rows so that the date window can roll forward.
+    """
+
+    def __init__(
+        self, csv_path, on_rows, on_reload, interval=60, incoming_dir=None, offset=None
+    ):
+        self.csv_path = csv_path
+        self.on_rows = on_rows
+        self.on_reload = on_reload
+        self.interval = interval
+        self.incoming_dir = incoming_dir
+        stat = os.stat(csv_path)
+        self.offset = stat.st_size if offset is None else offset
+        self.inode = stat.st_ino
+        self.ingested_files = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def poll(self):
+        """
+        Description: Check the csv and the drop directory once and hand over what is new
+
+        Returns:
+        (int): Number of new rows
+        """
+        with self._lock:
+            stat = os.stat(self.csv_path)
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                # rewritten rather than appended to: reload everything, drop files included
+                self.inode, self.offset = stat.st_ino, self.on_reload()
+                self.ingested_files = set()
+
+            frames = []
+            rows, offset = read_appended_rows(self.csv_path, self.offset)
+            if rows is not None:
+                frames.append(rows)
+            files = self._new_files()
+            frames += [load_prices(path) for path in files]
+
+            new_rows = pd.concat(frames, ignore_index=True) if frames else None
+            self.on_rows(new_rows)
+            # only marked as read once merged, rows that failed are parsed again next poll
+            self.offset = offset
+            self.ingested_files.update(files)
+            return 0 if new_rows is None else len(new_rows)
+
+    def start(self):
+        """
+        Description: Start polling in a daemon thread, once per process.
+        Threads do not survive a fork, so a server forking its workers after loading
+        the app (gunicorn --preload) calls this again in every worker.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="price-ingestor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:  # noqa: BLE001
+                # a malformed drop must not stop the watcher
+                logger.exception("price ingestion failed")
+
+    def _new_files(self):
+        if not self.incoming_dir:
+            return []
+        return sorted(
+            path
+            for path in glob.glob(os.path.join(self.incoming_dir, "*.csv"))
+            if path not in self.ingested_files
+        )
+
+
+class SqliteIngestor(PriceIngestor):
+    """
+    Description: Watcher of the price csv and of the drop directory for the SQLite backend.
+    Every worker polls the shared database with update_database: the rows are inserted by
+    the first worker to poll, and every worker calls on_reload to re-open the database once
+    its version changed. on_rows is called without rows so that the date window can roll forward.
+    """
+
+    def __init__(
+        self,
+        csv_path,
+        database_path,
+        on_rows,
+        on_reload,
+        interval=60,
+        incoming_dir=None,
+        version=None,
+    ):
+        super().__init__(csv_path, on_rows, on_reload, interval, incoming_dir)
+        self.database_path = database_path
+        self.version = version
+
+    def poll(self):
+        """
+        Description: Insert what is new into the database, re-open it when it changed
+
+        Returns:
+        (int): Number of rows inserted by this worker
+        """
+        with self._lock:
+            # the drop files already inserted are skipped by update_database, not by this worker
+            version, inserted = update_database(
+                self.csv_path, self.database_path, self._new_files()
+            )
+            if version != self.version:
+                self.on_reload()
+                self.version = version
+            else:
+                self.on_rows(None)
+            return inserted
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+
+class MonthPartitions:
+    """
+    Description: The map view of every category and year-month, precomputed when the data loads.
+    For each (category, month) it keeps the latest row of every market and the latest
+    statistics of every region within the month, and the same over all dates for the
+    "Latest data" slider position, so the map data is a dict lookup instead of a scan
+    of the month followed by a drop of the older rows.
+    Months are year-months: the same month of two years are two partitions.
+    """
+
+    def __init__(self, markets, regions, empty_market, empty_region):
+        self.markets = markets
+        self.regions = regions
+        self.empty_market = empty_market
+        self.empty_region = empty_region
+
+    @classmethod
+    def build(cls, df, cube):
+        """
+        Description: Partition the price table and the region statistics by category and year-month
+
+        Args:
+        df (DataFrame): Price table sorted by (Category, Region, Date)
+        cube (AggregateCube): Statistics of the price table
+
+        Returns:
+        (MonthPartitions): The partitions
+        """
+        months = _year_months(df["Date"])
+        # the table is sorted by date within (Category, Region): the last row of a key is its latest
+        in_month = ~_duplicated([df["Category"], months, df["Region"], df["Market"]])
+        markets = _split(df[in_month], months[in_month])
+        markets.update(
+            _split(df[~_duplicated([df["Category"], df["Region"], df["Market"]])])
+        )
+
+        # every partition is ordered by (Date, Region), as the regions are drawn on the map
+        stats = cube.region_frame()
+        months = _year_months(stats["Date"])
+        in_month = ~_duplicated([stats["Category"], months, stats["Region"]])
+        latest_in_month = (
+            stats[in_month]
+            .assign(month=months[in_month])
+            .sort_values(["Category", "month", "Date", "Region"])
+        )
+        regions = _split(
+            latest_in_month.drop(columns="month"), latest_in_month["month"].to_numpy()
+        )
+        latest = stats[~_duplicated([stats["Category"], stats["Region"]])]
+        regions.update(_split(latest.sort_values(["Category", "Date", "Region"])))
+        return cls(markets, regions, df.iloc[0:0], stats.iloc[0:0])
+
+    def map_view(self, category, regions=None, month=None):
+        """
+        Description: Read the latest market rows and region statistics of a category in a month
+
+        Args:
+        category (str): Selected category
+        regions (list): Selected regions, None or [] for all regions
+        month (Timestamp): Any date in the selected month, None for the latest data
+
+        Returns:
+        df_region (DataFrame): Latest statistics of every region, sorted by date and region
+        df_market (DataFrame): Latest row of every market, sorted by region and date
+        """
+        key = (category, None if month is None else _year_month(month))
+        df_region = self.regions.get(key)
+        df_market = self.markets.get(key)
+        if df_region is None:
+            df_region = self.empty_region
+        if df_market is None:
+            df_market = self.empty_market
+        if regions not in (None, []):
+            df_region = df_region[df_region["Region"].isin(regions)]
+            df_market = df_market[df_market["Region"].isin(regions)]
+        # a market name found in several regions is shown once, as before
+        return df_region, df_market.drop_duplicates(["Market"], keep="last")
+
+
+def _year_months(dates):
+    # months since 1970, comparable and hashable without building Period objects
+    return dates.to_numpy().astype("datetime64[M]").astype(np.int64)
+
+
+def _year_month(month):
+    return int(np.datetime64(pd.Timestamp(month), "M").astype(np.int64))
+
+
+def _duplicated(keys):
+    # True for every row but the last one of its key
+    return (
+        pd.DataFrame({i: np.asarray(key) for i, key in enumerate(keys)})
+        .duplicated(keep="last")
+        .to_numpy()
+    )
+
+
+def _split(df, months=None):
+    """
+    Description: Split rows into a dict of partitions by category, and by month when given
+
+    Returns:
+    (dict): (category, month) -> rows, month is None when no months are given
+    """
+    if months is None:
+        return {
+            (category, None): partition
+            for category, partition in df.groupby("Category", observed=True, sort=False)
+        }
+    return {
+        (category, int(month)): partition
+        for (category, month), partition in df.groupby(
+            [df["Category"], months], observed=True, sort=False
+        )
+    }
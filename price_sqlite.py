@@ -0,0 +1,635 @@
+"""
+Optional SQLite backend of the price table, for a history longer than the date window.
+
+The csv is loaded once into a local SQLite file (no server) with indexes on
+(category, region, date) and (market, date). The store keeps the whole history on disk:
+the date window, the category/region/month filters and the aggregation (max/mean/min/count,
+quantiles and market count) are run by SQLite, and only the rows or statistics of the current
+view are read into pandas.
+
+The database is shared by every worker of the server. The rows appended to the csv and the
+drop files of the ingestion are inserted by update_database under a file lock: the csv offset
+and the drop files already inserted are recorded in the meta table, so one process inserts
+them and the others find them there, also after a restart.
+
+Enabled with environment variables:
+    PRICE_BACKEND=sqlite
+    PRICE_SQLITE_PATH=data/cache/bantaypresyo.sqlite   (default)
+
+Usage:
+    python price_sqlite.py build      # (re)build the database from data/bantaypresyo.csv
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from price_aggregates import PRICE_COLUMNS, QUANTILES
+from price_anomalies import detect_anomalies
+from price_cache import read_appended_rows, read_source
+from price_store import load_prices
+
+CSV_PATH = "data/bantaypresyo.csv"
+DATABASE_PATH = "data/cache/bantaypresyo.sqlite"
+
+# dashboard column -> database column, dates are stored as ISO text so that they compare in order
+COLUMNS = {
+    "Category": "category",
+    "Main Category": "main_category",
+    "Market": "market",
+    "Region": "region",
+    "Price": "price",
+    "Date": "date",
+    "Lat": "lat",
+    "Lon": "lon",
+}
+
+SCHEMA = """
+CREATE TABLE prices (
+    category TEXT NOT NULL,
+    main_category TEXT,
+    market TEXT NOT NULL,
+    region TEXT NOT NULL,
+    price REAL,
+    date TEXT NOT NULL,
+    lat REAL,
+    lon REAL
+);
+CREATE INDEX prices_category_region_date ON prices (category, region, date);
+CREATE INDEX prices_market_date ON prices (market, date);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def insert_rows(connection, df):
+    """
+    Description: Insert price rows into the prices table
+
+    Args:
+    connection (Connection): Open database connection, committed by the caller
+    df (DataFrame): Price rows as returned by load_prices
+    """
+    values = {
+        column: df[name].astype(object).where(df[name].notna(), None).tolist()
+        for name, column in COLUMNS.items()
+        if name != "Date"
+    }
+    values["date"] = df["Date"].dt.strftime("%Y-%m-%d").tolist()
+    columns = list(COLUMNS.values())
+    connection.executemany(
+        "INSERT INTO prices ({}) VALUES ({})".format(
+            ", ".join(columns), ", ".join("?" * len(columns))
+        ),
+        zip(*(values[column] for column in columns)),
+    )
+
+
+def build_database(csv_path=CSV_PATH, database_path=DATABASE_PATH):
+    """
+    Description: Load the whole csv into a new database file and record the csv it was built from.
+    Called with the lock of update_database held.
+
+    Args:
+    csv_path (str): Path of the price csv
+    database_path (str): Path of the SQLite file to write
+    """
+    os.makedirs(os.path.dirname(database_path) or ".", exist_ok=True)
+    temporary = database_path + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    connection = sqlite3.connect(temporary)
+    try:
+        connection.executescript(SCHEMA)
+        stat = os.stat(csv_path)
+        df, signature = read_source(csv_path)
+        insert_rows(connection, df)
+        _write_meta(connection, "source", signature)
+        _write_meta(
+            connection,
+            "ingested",
+            {
+                "offset": signature["size"],
+                "inode": stat.st_ino,
+                "mtime_ns": stat.st_mtime_ns,
+                "files": {},
+            },
+        )
+        _write_meta(connection, "version", uuid.uuid4().hex)
+        connection.commit()
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    os.replace(temporary, database_path)
+
+
+def is_database_fresh(csv_path=CSV_PATH, database_path=DATABASE_PATH):
+    """
+    Description: Check whether the database was built from the current csv. A csv that was
+    only appended to since is fresh, the rows past the recorded offset are inserted by update_database.
+
+    Returns:
+    (bool): True when the database can be used as it is
+    """
+    if not os.path.exists(database_path):
+        return False
+    connection = sqlite3.connect(database_path)
+    try:
+        built_from = _read_meta(connection, "source")
+        ingested = _read_meta(connection, "ingested")
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+    if built_from is None or ingested is None:
+        return False
+    stat = os.stat(csv_path)
+    if stat.st_ino != ingested["inode"] or stat.st_size < ingested["offset"]:
+        # rewritten rather than appended to
+        return False
+    if stat.st_size == ingested["offset"] and stat.st_mtime_ns == ingested["mtime_ns"]:
+        return True
+    # appended to or touched: the bytes the database was built from must be unchanged
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        digest.update(f.read(built_from["size"]))
+    return digest.hexdigest() == built_from["sha256"]
+
+
+def update_database(csv_path=CSV_PATH, database_path=DATABASE_PATH, incoming_files=()):
+    """
+    Description: Bring the database up to date with the csv: rebuild it when the csv was rewritten,
+    otherwise insert the rows appended past the recorded offset and the drop files that are not
+    recorded yet. The processes sharing the database take a file lock, so the new rows are
+    inserted once, by the first process to get it.
+
+    Args:
+    csv_path (str): Path of the price csv
+    database_path (str): Path of the SQLite file
+    incoming_files (list): Paths of the csv files of the drop directory
+
+    Returns:
+    (str, int): Version of the database, which changes whenever it is rebuilt or rows are
+    inserted, and the number of rows this call inserted
+    """
+    with _write_lock(database_path):
+        if not is_database_fresh(csv_path, database_path):
+            build_database(csv_path, database_path)
+        connection = sqlite3.connect(database_path)
+        try:
+            with connection:
+                ingested = _read_meta(connection, "ingested")
+                stat = os.stat(csv_path)
+                rows, offset = read_appended_rows(csv_path, ingested["offset"])
+                frames = [] if rows is None else [rows]
+                # a drop file is known by its name, size and modification time
+                files = dict(ingested["files"])
+                for path in incoming_files:
+                    file_stat = os.stat(path)
+                    known = [file_stat.st_size, file_stat.st_mtime_ns]
+                    if files.get(os.path.basename(path)) != known:
+                        frames.append(load_prices(path))
+                        files[os.path.basename(path)] = known
+                inserted = 0
+                for frame in frames:
+                    insert_rows(connection, frame)
+                    inserted += len(frame)
+                _write_meta(
+                    connection,
+                    "ingested",
+                    {
+                        "offset": offset,
+                        "inode": stat.st_ino,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "files": files,
+                    },
+                )
+                if inserted:
+                    _write_meta(connection, "version", uuid.uuid4().hex)
+                version = _read_meta(connection, "version")
+        finally:
+            connection.close()
+    return version, inserted
+
+
+def open_sqlite_store(
+    csv_path=CSV_PATH, database_path=DATABASE_PATH, start_date=None, region_order=None
+):
+    """
+    Description: Open the SQLite store, building the database first when the csv changed
+    and inserting the rows appended to it since
+
+    Returns:
+    (SqlitePriceStore): The store
+    """
+    version, _ = update_database(csv_path, database_path)
+    return SqlitePriceStore(database_path, start_date, region_order, version=version)
+
+
+class SqlitePriceStore:
+    """
+    Description: Price store reading from the SQLite database, with the interface of PriceStore
+    used by the callbacks: available_regions, map_view, chunks, anomalies, cube and lookup_stats.
+    Every thread uses its own read connection.
+    """
+
+    def __init__(
+        self,
+        database_path,
+        start_date=None,
+        region_order=None,
+        lookup_history=1000,
+        version=None,
+    ):
+        self.database_path = database_path
+        # version of the database when it was opened, see update_database
+        self.version = version
+        self.start = pd.Timestamp(start_date).strftime("%Y-%m-%d") if start_date else ""
+        self.start_date = start_date
+        self.region_order = region_order
+        self.cube = SqliteCube(self)
+        self.lookup_times = deque(maxlen=lookup_history)
+        self._local = threading.local()
+        self._region_availability = {}
+        self._anomalies = {}
+        self._rows = None
+
+    @property
+    def source_offset(self):
+        # size of the part of the csv inserted into the database
+        return _read_meta(self._connection(), "ingested")["offset"]
+
+    def query(self, sql, parameters=()):
+        """
+        Description: Run a read query and time it for lookup_stats
+
+        Returns:
+        (list): The result rows
+        """
+        started = time.perf_counter()
+        rows = self._connection().execute(sql, parameters).fetchall()
+        self.lookup_times.append(time.perf_counter() - started)
+        return rows
+
+    def available_regions(self, category):
+        """
+        Description: List the regions in which a category has prices in the date window
+
+        Args:
+        category (str): Category
+
+        Returns:
+        (list): Regions in the region dropdown order
+        """
+        if category not in self._region_availability:
+            found = [
+                region
+                for (region,) in self.query(
+                    "SELECT DISTINCT region FROM prices"
+                    " WHERE category = ? AND date > ?",
+                    (category, self.start),
+                )
+            ]
+            position = {region: i for i, region in enumerate(self.region_order or [])}
+            found.sort(key=lambda region: (position.get(region, len(position)), region))
+            self._region_availability[category] = found
+        return self._region_availability[category]
+
+    def select(self, category, regions=None, month=None):
+        """
+        Description: Select the rows of a category, optionally restricted to some regions and a month
+
+        Args:
+        category (str): Selected category
+        regions (list): Selected regions, None or [] for all regions
+        month (Timestamp): Any date in the selected month, None for all dates
+
+        Returns:
+        (DataFrame): Selected rows sorted by region and date, typed like the PriceStore table
+        """
+        where, parameters = self._where(category, regions, month)
+        rows = self.query(
+            "SELECT {} FROM prices WHERE {} ORDER BY region, date".format(
+                ", ".join(COLUMNS.values()), where
+            ),
+            parameters,
+        )
+        return self._frame(rows)
+
+    def chunks(
+        self, category=None, regions=None, start=None, end=None, chunk_size=10000
+    ):
+        """
+        Description: Iterate over the rows of a selection in chunks, for the exports.
+        The rows are fetched from one cursor chunk by chunk, never all at once.
+
+        Args:
+        category (str): Selected category, None for every category
+        regions (list): Selected regions, None or [] for all regions
+        start (date): First date of the rows, None for the start of the date window
+        end (date): Last date of the rows, None for no upper bound
+        chunk_size (int): Most rows per chunk
+
+        Yields:
+        (DataFrame): Rows sorted by category, region and date
+        """
+        where, parameters = self._where(category, regions)
+        if start is not None:
+            where += " AND date >= ?"
+            parameters.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            where += " AND date <= ?"
+            parameters.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+        # a private connection, the cursor stays open while the response is sent
+        connection = sqlite3.connect(
+            "file:{}?mode=ro".format(self.database_path), uri=True
+        )
+        try:
+            cursor = connection.execute(
+                "SELECT {} FROM prices WHERE {} ORDER BY category, region, date".format(
+                    ", ".join(COLUMNS.values()), where
+                ),
+                parameters,
+            )
+            rows = cursor.fetchmany(chunk_size)
+            # an empty selection still has its columns
+            yield self._frame(rows)
+            while len(rows) == chunk_size:
+                rows = cursor.fetchmany(chunk_size)
+                if rows:
+                    yield self._frame(rows)
+        finally:
+            connection.close()
+
+    def map_view(self, category, regions=None, month=None):
+        """
+        Description: Read the latest row of every market and the latest statistics of every region
+        in a month, the latest market rows are picked by SQLite
+
+        Args:
+        category (str): Selected category
+        regions (list): Selected regions, None or [] for all regions
+        month (Timestamp): Any date in the selected month, None for the latest data
+
+        Returns:
+        df_region (DataFrame): Latest statistics of every region, sorted by date and region
+        df_market (DataFrame): Latest row of every market, sorted by region and date
+        """
+        where, parameters = self._where(category, regions, month)
+        rows = self.query(
+            "SELECT {columns} FROM ("
+            " SELECT {columns}, ROW_NUMBER() OVER ("
+            "  PARTITION BY region, market ORDER BY date DESC, rowid DESC) AS position"
+            " FROM prices WHERE {where})"
+            " WHERE position = 1 ORDER BY region, date".format(
+                columns=", ".join(COLUMNS.values()), where=where
+            ),
+            parameters,
+        )
+        df_market = self._frame(rows)
+
+        df_region = self.aggregate(category, regions, month=month)
+        df_region = df_region.drop_duplicates(["Region"], keep="last").sort_values(
+            ["Date", "Region"]
+        )
+        return df_region, df_market.drop_duplicates(["Market"], keep="last")
+
+    def aggregate(self, category, regions=None, by_region=True, month=None):
+        """
+        Description: Max/mean/min/count, quantiles and market count of the prices of a category
+        per date, computed by SQLite
+
+        Args:
+        category (str): Selected category
+        regions (list): Selected regions, None or [] for all regions
+        by_region (bool): Also group by region
+        month (Timestamp): Any date in the month to aggregate, None for all dates
+
+        Returns:
+        (DataFrame): Statistics in the format of AggregateCube.region_slice / national_slice
+        """
+        where, parameters = self._where(category, regions, month)
+        keys = ["category", "region", "date"] if by_region else ["category", "date"]
+        rows = self.query(
+            "SELECT {keys}, MAX(price), AVG(price), MIN(price), COUNT(price),"
+            " {quantiles}, COUNT(DISTINCT market)"
+            " FROM ("
+            "  SELECT {keys}, market, ROUND(price, 2) AS price,"
+            "  ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY price) - 1 AS position,"
+            "  COUNT(*) OVER (PARTITION BY {keys}) AS n"
+            "  FROM prices WHERE {where} AND price IS NOT NULL)"
+            " GROUP BY {keys} ORDER BY {keys}".format(
+                keys=", ".join(keys),
+                quantiles=", ".join(
+                    _quantile_sql(quantile) for quantile in QUANTILES.values()
+                ),
+                where=where,
+            ),
+            parameters,
+        )
+        names = ["Category", "Region", "Date"] if by_region else ["Category", "Date"]
+        df = pd.DataFrame.from_records(
+            rows,
+            columns=names
+            + [PRICE_COLUMNS[name] for name in ["max", "mean", "min"]]
+            + ["count"]
+            + [PRICE_COLUMNS[name] for name in QUANTILES]
+            + ["markets"],
+        )
+        df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d")
+        for column in PRICE_COLUMNS.values():
+            df[column] = df[column].astype("float64")
+        df["count"] = df["count"].astype("int64")
+        df["markets"] = df["markets"].astype("int64")
+        return df
+
+    def anomalies(self, category):
+        """
+        Description: Read the flagged prices of a category in the date window,
+        detected over its rows on the first call, see price_anomalies.py
+
+        Args:
+        category (str): Category
+
+        Returns:
+        (DataFrame): Spikes and regional outliers of the category, sorted by date and market
+        """
+        if category not in self._anomalies:
+            self._anomalies[category] = detect_anomalies(self.select(category))
+        return self._anomalies[category]
+
+    def category_counts(self):
+        """
+        Description: Number of rows of every category in the date window
+
+        Returns:
+        (Series): Category -> number of rows, largest first
+        """
+        rows = self.query(
+            "SELECT category, COUNT(*) FROM prices WHERE date > ? GROUP BY category",
+            (self.start,),
+        )
+        return pd.Series(dict(rows), dtype="int64").sort_values(ascending=False)
+
+    def lookup_stats(self):
+        """
+        Description: Summarise the recent query times of the store
+
+        Returns:
+        (dict): Number of rows, number of recorded queries and their p50/p95/max in microseconds
+        """
+        if self._rows is None:
+            self._rows = int(self.category_counts().sum())
+        stats = {"rows": self._rows}
+        times = np.array(self.lookup_times) * 1e6
+        if times.size == 0:
+            return dict(stats, lookups=0)
+        return dict(
+            stats,
+            lookups=int(times.size),
+            p50_us=float(np.percentile(times, 50)),
+            p95_us=float(np.percentile(times, 95)),
+            max_us=float(times.max()),
+        )
+
+    def with_window(self, start_date=None):
+        """
+        Description: Open the same database with another date window, the new rows are
+        inserted by update_database
+
+        Args:
+        start_date (date): Start of the date window of the returned store
+
+        Returns:
+        (SqlitePriceStore): A new store on the same database
+        """
+        return SqlitePriceStore(
+            self.database_path,
+            start_date or self.start_date,
+            self.region_order,
+            version=self.version,
+        )
+
+    def _frame(self, rows):
+        # price rows typed like the PriceStore table
+        df = pd.DataFrame.from_records(rows, columns=list(COLUMNS))
+        df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d")
+        for column in ["Price", "Lat", "Lon"]:
+            df[column] = df[column].astype("float32")
+        return df
+
+    def _where(self, category, regions=None, month=None):
+        conditions = ["date > ?"]
+        parameters = [self.start]
+        if category is not None:
+            conditions.insert(0, "category = ?")
+            parameters.insert(0, category)
+        if regions not in (None, []):
+            conditions.append("region IN ({})".format(", ".join("?" * len(regions))))
+            parameters += list(regions)
+        if month is not None:
+            period = pd.Timestamp(month).to_period("M")
+            conditions += ["date >= ?", "date < ?"]
+            parameters += [
+                period.start_time.strftime("%Y-%m-%d"),
+                (period + 1).start_time.strftime("%Y-%m-%d"),
+            ]
+        return " AND ".join(conditions), parameters
+
+    def _connection(self):
+        # sqlite connections are not shared between threads, nor across a fork
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.connection = sqlite3.connect(
+                "file:{}?mode=ro".format(self.database_path), uri=True
+            )
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+
+def _read_meta(connection, key):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return None if row is None else json.loads(row[0])
+
+
+def _write_meta(connection, key, value):
+    connection.execute(
+        "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value))
+    )
+
+
+@contextmanager
+def _write_lock(database_path):
+    # one writer at a time across the processes sharing the database
+    os.makedirs(os.path.dirname(database_path) or ".", exist_ok=True)
+    with open(database_path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _quantile_sql(quantile):
+    # linear interpolation between the values at positions floor(q * (n - 1)) and the next one
+    # of a group ranked by price, as AggregateCube computes them
+    position = "({} * (n - 1))".format(quantile)
+    below = "CAST({} AS INTEGER)".format(position)
+    return (
+        "SUM(CASE WHEN position = {below} THEN price * (1 - ({position} - {below}))"
+        " WHEN position = {below} + 1 THEN price * ({position} - {below})"
+        " ELSE 0 END)".format(position=position, below=below)
+    )
+
+
+class SqliteCube:
+    """
+    Description: The AggregateCube interface over a SqlitePriceStore, the statistics are
+    aggregated by SQLite for the selected category and regions only
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def region_slice(self, category, regions=None):
+        return self.store.aggregate(category, regions, by_region=True)
+
+    def national_slice(self, category):
+        return self.store.aggregate(category, by_region=False)
+
+    def lookup(self, category, date, region=None):
+        # aggregated over the month of the date only, read through the (category, region, date) index
+        date = pd.Timestamp(date)
+        df = self.store.aggregate(
+            category,
+            None if region is None else [region],
+            by_region=region is not None,
+            month=date,
+        )
+        df = df[df["Date"] == date]
+        if df.empty:
+            return None
+        return (
+            df.drop(columns=["Category", "Region", "Date"], errors="ignore")
+            .iloc[0]
+            .to_dict()
+        )
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        with _write_lock(DATABASE_PATH):
+            build_database()
+        print("database written to {}".format(DATABASE_PATH))
+    else:
+        sys.exit(__doc__)
@@ -0,0 +1,319 @@
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from price_aggregates import AggregateCube, column_codes
+from price_anomalies import detect_anomalies, split_by_category
+from price_dimensions import PriceDimensions, to_facts
+from price_partitions import MonthPartitions
+
+# the columns the price table is kept sorted by, the offset index is built on the first two
+SORT_KEYS = ["Category", "Region", "Date"]
+
+
+def load_prices(path, start_date=None):
+    """
+    Description: Read and clean the crop price csv
+
+    Args:
+    path (str): Path of the bantaypresyo csv
+    start_date (date): Only keep the rows after this date, None to keep all rows
+
+    Returns:
+    (DataFrame): Price rows with a parsed Date column and without Specification
+    """
+    df = pd.read_csv(path)
+    df = df.drop(["Specification"], axis=1)
+    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
+    if start_date is not None:
+        df = df[df["Date"] > pd.to_datetime(start_date)]
+    return df
+
+
+class PriceStore:
+    """
+    Description: In-memory price table sorted by (Category, Region, Date) with an offset index,
+    so that a (category, regions, month) selection is a set of contiguous row slices
+    found by dict lookups and binary searches instead of boolean masks over the whole table.
+    The map view of every category and month is precomputed in MonthPartitions.
+    The table is a fact table: the markets and the main categories are kept once in
+    PriceDimensions, see price_dimensions.py.
+    """
+
+    def __init__(
+        self,
+        df,
+        region_order=None,
+        cube=None,
+        presorted=False,
+        lookup_history=1000,
+        dimensions=None,
+        source_offset=None,
+    ):
+        # price rows are split into the fact table and its dimensions, built from the rows
+        # when no dimensions are given
+        if dimensions is None:
+            dimensions = PriceDimensions.build(df)
+        self.dimensions = dimensions
+        df = to_facts(df)
+        # presorted tables (e.g. attached read-only from shared memory) are used as they are
+        if not presorted:
+            df = df.sort_values(SORT_KEYS, kind="stable").reset_index(drop=True)
+        self.df = df
+        self.dates = self.df["Date"].to_numpy()
+        self.offsets, self.category_offsets = _build_offsets(self.df)
+        self.region_availability = build_region_availability(self.offsets, region_order)
+        self.cube = cube if cube is not None else AggregateCube.build(self.df)
+        self.partitions = MonthPartitions.build(self.df, self.cube)
+        self.lookup_times = deque(maxlen=lookup_history)
+        # size of the part of the csv the rows were read from, the ingestion starts there
+        self.source_offset = source_offset
+        self._anomalies = None
+
+    def available_regions(self, category):
+        """
+        Description: List the regions in which a category has prices, read from the precomputed map
+
+        Args:
+        category (str): Category
+
+        Returns:
+        (list): Regions in the region dropdown order
+        """
+        return self.region_availability.get(category, [])
+
+    def bounds(self, category, regions=None, month=None):
+        """
+        Description: Resolve a selection to row ranges of the sorted table, using only
+        dict lookups and binary searches. The time spent is recorded for lookup_stats.
+
+        Args:
+        category (str): Selected category
+        regions (list): Selected regions, None or [] for all regions
+        month (Timestamp): Any date in the selected month, None for all dates
+
+        Returns:
+        (list): (start, stop) row ranges, one per region block
+        """
+        started = time.perf_counter()
+        if regions in (None, []) and month is None:
+            bounds = [self.category_offsets.get(category, (0, 0))]
+        else:
+            if regions in (None, []):
+                regions = self.available_regions(category)
+            bounds = [
+                self.offsets[(category, region)]
+                for region in regions
+                if (category, region) in self.offsets
+            ]
+            if month is not None:
+                period = pd.Timestamp(month).to_period("M")
+                month_start = np.datetime64(period.start_time)
+                month_end = np.datetime64((period + 1).start_time)
+                bounds = [
+                    self._date_bounds(start, stop, month_start, month_end)
+                    for start, stop in bounds
+                ]
+        bounds = [(start, stop) for start, stop in bounds if stop > start]
+        self.lookup_times.append(time.perf_counter() - started)
+        return bounds
+
+    def chunks(
+        self, category=None, regions=None, start=None, end=None, chunk_size=10000
+    ):
+        """
+        Description: Iterate over the rows of a selection in chunks, for the exports.
+        The chunks are read from the sorted table and joined with the dimensions one at a time,
+        nothing is copied up front.
+
+        Args:
+        category (str): Selected category, None for every category
+        regions (list): Selected regions, None or [] for all regions
+        start (date): First date of the rows, None for no lower bound
+        end (date): Last date of the rows, None for no upper bound
+        chunk_size (int): Most rows per chunk
+
+        Yields:
+        (DataFrame): Rows sorted by category, region and date, with their main category and coordinates
+        """
+        categories = list(self.category_offsets) if category is None else [category]
+        date_start = np.datetime64(pd.Timestamp(start)) if start is not None else None
+        date_end = (
+            np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1))
+            if end is not None
+            else None
+        )
+        dated = date_start is not None or date_end is not None
+        table_regions = {}
+        if dated and not regions:
+            # the dates are only sorted inside a (category, region) block, so every region
+            # block is searched rather than the whole category block
+            for block_category, region in self.offsets:
+                table_regions.setdefault(block_category, []).append(region)
+        empty = True
+        for selected in categories:
+            for block_start, block_stop in self.bounds(
+                selected, table_regions.get(selected, regions)
+            ):
+                if dated:
+                    block_start, block_stop = self._date_bounds(
+                        block_start,
+                        block_stop,
+                        self.dates[block_start] if date_start is None else date_start,
+                        (
+                            self.dates[block_stop - 1] + 1
+                            if date_end is None
+                            else date_end
+                        ),
+                    )
+                for chunk_start in range(block_start, block_stop, chunk_size):
+                    empty = False
+                    yield self.dimensions.expand(
+                        self.df.iloc[
+                            chunk_start : min(chunk_start + chunk_size, block_stop)
+                        ]
+                    )
+        if empty:
+            # an empty selection still has its columns
+            yield self.dimensions.expand(self.df.iloc[0:0])
+
+    def map_view(self, category, regions=None, month=None):
+        """
+        Description: Read the map data of a category from the precomputed month partitions
+
+        Args:
+        category (str): Selected category
+        regions (list): Selected regions, None or [] for all regions
+        month (Timestamp): Any date in the selected month, None for the latest data
+
+        Returns:
+        df_region (DataFrame): Latest statistics of every region in the month
+        df_market (DataFrame): Latest row of every market in the month, with its coordinates
+        """
+        started = time.perf_counter()
+        df_region, df_market = self.partitions.map_view(category, regions, month)
+        # the coordinates of the drawn markets only
+        df_market = self.dimensions.coordinates(df_market)
+        self.lookup_times.append(time.perf_counter() - started)
+        return df_region, df_market
+
+    def anomalies(self, category):
+        """
+        Description: Read the flagged prices of a category. The detection runs once over
+        the whole table, on the first call, see price_anomalies.py
+
+        Args:
+        category (str): Category
+
+        Returns:
+        (DataFrame): Spikes and regional outliers of the category, sorted by date and market
+        """
+        if self._anomalies is None:
+            anomalies = detect_anomalies(self.df)
+            self._anomalies = split_by_category(anomalies), anomalies.iloc[0:0]
+        by_category, empty = self._anomalies
+        return by_category.get(category, empty)
+
+    def category_counts(self):
+        """
+        Description: Number of rows of every category, read from the offset index
+
+        Returns:
+        (Series): Category -> number of rows, largest first
+        """
+        return pd.Series(
+            {
+                category: stop - start
+                for category, (start, stop) in self.category_offsets.items()
+            },
+            dtype="int64",
+        ).sort_values(ascending=False)
+
+    def lookup_stats(self):
+        """
+        Description: Summarise the recent lookup times of the store
+
+        Returns:
+        (dict): Number of rows, number of recorded lookups and their p50/p95/max in microseconds
+        """
+        times = np.array(self.lookup_times) * 1e6
+        if times.size == 0:
+            return {"rows": len(self.df), "lookups": 0}
+        return {
+            "rows": len(self.df),
+            "lookups": int(times.size),
+            "p50_us": float(np.percentile(times, 50)),
+            "p95_us": float(np.percentile(times, 95)),
+            "max_us": float(times.max()),
+        }
+
+    def _date_bounds(self, start, stop, date_start, date_end):
+        # binary search of [date_start, date_end) inside one date sorted region block
+        dates = self.dates[start:stop]
+        return (
+            start + int(np.searchsorted(dates, date_start)),
+            start + int(np.searchsorted(dates, date_end)),
+        )
+
+
+def build_region_availability(offsets, region_order=None):
+    """
+    Description: Build the category -> available regions map from the offset index
+
+    Args:
+    offsets (dict): (category, region) -> (start, stop) offset index
+    region_order (list): Order of the regions, regions not in it are put last in sorted order
+
+    Returns:
+    (dict): category -> list of regions having at least one price
+    """
+    position = {region: i for i, region in enumerate(region_order or [])}
+    availability = {}
+    for category, region in offsets:
+        availability.setdefault(category, []).append(region)
+    for category, category_regions in availability.items():
+        category_regions.sort(
+            key=lambda region: (position.get(region, len(position)), region)
+        )
+    return availability
+
+
+def _build_offsets(df):
+    """
+    Description: Find the row range of every (Category, Region) block and every Category block
+    of a table sorted by SORT_KEYS
+
+    Returns:
+    (dict, dict): (category, region) -> (start, stop) and category -> (start, stop)
+    """
+    if df.empty:
+        return {}, {}
+    categories, category_names = column_codes(df["Category"])
+    regions, region_names = column_codes(df["Region"])
+
+    region_change = (
+        np.flatnonzero(
+            (categories[1:] != categories[:-1]) | (regions[1:] != regions[:-1])
+        )
+        + 1
+    )
+    starts = np.r_[0, region_change]
+    stops = np.r_[region_change, len(df)]
+    offsets = {
+        (category_names[categories[start]], region_names[regions[start]]): (
+            int(start),
+            int(stop),
+        )
+        for start, stop in zip(starts, stops)
+    }
+
+    category_change = np.flatnonzero(categories[1:] != categories[:-1]) + 1
+    starts = np.r_[0, category_change]
+    stops = np.r_[category_change, len(df)]
+    category_offsets = {
+        category_names[categories[start]]: (int(start), int(stop))
+        for start, stop in zip(starts, stops)
+    }
+    return offsets, category_offsets
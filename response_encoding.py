@@ -0,0 +1,183 @@
+"""
+Encoding of the dashboard responses: the JSON engine of the figures and the compression
+of the responses.
+
+Configured with environment variables:
+    PRICE_JSON_ENGINE=orjson         serialize the figures and callback outputs with orjson
+                                     (numpy arrays are encoded natively), json by default
+    PRICE_COMPRESSION=on             gzip, or brotli when installed and accepted, the responses
+                                     of at least PRICE_COMPRESS_MIN_BYTES; off to disable
+    PRICE_COMPRESS_MIN_BYTES=1024    smaller responses are sent as they are
+    PRICE_COMPRESS_LEVEL=6           gzip level, the brotli quality is derived from it
+"""
+
+import gzip
+import json
+import os
+import warnings
+
+from flask import request
+from plotly.io import json as plotly_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_ENGINE = os.environ.get("PRICE_JSON_ENGINE", "json")
+COMPRESSION = os.environ.get("PRICE_COMPRESSION", "on")
+COMPRESS_MIN_BYTES = int(os.environ.get("PRICE_COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("PRICE_COMPRESS_LEVEL", "6"))
+
+# text responses worth compressing, the images and fonts are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/geo+json",
+    "application/javascript",
+    "application/x-ndjson",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+
+def configure_json_engine(engine=None):
+    """
+    Description: Select the engine plotly uses to serialize the figures, which is also
+    the encoder of the Dash callback responses. orjson falls back to json when it is not installed.
+
+    Args:
+    engine (str): json or orjson, PRICE_JSON_ENGINE by default
+
+    Returns:
+    (str): The engine in use
+    """
+    engine = engine or JSON_ENGINE
+    if engine == "orjson" and orjson is None:
+        warnings.warn("orjson is not installed, the figures are serialized with json")
+        engine = "json"
+    plotly_json.config.default_engine = engine
+    return engine
+
+
+def loads(text):
+    """
+    Description: Decode JSON with the configured engine
+
+    Args:
+    text (str): JSON document
+
+    Returns:
+    (object): The decoded value
+    """
+    if plotly_json.config.default_engine == "orjson":
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def compress(body, encoding, level=None):
+    """
+    Description: Compress a response body
+
+    Args:
+    body (bytes): Response body
+    encoding (str): gzip or br
+    level (int): Compression level, PRICE_COMPRESS_LEVEL by default
+
+    Returns:
+    (bytes): The compressed body
+    """
+    level = level or COMPRESS_LEVEL
+    if encoding == "br":
+        # the brotli quality goes to 11, its level 5 is about as fast as gzip 6
+        return brotli.compress(body, quality=min(level - 1, 11))
+    return gzip.compress(body, level)
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Description: List the content encodings accepted by the client
+
+    Args:
+    accept_encoding (str): Accept-Encoding header of the request
+
+    Returns:
+    (set): Lowercase encodings of the header, without the ones refused with a q of 0
+    or an invalid q
+    """
+    accepted = set()
+    for part in accept_encoding.split(","):
+        encoding, *parameters = part.split(";")
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        if encoding.strip() and quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def accepted_encoding(accept_encoding):
+    """
+    Description: Pick the best content encoding accepted by the client
+
+    Args:
+    accept_encoding (str): Accept-Encoding header of the request
+
+    Returns:
+    (str): br, gzip or None
+    """
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def register_compression(app, min_bytes=None, level=None):
+    """
+    Description: Compress the responses of the Dash server that are worth it:
+    text responses of at least min_bytes that are not streamed nor already encoded
+
+    Args:
+    app (Dash): The dashboard app
+    min_bytes (int): Smallest response compressed, PRICE_COMPRESS_MIN_BYTES by default
+    level (int): Compression level, PRICE_COMPRESS_LEVEL by default
+    """
+    min_bytes = COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+
+    @app.server.after_request
+    def compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = accepted_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None or response.calculate_content_length() < min_bytes:
+            return response
+
+        response.set_data(compress(response.get_data(), encoding, level))
+        response.headers["Content-Encoding"] = encoding
+        # the compressed body is another representation of the same content: a strong ETag
+        # becomes weak, a revalidation still matches it with the weak comparison of GET
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,239 @@
+"""
+Price table shared between server workers through memory-mapped numpy files.
+
+The sorted price table of a PriceStore, its aggregate cube and its dimensions are written
+once to a directory of .npy files. Every worker then attaches to them read-only with
+numpy.load(mmap_mode="r"): the pages are shared through the OS page cache,
+so adding workers barely increases the resident memory.
+
+Text columns are stored as categorical codes, numeric columns of the same dtype
+as one 2D array, so attaching builds the DataFrames without copying any column.
+
+Multi-worker launch:
+    PRICE_SHARED_DIR=data/shared gunicorn --workers 4 --preload wsgi:server
+
+With --preload the master process loads the data, exports it if the export is
+missing or stale, and the forked workers inherit the mapping. Without --preload
+the first worker exports under a file lock and the others wait and attach.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from price_aggregates import STATISTICS, AggregateCube
+from price_dimensions import PriceDimensions
+from price_store import PriceStore
+
+CURRENT_FILE = "current.json"
+
+
+def export_store(store, directory, signature):
+    """
+    Description: Write the sorted price table, the aggregate cube and the dimensions of a store as .npy files.
+    A new version directory is written and then published by replacing current.json,
+    workers still attached to an older version keep reading their files.
+
+    Args:
+    store (PriceStore): The store to share
+    directory (str): Shared dataset directory
+    signature (dict): Description of the data the store was built from, see open_shared_store
+    """
+    version = uuid.uuid4().hex
+    version_directory = os.path.join(directory, version)
+    os.makedirs(version_directory)
+    meta = {
+        "signature": signature,
+        "version": version,
+        "source_offset": store.source_offset,
+        "table": _write_frame(store.df, version_directory, "table"),
+        "region": _write_frame(store.cube.region, version_directory, "region"),
+        "national": _write_frame(store.cube.national, version_directory, "national"),
+        "markets": _write_frame(store.dimensions.markets, version_directory, "markets"),
+        "categories": _write_frame(
+            store.dimensions.categories, version_directory, "categories"
+        ),
+        "missing": _write_frame(store.dimensions.missing, version_directory, "missing"),
+    }
+    current = os.path.join(directory, CURRENT_FILE)
+    with open(current + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(current + ".tmp", current)
+
+    # the files of older versions stay readable by the workers mapping them until they exit
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name != version and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def attach_store(directory, region_order=None):
+    """
+    Description: Attach read-only to the shared price table, aggregate cube and dimensions
+
+    Args:
+    directory (str): Shared dataset directory
+    region_order (list): Order of the regions in the region dropdown
+
+    Returns:
+    (PriceStore): Store whose table and cube are memory-mapped views of the shared files
+    """
+    meta = read_meta(directory)
+    version_directory = os.path.join(directory, meta["version"])
+    cube = AggregateCube(
+        _read_frame(version_directory, meta["region"]),
+        _read_frame(version_directory, meta["national"]),
+    )
+    dimensions = PriceDimensions(
+        _read_frame(version_directory, meta["markets"]),
+        _read_frame(version_directory, meta["categories"]),
+        _read_frame(version_directory, meta["missing"]),
+    )
+    return PriceStore(
+        _read_frame(version_directory, meta["table"]),
+        region_order=region_order,
+        cube=cube,
+        presorted=True,
+        dimensions=dimensions,
+        source_offset=meta.get("source_offset"),
+    )
+
+
+def read_meta(directory):
+    """
+    Description: Read the description of the currently published export
+
+    Returns:
+    (dict): The export description, None when nothing was exported yet
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def open_shared_store(directory, signature, build_store, region_order=None):
+    """
+    Description: Attach to the shared export, exporting it first when it is missing
+    or was built from other data. Only one process exports at a time.
+
+    Args:
+    directory (str): Shared dataset directory
+    signature (dict): JSON serialisable description of the source data and date window
+    build_store (callable): Returns the PriceStore to export when needed
+    region_order (list): Order of the regions in the region dropdown
+
+    Returns:
+    (PriceStore): Store attached to the shared export
+    """
+    # an export of a cube with other statistics is exported again
+    signature = dict(signature, statistics=STATISTICS)
+    os.makedirs(directory, exist_ok=True)
+    meta = read_meta(directory)
+    if meta is None or meta["signature"] != signature:
+        with _export_lock(directory):
+            meta = read_meta(directory)
+            if meta is None or meta["signature"] != signature:
+                export_store(build_store(), directory, signature)
+    return attach_store(directory, region_order)
+
+
+@contextmanager
+def _export_lock(directory):
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_frame(df, directory, name):
+    """
+    Description: Write the columns of a DataFrame as .npy files
+
+    Returns:
+    (dict): Layout of the files, used by _read_frame
+    """
+    index_names = list(df.index.names) if isinstance(df.index, pd.MultiIndex) else []
+    if index_names:
+        df = df.reset_index()
+    layout = {"index": index_names, "columns": [], "blocks": []}
+
+    numeric = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            values = values.astype("category")
+            filename = "{}.{}.codes.npy".format(name, len(layout["columns"]))
+            np.save(os.path.join(directory, filename), values.cat.codes.to_numpy())
+            layout["columns"].append(
+                {
+                    "name": column,
+                    "kind": "category",
+                    "file": filename,
+                    "categories": values.cat.categories.tolist(),
+                }
+            )
+        elif np.issubdtype(values.dtype, np.datetime64):
+            filename = "{}.{}.datetime.npy".format(name, len(layout["columns"]))
+            np.save(
+                os.path.join(directory, filename),
+                values.to_numpy(dtype="datetime64[ns]").view("int64"),
+            )
+            layout["columns"].append(
+                {"name": column, "kind": "datetime", "file": filename}
+            )
+        else:
+            numeric.setdefault(values.dtype.str, []).append(column)
+
+    # numeric columns of the same dtype are stored as one 2D array, i.e. one pandas block
+    for dtype, columns in numeric.items():
+        filename = "{}.{}.npy".format(name, np.dtype(dtype).name)
+        np.save(os.path.join(directory, filename), df[columns].to_numpy(dtype=dtype))
+        layout["blocks"].append({"columns": columns, "file": filename})
+    return layout
+
+
+def _read_frame(directory, layout):
+    """
+    Description: Build a DataFrame over the memory-mapped files written by _write_frame,
+    without copying the column data
+
+    Returns:
+    (DataFrame): Read-only frame, indexed like the frame that was written
+    """
+    columns = {}
+    for column in layout["columns"]:
+        values = np.load(os.path.join(directory, column["file"]), mmap_mode="r")
+        if column["kind"] == "category":
+            columns[column["name"]] = pd.Series(
+                pd.Categorical.from_codes(values, categories=column["categories"]),
+                name=column["name"],
+            )
+        else:
+            columns[column["name"]] = pd.Series(
+                values.view("datetime64[ns]"), name=column["name"]
+            )
+
+    index = None
+    if layout["index"]:
+        index = pd.MultiIndex.from_arrays(
+            [columns.pop(name) for name in layout["index"]], names=layout["index"]
+        )
+
+    frames = [series.to_frame() for series in columns.values()]
+    for block in layout["blocks"]:
+        values = np.load(os.path.join(directory, block["file"]), mmap_mode="r")
+        frames.append(pd.DataFrame(values, columns=block["columns"], copy=False))
+    df = pd.concat(frames, axis=1, copy=False)
+    if index is not None:
+        df.index = index
+    return df
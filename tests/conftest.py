@@ -0,0 +1,34 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from price_api import register_api  # noqa: E402
+from price_cache import to_typed  # noqa: E402
+from price_store import PriceStore, load_prices  # noqa: E402
+
+CSV_PATH = os.path.join(REPOSITORY, "data", "bantaypresyo.csv")
+
+
+@pytest.fixture(scope="session")
+def prices():
+    # the price csv of the repository, typed as the cache loads it
+    return to_typed(load_prices(CSV_PATH))
+
+
+@pytest.fixture(scope="session")
+def store(prices):
+    return PriceStore(prices)
+
+
+@pytest.fixture
+def api(store):
+    # the API endpoints on a bare Flask server, the version of the data is fixed
+    app = SimpleNamespace(server=Flask(__name__))
+    register_api(app, lambda: store, lambda: "1")
+    return app.server.test_client()
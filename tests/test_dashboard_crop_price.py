@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+from conftest import REPOSITORY
+
+# the dashboard is built once per process, each check runs in a fresh interpreter
+BUILD = """
+import os
+import dashboard_crop_price
+app = dashboard_crop_price.create_app({"PRICE_ANOMALY_WINDOW": "6"})
+import price_anomalies
+assert price_anomalies.WINDOW == 6
+assert "PRICE_ANOMALY_WINDOW" not in os.environ
+assert dashboard_crop_price.create_app() is app
+try:
+    dashboard_crop_price.create_app({"PRICE_ANOMALY_WINDOW": "4"})
+except RuntimeError:
+    pass
+else:
+    raise AssertionError("config after the build was accepted")
+"""
+
+IMPORTED_FIRST = """
+import price_anomalies
+import dashboard_crop_price
+try:
+    dashboard_crop_price.create_app({"PRICE_ANOMALY_WINDOW": "6"})
+except RuntimeError as error:
+    assert "price_anomalies" in str(error)
+else:
+    raise AssertionError("config after the import was accepted")
+"""
+
+
+def run(script):
+    environment = dict(os.environ)
+    environment.pop("PRICE_ANOMALY_WINDOW", None)
+    return subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=REPOSITORY,
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_config_is_applied_while_building_and_restored():
+    result = run(BUILD)
+    assert result.returncode == 0, result.stderr
+
+
+def test_config_after_the_modules_are_imported_raises():
+    result = run(IMPORTED_FIRST)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import lttb, minmax, visible_points
+
+
+def trace(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype="float64") * 86400, rng.normal(100, 10, n).cumsum()
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (1000, 3), (101, 100), (10, 5)])
+def test_lttb_keeps_the_ends_and_threshold_points(n, threshold):
+    x, y = trace(n)
+    kept = lttb(x, y, threshold)
+    assert len(kept) == threshold
+    assert kept[0] == 0
+    assert kept[-1] == n - 1
+    assert (np.diff(kept) > 0).all()
+
+
+@pytest.mark.parametrize("threshold", [1000, 2000, 2])
+def test_lttb_keeps_everything_below_the_threshold(threshold):
+    x, y = trace(1000)
+    np.testing.assert_array_equal(lttb(x, y, threshold), np.arange(1000))
+
+
+def test_lttb_keeps_a_spike():
+    x, y = trace(1000)
+    y[437] = y.max() * 10
+    assert 437 in lttb(x, y, 50)
+
+
+def test_lttb_with_missing_values():
+    x, y = trace(1000)
+    y[100:300] = np.nan
+    kept = lttb(x, y, 100)
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+
+
+def test_minmax_keeps_the_extremes():
+    x, y = trace(1000)
+    kept = minmax(x, y, 100)
+    assert {0, 999, int(np.argmin(y)), int(np.argmax(y))} <= set(kept)
+
+
+def test_visible_points_caps_the_zoomed_range():
+    dates = pd.Series(pd.date_range("2020-01-01", periods=2000, freq="D"))
+    values = pd.Series(trace(2000)[1])
+    x_range = ("2021-01-01", "2021-12-31")
+    kept = visible_points(dates, values, x_range, max_points=100)
+    inside = kept[(dates[kept] >= x_range[0]) & (dates[kept] <= x_range[1])]
+    assert len(inside) == 100
+    assert len(kept) > len(inside)
+    assert (np.diff(kept) > 0).all()
@@ -0,0 +1,44 @@
+from figure_cache import FigureCache
+
+
+def test_values_are_cached_until_cleared():
+    cache = FigureCache(maxsize=4, ttl=600)
+    assert cache.get_or_compute("key", lambda: 1) == 1
+    assert cache.get_or_compute("key", lambda: 2) == 1
+    cache.clear()
+    assert cache.get_or_compute("key", lambda: 3) == 3
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_a_value_computed_across_a_reload_is_not_cached():
+    cache = FigureCache(maxsize=4, ttl=600)
+
+    def reload_while_computing():
+        cache.clear()
+        return "old data"
+
+    assert cache.get_or_compute("key", reload_while_computing) == "old data"
+    assert cache.get_or_compute("key", lambda: "new data") == "new data"
+
+
+def test_a_value_of_an_older_generation_is_not_cached():
+    cache = FigureCache(maxsize=4, ttl=600)
+    # the callback read the store, then the store was swapped and the cache cleared
+    generation = cache.generation
+    cache.clear()
+    assert cache.get_or_compute("key", lambda: "old data", generation) == "old data"
+    assert not cache.contains("key")
+    assert not cache.warm("key", lambda: "old data", generation=generation)
+    assert not cache.contains("key")
+    assert cache.warm("key", lambda: "new data")
+    assert cache.get_or_compute("key", lambda: "other") == "new data"
+
+
+def test_the_least_recently_used_value_is_evicted():
+    cache = FigureCache(maxsize=2, ttl=600)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+    assert cache.contains("a") and cache.contains("c") and not cache.contains("b")
+    assert cache.evictions == 1
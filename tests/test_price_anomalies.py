@@ -0,0 +1,17 @@
+import numpy as np
+
+from price_anomalies import ANOMALY_COLUMNS, detect_anomalies
+
+
+def test_anomalies_of_an_empty_table_keep_their_dtypes(store):
+    anomalies = detect_anomalies(store.df.iloc[0:0])
+    assert list(anomalies.columns) == ANOMALY_COLUMNS
+    assert anomalies.empty
+    assert np.issubdtype(anomalies["Date"].dtype, np.datetime64)
+    assert anomalies["Date"].dt.strftime("%Y-%m-%d").empty
+
+
+def test_anomalies_are_flagged_rows_of_the_table(store):
+    anomalies = detect_anomalies(store.df)
+    assert list(anomalies.columns) == ANOMALY_COLUMNS
+    assert (anomalies["Spike"] | anomalies["Regional Outlier"]).all()
@@ -0,0 +1,79 @@
+import pytest
+
+
+@pytest.mark.parametrize("endpoint", ["aggregates", "prices"])
+@pytest.mark.parametrize(
+    "aware", ["2023-07-01T00:00Z", "2023-07-01T00:00%2B08:00", "2023-07-01T00:00-05:00"]
+)
+def test_a_date_with_a_time_zone_is_used_as_written(api, endpoint, aware):
+    naive = api.get("/api/v1/{}?category=Tilapia&start=2023-07-01".format(endpoint))
+    response = api.get("/api/v1/{}?category=Tilapia&start={}".format(endpoint, aware))
+    assert response.status_code == 200
+    assert response.data == naive.data
+
+
+@pytest.mark.parametrize("endpoint", ["aggregates", "prices"])
+@pytest.mark.parametrize(
+    "query", ["start=garbage", "end=NaT", "start=2023-02-30", "end=99999-01-01"]
+)
+def test_a_date_that_does_not_parse_is_a_bad_request(api, endpoint, query):
+    response = api.get("/api/v1/{}?category=Tilapia&{}".format(endpoint, query))
+    assert response.status_code == 400
+    assert "is not a date" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("endpoint", ["aggregates", "prices"])
+@pytest.mark.parametrize(
+    "header, gzipped",
+    [
+        ("gzip", True),
+        ("br, gzip;q=0.5", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0", False),
+        ("identity", False),
+    ],
+)
+def test_gzip_only_when_accepted(api, endpoint, header, gzipped):
+    response = api.get(
+        "/api/v1/{}?category=Tilapia".format(endpoint),
+        headers={"Accept-Encoding": header},
+    )
+    assert response.status_code == 200
+    assert (response.headers.get("Content-Encoding") == "gzip") == gzipped
+    assert response.data.startswith(b"\x1f\x8b") == gzipped
+
+
+@pytest.mark.parametrize("endpoint, weak", [("aggregates", False), ("prices", True)])
+@pytest.mark.parametrize("header", ["gzip", "identity"])
+def test_a_known_etag_is_not_modified(api, endpoint, weak, header):
+    url = "/api/v1/{}?category=Tilapia".format(endpoint)
+    headers = {"Accept-Encoding": header}
+    response = api.get(url, headers=headers)
+    etag, is_weak = response.get_etag()
+    assert is_weak == weak
+
+    cached = api.get(
+        url, headers=dict(headers, **{"If-None-Match": response.headers["ETag"]})
+    )
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert cached.get_etag() == (etag, weak)
+
+    changed = api.get(url, headers=dict(headers, **{"If-None-Match": '"other"'}))
+    assert changed.status_code == 200
+    assert changed.data == response.data
+
+
+def test_the_gzip_and_identity_etags_differ(api):
+    url = "/api/v1/aggregates?category=Tilapia"
+    gzipped = api.get(url, headers={"Accept-Encoding": "gzip"})
+    plain = api.get(url, headers={"Accept-Encoding": "identity"})
+    assert gzipped.get_etag() != plain.get_etag()
+    cached = api.get(
+        url,
+        headers={
+            "Accept-Encoding": "identity",
+            "If-None-Match": gzipped.headers["ETag"],
+        },
+    )
+    assert cached.status_code == 200
@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+
+from price_aggregates import AggregateCube
+from price_cache import read_appended_rows, to_typed
+from price_ingest import PriceIngestor, merge_rows
+from price_store import PriceStore, load_prices
+
+HEADER = "Category,Specification,Main Category,Market,Region,Price,Date,Lat,Lon\n"
+ROWS = [
+    "Tilapia,KG,Fish,Pasig Mega Market,NCR - National Capital Region,{},{},14.5,121.0\n",
+    "Tilapia,KG,Fish,Binan Public Market,CALBARZON (Region IV-A),{},{},14.3,121.0\n",
+    "Egg,PC,Poultry,Pasig Mega Market,NCR - National Capital Region,{},{},14.5,121.0\n",
+]
+
+
+def lines(prices, date):
+    return "".join(row.format(price, date) for row, price in zip(ROWS, prices))
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text(HEADER + lines([100, 110, 7], "01/01/2024"))
+    return str(path)
+
+
+def append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_only_complete_appended_lines_are_read(csv_path):
+    offset = len(open(csv_path, "rb").read())
+    rows, same = read_appended_rows(csv_path, offset)
+    assert rows is None and same == offset
+
+    append(csv_path, lines([120, 130, 8], "08/01/2024") + "Tilapia,KG,Fi")
+    rows, new_offset = read_appended_rows(csv_path, offset)
+    assert len(rows) == 3
+    assert list(rows["Price"]) == [120, 130, 8]
+    assert (rows["Date"] == pd.Timestamp("2024-01-08")).all()
+    # the partial line is left for the next read
+    assert new_offset == offset + len(lines([120, 130, 8], "08/01/2024"))
+
+    append(csv_path, "sh,x,y,100,08/01/2024,1,1\n")
+    rows, _ = read_appended_rows(csv_path, new_offset)
+    assert len(rows) == 1
+
+
+def test_merged_rows_update_the_store_and_the_cube(csv_path):
+    store = PriceStore(to_typed(load_prices(csv_path)))
+    offset = len(open(csv_path, "rb").read())
+    append(csv_path, lines([120, 130, 8], "08/01/2024"))
+    rows, _ = read_appended_rows(csv_path, offset)
+
+    merged = merge_rows(store, rows)
+    assert len(merged.df) == 6
+    assert len(store.df) == 3
+    assert merged.category_counts().to_dict() == {"Tilapia": 4, "Egg": 2}
+    rebuilt = AggregateCube.build(merged.df)
+    pd.testing.assert_frame_equal(
+        merged.cube.region_frame(), rebuilt.region_frame(), check_exact=False
+    )
+
+
+def test_merge_drops_the_rows_before_the_window(csv_path):
+    store = PriceStore(to_typed(load_prices(csv_path)))
+    rows = load_prices(csv_path).assign(Date=pd.Timestamp("2024-02-01"))
+    merged = merge_rows(store, rows, start_date="2024-01-15")
+    assert len(merged.df) == 3
+    assert (merged.df["Date"] == pd.Timestamp("2024-02-01")).all()
+
+
+def test_poll_hands_over_the_appended_rows(csv_path, tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    received = []
+    ingestor = PriceIngestor(
+        csv_path,
+        received.append,
+        lambda: pytest.fail("the csv was only appended to"),
+        incoming_dir=str(incoming),
+    )
+    assert ingestor.poll() == 0
+    assert received == [None]
+
+    append(csv_path, lines([120, 130, 8], "08/01/2024"))
+    (incoming / "drop.csv").write_text(HEADER + lines([140], "15/01/2024"))
+    assert ingestor.poll() == 4
+    assert list(received[-1]["Price"]) == [120, 130, 8, 140]
+
+    # read once: the next poll has nothing new
+    assert ingestor.poll() == 0
+
+
+def test_poll_reloads_a_rewritten_csv(csv_path):
+    reloads = []
+
+    def reload():
+        reloads.append(True)
+        return len(open(csv_path, "rb").read())
+
+    ingestor = PriceIngestor(csv_path, lambda rows: None, reload)
+    with open(csv_path, "w") as f:
+        f.write(HEADER)
+    assert ingestor.poll() == 0
+    assert reloads == [True]
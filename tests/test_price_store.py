@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from price_dimensions import FACT_COLUMNS
+
+COMPARED_COLUMNS = FACT_COLUMNS + ["Main Category"]
+
+
+def filter_prices(prices, category=None, regions=None, start=None, end=None):
+    # the selection as a plain pandas mask over the unsorted rows
+    mask = pd.Series(True, index=prices.index)
+    if category is not None:
+        mask &= prices["Category"] == category
+    if regions:
+        mask &= prices["Region"].isin(regions)
+    if start is not None:
+        mask &= prices["Date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= prices["Date"] <= pd.Timestamp(end)
+    return prices[mask]
+
+
+def normalize(df, columns=COMPARED_COLUMNS):
+    df = df[columns].astype(
+        {
+            column: str
+            for column in ["Category", "Main Category", "Market", "Region"]
+            if column in columns
+        }
+    )
+    return df.sort_values(columns).reset_index(drop=True)
+
+
+@pytest.mark.parametrize(
+    "category, regions, start, end",
+    [
+        ("Tilapia", None, None, None),
+        ("Tilapia", None, "2023-08-01", None),
+        ("Tilapia", None, "2023-07-01", None),
+        ("Tilapia", None, None, "2023-03-31"),
+        ("Tilapia", None, "2023-03-01", "2023-05-31"),
+        ("Tilapia", ["NCR - National Capital Region"], "2023-08-01", None),
+        (
+            "Egg",
+            ["NCR - National Capital Region", "CALBARZON (Region IV-A)"],
+            "2023-02-01",
+            "2023-06-30",
+        ),
+        (None, None, "2023-08-01", None),
+        (None, ["NCR - National Capital Region"], None, "2023-02-28"),
+        (None, None, None, None),
+    ],
+)
+def test_chunks_match_a_pandas_filter(prices, store, category, regions, start, end):
+    exported = pd.concat(
+        store.chunks(category, regions, start, end, chunk_size=100), ignore_index=True
+    )
+    expected = filter_prices(prices, category, regions, start, end)
+    assert len(exported) == len(expected)
+    pd.testing.assert_frame_equal(normalize(exported), normalize(expected))
+
+
+@pytest.mark.parametrize(
+    "category, regions, month",
+    [
+        ("Tilapia", None, None),
+        ("Tilapia", None, "2023-07-15"),
+        ("Tilapia", ["NCR - National Capital Region"], None),
+        (
+            "Egg",
+            ["NCR - National Capital Region", "CALBARZON (Region IV-A)"],
+            "2023-03-01",
+        ),
+        ("Egg", ["Not a region"], None),
+        ("Not a category", None, None),
+    ],
+)
+def test_bounds_match_a_pandas_filter(prices, store, category, regions, month):
+    sliced = store.df.iloc[0:0]
+    bounds = store.bounds(
+        category, regions, None if month is None else pd.Timestamp(month)
+    )
+    if bounds:
+        sliced = pd.concat([store.df.iloc[start:stop] for start, stop in bounds])
+    start = end = None
+    if month is not None:
+        period = pd.Timestamp(month).to_period("M")
+        start, end = period.start_time, period.end_time
+    expected = filter_prices(prices, category, regions, start, end)
+    assert len(sliced) == len(expected)
+    pd.testing.assert_frame_equal(
+        normalize(sliced, FACT_COLUMNS), normalize(expected, FACT_COLUMNS)
+    )
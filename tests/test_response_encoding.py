@@ -0,0 +1,28 @@
+import pytest
+
+from response_encoding import accepted_encoding, accepted_encodings
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip", {"gzip"}),
+        ("gzip, deflate", {"gzip", "deflate"}),
+        ("GZIP;q=0.5", {"gzip"}),
+        ("gzip;q=0", set()),
+        ("gzip; q=0", set()),
+        ("gzip ; q = 0", set()),
+        ("gzip;q=0.0", set()),
+        ("gzip;q=0.000", set()),
+        ("gzip;q=zero", set()),
+        ("br;q=0, gzip;q=0.001", {"gzip"}),
+        ("", set()),
+    ],
+)
+def test_encodings_refused_with_q_0_are_not_accepted(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+def test_gzip_is_picked_only_when_accepted():
+    assert accepted_encoding("gzip; q=0, identity") is None
+    assert accepted_encoding("identity, gzip;q=0.8") == "gzip"
@@ -0,0 +1,218 @@
+"""
+Background warming of the rendered figures of the most requested views.
+
+The dashboard records the view of every request: the category, the regions, the month of the
+date slider and the anomaly overlay. Every request adds 1 to the score of its view and the
+scores halve every PRICE_WARM_HALF_LIFE seconds, so the ranking follows the recent traffic.
+
+After every reload of the data, and every PRICE_WARM_INTERVAL seconds, a background thread
+renders the PRICE_WARM_VIEWS best ranked views into the figure cache, so that the first users
+after a refresh do not pay for the render. A view that is cached and not about to expire is
+skipped. The warming keeps to a CPU budget: after a render that took t seconds of CPU the
+thread sleeps t * (1 / PRICE_WARM_CPU - 1) seconds, and it waits while a live callback runs.
+
+Enabled with environment variables:
+    PRICE_WARM_VIEWS=32          keep the 32 most requested views rendered
+    PRICE_WARM_INTERVAL=300      also warm every 300 seconds, not only after the reloads
+    PRICE_WARM_CPU=0.25          share of one core the warming may use
+    PRICE_WARM_HALF_LIFE=3600    seconds after which a request counts half in the ranking
+"""
+
+import logging
+import os
+import threading
+import time
+
+WARM_VIEWS = int(os.environ.get("PRICE_WARM_VIEWS", "0"))
+WARM_INTERVAL = float(os.environ.get("PRICE_WARM_INTERVAL", "0")) or None
+WARM_CPU = float(os.environ.get("PRICE_WARM_CPU", "0.25"))
+WARM_HALF_LIFE = float(os.environ.get("PRICE_WARM_HALF_LIFE", "3600"))
+
+# pause of the warming while a live callback is running, in seconds
+BUSY_WAIT = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+class ViewWarmer:
+    """
+    Description: Ranking of the views by their recent requests, and background thread
+    rendering the best ranked ones ahead of the requests
+    """
+
+    def __init__(
+        self,
+        warm,
+        is_warm,
+        top=32,
+        interval=None,
+        cpu_budget=0.25,
+        half_life=3600,
+        busy=None,
+        max_tracked=1024,
+    ):
+        """
+        Args:
+        warm (callable): Renders a view into the cache, returns the number of outputs rendered
+        is_warm (callable): Whether every output of a view is cached
+        top (int): Number of best ranked views to keep rendered
+        interval (float): Seconds between two warmings, None to only warm after the reloads
+        cpu_budget (float): Share of one core the warming may use, from 0 to 1
+        half_life (float): Seconds after which a request counts half in the ranking
+        busy (callable): Whether live requests are running, the warming waits for them
+        max_tracked (int): Most views ranked, the least requested are forgotten beyond
+        """
+        self.warm = warm
+        self.is_warm = is_warm
+        self.top = top
+        self.interval = interval
+        self.cpu_budget = min(max(cpu_budget, 0.01), 1.0)
+        self.half_life = half_life
+        self.busy = busy
+        self.max_tracked = max_tracked
+        self.runs = 0
+        self.rendered = 0
+        self.failures = 0
+        self.last_run_seconds = 0.0
+        self.last_run_cpu_seconds = 0.0
+        self.throttled_seconds = 0.0
+        self._scores = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, view):
+        """
+        Description: Count a request of a view
+
+        Args:
+        view (tuple): Hashable description of the view, as passed to warm
+        """
+        now = time.monotonic()
+        with self._lock:
+            score, seen = self._scores.get(view, (0.0, now))
+            self._scores[view] = (self._decay(score, seen, now) + 1.0, now)
+            if len(self._scores) > self.max_tracked:
+                # forget the least requested quarter at once rather than one view per request
+                ranked = sorted(
+                    self._scores.items(),
+                    key=lambda item: self._decay(item[1][0], item[1][1], now),
+                )
+                for forgotten, _ in ranked[: len(ranked) - self.max_tracked * 3 // 4]:
+                    del self._scores[forgotten]
+
+    def hot_views(self, count=None):
+        """
+        Description: Rank the views by their decayed request counts
+
+        Args:
+        count (int): Number of views, top by default
+
+        Returns:
+        (list): (view, score) of the most requested views, the best first
+        """
+        now = time.monotonic()
+        with self._lock:
+            scored = [
+                (view, self._decay(score, seen, now))
+                for view, (score, seen) in self._scores.items()
+            ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[: self.top if count is None else count]
+
+    def warm_once(self):
+        """
+        Description: Render the best ranked views that are not cached, within the CPU budget
+
+        Returns:
+        (int): Number of outputs rendered
+        """
+        started = time.perf_counter()
+        cpu = 0.0
+        rendered = 0
+        for view, _ in self.hot_views():
+            while self.busy is not None and self.busy() and not self._stop.is_set():
+                self.throttled_seconds += BUSY_WAIT
+                self._stop.wait(BUSY_WAIT)
+            if self._stop.is_set():
+                break
+            render_started = time.thread_time()
+            try:
+                rendered += self.warm(view)
+            except Exception:  # noqa: BLE001
+                # a view that fails to render must not stop the warming of the others
+                self.failures += 1
+                logger.exception("warming of %r failed", view)
+            spent = time.thread_time() - render_started
+            cpu += spent
+            pause = spent * (1 / self.cpu_budget - 1)
+            self.throttled_seconds += pause
+            self._stop.wait(pause)
+        self.runs += 1
+        self.rendered += rendered
+        self.last_run_seconds = time.perf_counter() - started
+        self.last_run_cpu_seconds = cpu
+        return rendered
+
+    def schedule(self):
+        """
+        Description: Warm as soon as possible, to be called whenever the dataset reloads
+        """
+        self._wake.set()
+
+    def coverage(self):
+        """
+        Description: Report how much of the recent traffic the cache is warm for
+
+        Returns:
+        (dict): Number of hot views, how many are warm, their share, the share of the requests
+        to the hot views that would hit a warm view, and the counters of the warming
+        """
+        hot = self.hot_views()
+        warm = [score for view, score in hot if self.is_warm(view)]
+        total = sum(score for _, score in hot)
+        return {
+            "views": len(hot),
+            "warm_views": len(warm),
+            "coverage": len(warm) / len(hot) if hot else 0.0,
+            "request_coverage": sum(warm) / total if total else 0.0,
+            "runs": self.runs,
+            "rendered": self.rendered,
+            "failures": self.failures,
+            "last_run_seconds": self.last_run_seconds,
+            "last_run_cpu_seconds": self.last_run_cpu_seconds,
+            "throttled_seconds": self.throttled_seconds,
+        }
+
+    def start(self):
+        """
+        Description: Start warming in a daemon thread, once per process.
+        Threads do not survive a fork, so a server forking its workers after loading
+        the app (gunicorn --preload) calls this again in every worker.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._wake.set()
+        self._thread = threading.Thread(
+            target=self._run, name="view-warmer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            self.warm_once()
+
+    def _decay(self, score, seen, now):
+        return score * 0.5 ** ((now - seen) / self.half_life)
@@ -0,0 +1,19 @@
+"""
+WSGI entry point of the dashboard for multi-worker servers.
+
+Single worker, development:
+    python dashboard_crop_price.py
+
+Production, with the settings of gunicorn.conf.py: the dashboard is built once in the
+master process (preload_app), then the workers are forked and share its memory
+copy-on-write, so every worker starts serving at once:
+    gunicorn wsgi:server
+
+Several workers sharing one memory-mapped copy of the price table (see shared_dataset.py):
+    PRICE_SHARED_DIR=data/shared gunicorn wsgi:server
+"""
+
+from dashboard_crop_price import create_app
+
+app = create_app()
+server = app.server